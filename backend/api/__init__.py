@@ -1,8 +1,14 @@
 from __future__ import annotations
 
+import atexit
+import threading
+
 from flask import Flask
 from flask_cors import CORS
 
+from crawler.db import create_pg_pool, listen_for_changes
+from crawler.metrics import DB_POOL_CONNECTIONS
+from .cache import HeatmapCache
 from .routes import register_routes
 from .settings import load_settings
 
@@ -11,5 +17,37 @@ def create_app() -> Flask:
     settings = load_settings()
     app = Flask(__name__)
     CORS(app, resources={r"/*": {"origins": "*"}})
-    register_routes(app, settings)
+    # One pool per process: /heatmap requests reuse warm connections instead of
+    # paying a connect + auth handshake each.
+    pool = create_pg_pool(
+        settings.pg_url,
+        min_size=settings.pool_min_size,
+        max_size=settings.pool_max_size,
+        timeout_s=settings.pool_timeout_s,
+        max_idle_s=settings.pool_max_idle_s,
+        max_lifetime_s=settings.pool_max_lifetime_s,
+        connect_timeout_s=settings.pg_connect_timeout_s,
+    )
+    atexit.register(pool.close)
+    for state, stat in (("size", "pool_size"), ("available", "pool_available"), ("waiting", "requests_waiting")):
+        DB_POOL_CONNECTIONS.set_function(lambda stat=stat: pool.get_stats().get(stat, 0), state=state)
+    app.extensions["pg_pool"] = pool
+    cache = None
+    if settings.heatmap_cache_ttl_s > 0 and settings.heatmap_cache_max_entries > 0:
+        cache = HeatmapCache(settings.heatmap_cache_ttl_s, settings.heatmap_cache_max_entries)
+
+        def on_change(table):
+            # None: the listener (re)connected and may have missed notifications.
+            if table is None or table == settings.pg_table:
+                cache.invalidate()
+
+        stop = threading.Event()
+        threading.Thread(
+            target=listen_for_changes,
+            args=(settings.pg_url, on_change, stop),
+            name="heatmap-cache-listener",
+            daemon=True,
+        ).start()
+        atexit.register(stop.set)
+    register_routes(app, settings, pool, cache)
     return app
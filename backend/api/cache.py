@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+from crawler.metrics import HEATMAP_CACHE
+
+
+def strong_etag(body: bytes) -> str:
+    """Content hash of a serialised response, so equal bodies get equal ETags across workers."""
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+class HeatmapCache:
+    """
+    LRU + TTL cache of serialised /heatmap bodies and their ETags, keyed by the
+    normalised filter params. invalidate() (driven by the ingest NOTIFY) empties it;
+    the TTL only bounds staleness while the change listener is disconnected.
+    """
+
+    def __init__(self, ttl_s: float, max_entries: int) -> None:
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._generation = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, bytes, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        """Read before querying and pass to put(), so a result fetched before an invalidation is not stored after it."""
+        with self._lock:
+            return self._generation
+
+    def get(self, key: Hashable) -> Optional[Tuple[bytes, str]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] > self.ttl_s:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        HEATMAP_CACHE.inc(event="miss" if entry is None else "hit")
+        return None if entry is None else (entry[1], entry[2])
+
+    def put(self, key: Hashable, body: bytes, etag: str, generation: int) -> None:
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic(), body, etag)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self.invalidations += 1
+        HEATMAP_CACHE.inc(event="invalidation")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
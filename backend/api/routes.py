@@ -2,40 +2,205 @@ from __future__ import annotations
 
 import subprocess
 import threading
+import time
+from datetime import date, timedelta
 from pathlib import Path
 
-from flask import jsonify, request
+from flask import Response, g, jsonify, request
 
 from crawler.client import HiringCafeClient
-from crawler.db import fetch_heatmap_points
+from crawler.db import fetch_city_history, fetch_heatmap_points
+from crawler.metrics import CONTENT_TYPE, HTTP_LATENCY, REGISTRY
+from crawler.ratelimit import shared_rate_limiter
+from .cache import HeatmapCache, strong_etag
 from .settings import Settings
 from crawler.search_state import default_search_state, merge_overrides
 
 
-def register_routes(app, settings: Settings) -> None:
+def register_routes(app, settings: Settings, pool=None, cache: HeatmapCache | None = None) -> None:
+    # One client per process so concurrent /cluster-count requests for the same
+    # member set share a single upstream call. It is not paced by default: a
+    # process-wide delay would queue unrelated users behind each other.
+    limiter = (
+        shared_rate_limiter(settings.base_url, rate=settings.cluster_count_rate)
+        if settings.cluster_count_rate > 0
+        else None
+    )
+    client = HiringCafeClient(base_url=settings.base_url, min_delay_s=0, rate_limiter=limiter)
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_latency(response):
+        start = g.pop("request_start", None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            HTTP_LATENCY.observe(
+                time.perf_counter() - start,
+                route=route,
+                method=request.method,
+                status=str(response.status_code),
+            )
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        return Response(REGISTRY.render(), mimetype=None, content_type=CONTENT_TYPE)
+
     @app.route("/health", methods=["GET"])
     def health():
-        return jsonify({"status": "ok"})
+        body = {"status": "ok", "cluster_count_dedupe_hits": client.singleflight.dedupe_hits}
+        if pool is not None:
+            body["pg_pool"] = pool.get_stats()
+        if cache is not None:
+            body["heatmap_cache"] = cache.stats()
+        return jsonify(body)
 
     @app.route("/heatmap", methods=["GET"])
     def heatmap():
+        """
+        Served from `cache` while no ingest has landed since the body was built. Every
+        response carries a strong ETag; a matching If-None-Match gets a bodiless 304.
+        ?urls=0 omits hiring_cafe_url for clients that build their own links.
+        """
         query = request.args.get("query") or None
         roles = request.args.getlist("role") or request.args.getlist("roles") or None
         seniority = request.args.get("seniority") or None
         seniorities = request.args.getlist("seniority") or request.args.getlist("seniorities") or None
         min_total = int(request.args.get("min_total", settings.min_total_default))
         limit = int(request.args.get("limit", settings.limit_default))
-        rows = fetch_heatmap_points(
-            settings.pg_url,
-            settings.pg_table,
-            query=query,
-            roles=roles,
-            seniority_level=seniority,
-            seniority_levels=seniorities,
-            min_total=min_total,
-            limit=limit,
+        include_urls = request.args.get("urls", "1").lower() not in ("0", "false", "no")
+        levels = seniorities or ([seniority] if seniority else None)
+        # Role and seniority filters are ANY() lists, so their order does not matter.
+        key = (
+            query,
+            tuple(sorted(set(roles))) if roles else None,
+            tuple(sorted(set(levels))) if levels else None,
+            min_total,
+            limit,
+            include_urls,
+        )
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None:
+            body, etag = cached
+        else:
+            generation = cache.generation if cache is not None else 0
+            rows = fetch_heatmap_points(
+                settings.pg_url,
+                settings.pg_table,
+                query=query,
+                roles=roles,
+                seniority_levels=levels,
+                min_total=min_total,
+                limit=limit,
+                pool=pool,
+                include_urls=include_urls,
+            )
+            body = jsonify({"points": rows}).get_data()
+            etag = strong_etag(body)
+            if cache is not None:
+                cache.put(key, body, etag, generation)
+        response = Response(body, mimetype="application/json")
+        response.set_etag(etag)
+        # Let browsers keep the body but revalidate every time; a 304 costs no query.
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
+
+    def history_filters(params):
+        """Shared query/role/seniority/from/to parsing for the history endpoints."""
+        date_to = date.fromisoformat(params["to"]) if params.get("to") else date.today()
+        date_from = (
+            date.fromisoformat(params["from"])
+            if params.get("from")
+            else date_to - timedelta(days=settings.history_days_default)
+        )
+        if date_from > date_to:
+            raise ValueError("from must not be after to")
+
+        def as_list(key):
+            value = params.get(key)
+            if isinstance(value, list):
+                return [v for v in value if v] or None
+            return [value] if value else None
+
+        return {
+            "date_from": date_from,
+            "date_to": date_to,
+            "query": params.get("query") or None,
+            "roles": as_list("role"),
+            "seniority_levels": as_list("seniority"),
+        }
+
+    def history_response(cities, filters):
+        if not cities:
+            return jsonify({"error": "city and state required"}), 400
+        if len(cities) > settings.history_max_cities:
+            return jsonify({"error": f"at most {settings.history_max_cities} cities per request"}), 400
+        series = fetch_city_history(settings.pg_url, settings.pg_table, cities, pool=pool, **filters)
+        return jsonify(
+            {"from": filters["date_from"].isoformat(), "to": filters["date_to"].isoformat(), "series": series}
         )
-        return jsonify({"points": rows})
+
+    @app.route("/heatmap/history", methods=["GET"])
+    def heatmap_history():
+        """
+        Daily totals for one city: ?city=&state=&role=&seniority=&query=&from=&to=
+        (dates YYYY-MM-DD; default range is the last JOBS_HISTORY_DAYS days).
+        """
+        args = request.args
+        try:
+            filters = history_filters(
+                {
+                    "from": args.get("from"),
+                    "to": args.get("to"),
+                    "query": args.get("query"),
+                    "role": args.getlist("role"),
+                    "seniority": args.getlist("seniority"),
+                }
+            )
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+        city = args.get("city")
+        state = args.get("state")
+        return history_response([(city, state)] if city and state else [], filters)
+
+    @app.route("/heatmap/history/batch", methods=["GET", "POST", "OPTIONS"])
+    def heatmap_history_batch():
+        """
+        Daily totals for many cities at once (e.g. sparklines).
+        GET: ?city=Austin,TX&city=Denver,CO&role=...&seniority=...&from=&to=
+        POST: {"cities": [{"city": "Austin", "state": "TX"}, "Denver,CO"], "role": ..., "from": ...}
+        """
+        if request.method == "OPTIONS":
+            return ("", 204)
+        if request.method == "POST":
+            params = request.get_json(silent=True) or {}
+            raw_cities = params.get("cities") or []
+        else:
+            args = request.args
+            params = {
+                "from": args.get("from"),
+                "to": args.get("to"),
+                "query": args.get("query"),
+                "role": args.getlist("role"),
+                "seniority": args.getlist("seniority"),
+            }
+            raw_cities = args.getlist("city")
+        try:
+            filters = history_filters(params)
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+        cities = []
+        for c in raw_cities:
+            if isinstance(c, dict):
+                city, state = c.get("city"), c.get("state")
+            else:
+                city, _, state = str(c).rpartition(",")
+            if city and state:
+                cities.append((city.strip(), state.strip()))
+        return history_response(cities, filters)
 
     @app.route("/cluster-count", methods=["POST", "OPTIONS"])
     def cluster_count():
@@ -93,7 +258,6 @@ def register_routes(app, settings: Settings) -> None:
         if not queries_to_run:
             return jsonify({"error": "query or queries required"}), 400
 
-        client = HiringCafeClient(min_delay_s=0.5)
         breakdown = []
         total_sum = 0
         try:
@@ -13,6 +13,18 @@ class Settings:
     min_total_default: int = 0
     limit_default: int = 1000
     refresh_cmd: str | None = None
+    base_url: str = "https://hiring.cafe"
+    pool_min_size: int = 1
+    pool_max_size: int = 10
+    pool_timeout_s: float = 10.0
+    pool_max_idle_s: float = 300.0
+    pool_max_lifetime_s: float = 3600.0
+    pg_connect_timeout_s: int = 5
+    history_days_default: int = 90
+    history_max_cities: int = 500
+    heatmap_cache_ttl_s: float = 300.0
+    heatmap_cache_max_entries: int = 256
+    cluster_count_rate: float = 0.0
 
 
 def load_settings() -> Settings:
@@ -24,10 +36,37 @@ def load_settings() -> Settings:
     min_total = int(os.getenv("JOBS_HEATMAP_MIN_TOTAL", "0"))
     limit = int(os.getenv("JOBS_HEATMAP_LIMIT", "1000"))
     refresh_cmd = os.getenv("JOBS_REFRESH_CMD")
+    base_url = os.getenv("JOBS_BASE_URL", "https://hiring.cafe")
+    # The frontend fires one /heatmap per role at once; size the pool to cover that.
+    pool_min_size = int(os.getenv("JOBS_PG_POOL_MIN", "1"))
+    pool_max_size = int(os.getenv("JOBS_PG_POOL_MAX", "10"))
+    pool_timeout_s = float(os.getenv("JOBS_PG_POOL_TIMEOUT_S", "10"))
+    pool_max_idle_s = float(os.getenv("JOBS_PG_POOL_MAX_IDLE_S", "300"))
+    pool_max_lifetime_s = float(os.getenv("JOBS_PG_POOL_MAX_LIFETIME_S", "3600"))
+    pg_connect_timeout_s = int(os.getenv("JOBS_PG_CONNECT_TIMEOUT_S", "5"))
+    history_days_default = int(os.getenv("JOBS_HISTORY_DAYS", "90"))
+    history_max_cities = int(os.getenv("JOBS_HISTORY_MAX_CITIES", "500"))
+    # Entries are dropped on ingest NOTIFY; the TTL is only a backstop. 0 disables the cache.
+    heatmap_cache_ttl_s = float(os.getenv("JOBS_HEATMAP_CACHE_TTL_S", "300"))
+    heatmap_cache_max_entries = int(os.getenv("JOBS_HEATMAP_CACHE_MAX_ENTRIES", "256"))
+    # Upstream req/s for /cluster-count across this process; 0 leaves it unthrottled.
+    cluster_count_rate = float(os.getenv("JOBS_CLUSTER_COUNT_RATE", "0"))
     return Settings(
         pg_url=pg_url,
         pg_table=pg_table,
         min_total_default=min_total,
         limit_default=limit,
         refresh_cmd=refresh_cmd,
+        base_url=base_url,
+        pool_min_size=pool_min_size,
+        pool_max_size=pool_max_size,
+        pool_timeout_s=pool_timeout_s,
+        pool_max_idle_s=pool_max_idle_s,
+        pool_max_lifetime_s=pool_max_lifetime_s,
+        pg_connect_timeout_s=pg_connect_timeout_s,
+        history_days_default=history_days_default,
+        history_max_cities=history_max_cities,
+        heatmap_cache_ttl_s=heatmap_cache_ttl_s,
+        heatmap_cache_max_entries=heatmap_cache_max_entries,
+        cluster_count_rate=cluster_count_rate,
     )
@@ -0,0 +1,181 @@
+"""
+Crawler throughput benchmark against the local mock (bench/mock_server.py).
+
+Runs get_counts_for_cities (and the async engine) over a grid of city counts x
+concurrency levels and reports requests/sec, p50/p99 request latency and wall-clock.
+Nothing leaves the machine, so numbers are comparable run to run on the same laptop.
+
+    cd backend
+    python -m bench.bench_crawler --cities 100,500 --concurrency 1,8,32 --latency lognormal:40:0.5
+    python -m bench.bench_crawler --engine threads,async --error-rate-429 0.05 --json bench.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import threading
+import time
+from typing import Dict, List
+
+from bench.mock_server import add_mock_args, mock_config_from_args, start_mock_server
+from crawler.async_client import AsyncHiringCafeClient
+from crawler.async_service import run_counts_for_cities_async
+from crawler.cities import City, load_us_cities
+from crawler.client import HiringCafeClient
+from crawler.ratelimit import AdaptiveRateLimiter
+from crawler.retry import RetryPolicy
+from crawler.service import get_counts_for_cities, summarize_results
+
+
+class LatencyRecorder:
+    """Collects per-request wall time from a wrapped post_body (sync or async)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.samples: List[float] = []
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self.samples.append(seconds)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.samples = []
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        if len(self.samples) == 1:
+            return self.samples[0]
+        return statistics.quantiles(self.samples, n=100, method="inclusive")[int(q) - 1]
+
+
+def instrument_clients(recorder: LatencyRecorder) -> None:
+    sync_post = HiringCafeClient.post_body
+    async_post = AsyncHiringCafeClient.post_body
+
+    def timed_post(self, path, body):
+        start = time.perf_counter()
+        try:
+            return sync_post(self, path, body)
+        finally:
+            recorder.add(time.perf_counter() - start)
+
+    async def timed_post_async(self, path, body):
+        start = time.perf_counter()
+        try:
+            return await async_post(self, path, body)
+        finally:
+            recorder.add(time.perf_counter() - start)
+
+    HiringCafeClient.post_body = timed_post
+    AsyncHiringCafeClient.post_body = timed_post_async
+
+
+def run_case(
+    engine: str,
+    url: str,
+    cities: List[City],
+    concurrency: int,
+    retry_policy: RetryPolicy,
+    rate: float,
+    recorder: LatencyRecorder,
+) -> Dict[str, float]:
+    limiter = AdaptiveRateLimiter(rate=rate, burst=concurrency) if rate > 0 else None
+    recorder.reset()
+    start = time.perf_counter()
+    if engine == "async":
+        results = run_counts_for_cities_async(
+            cities,
+            concurrency=concurrency,
+            base_url=url,
+            min_delay_s=0,
+            rate_limiter=limiter,
+            retry_policy=retry_policy,
+        )
+    else:
+        client = HiringCafeClient(base_url=url, min_delay_s=0, pool_size=concurrency, rate_limiter=limiter)
+        results = get_counts_for_cities(client, cities, concurrency=concurrency, retry_policy=retry_policy)
+    wall = time.perf_counter() - start
+    summary = summarize_results(results)
+    requests = len(recorder.samples)
+    return {
+        "engine": engine,
+        "cities": len(cities),
+        "concurrency": concurrency,
+        "requests": requests,
+        "ok": summary["ok"],
+        "failed": summary["failed"],
+        "retries": summary["retries"],
+        "wall_s": round(wall, 3),
+        "rps": round(requests / wall, 1) if wall else 0.0,
+        "p50_ms": round(recorder.percentile(50) * 1000, 1),
+        "p99_ms": round(recorder.percentile(99) * 1000, 1),
+    }
+
+
+def parse_int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark crawler throughput against a local hiring.cafe mock.")
+    parser.add_argument("--cities", default="100,500", help="Comma-separated city counts.")
+    parser.add_argument("--concurrency", default="1,4,16,32", help="Comma-separated concurrency levels.")
+    parser.add_argument("--engine", default="threads", help="Comma-separated engines: threads,async.")
+    parser.add_argument("--min-population", type=int, default=10000)
+    parser.add_argument("--rate", type=float, default=0.0, help="Client token-bucket rate (0 = unlimited).")
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--retry-base-delay", type=float, default=0.05)
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case; the fastest is reported.")
+    parser.add_argument("--json", dest="json_path", help="Also write the result rows to this JSON file.")
+    parser.add_argument("--mock-url", help="Use an already running mock instead of starting one in-process.")
+    add_mock_args(parser)
+    parser.set_defaults(latency="lognormal:40:0.5")
+    args = parser.parse_args()
+
+    server = None
+    url = args.mock_url
+    if not url:
+        server = start_mock_server(mock_config_from_args(args))
+        url = server.url
+    recorder = LatencyRecorder()
+    instrument_clients(recorder)
+    retry_policy = RetryPolicy(max_attempts=args.max_retries + 1, base_delay_s=args.retry_base_delay, max_delay_s=2.0)
+
+    city_counts = parse_int_list(args.cities)
+    all_cities = load_us_cities(min_population=args.min_population, limit=max(city_counts))
+    if len(all_cities) < max(city_counts):
+        print(f"Only {len(all_cities)} cities with population >= {args.min_population}; lower --min-population.")
+
+    rows = []
+    header = f"{'engine':8} {'cities':>6} {'conc':>5} {'reqs':>6} {'fail':>5} {'retry':>6} {'wall_s':>8} {'rps':>8} {'p50_ms':>8} {'p99_ms':>8}"
+    print(f"mock={url} latency={args.latency} 429={args.error_rate_429} 5xx={args.error_rate_5xx}")
+    print(header)
+    for engine in [e.strip() for e in args.engine.split(",") if e.strip()]:
+        for n in city_counts:
+            cities = all_cities[:n]
+            for concurrency in parse_int_list(args.concurrency):
+                runs = [
+                    run_case(engine, url, cities, concurrency, retry_policy, args.rate, recorder)
+                    for _ in range(max(1, args.repeat))
+                ]
+                row = min(runs, key=lambda r: r["wall_s"])
+                rows.append(row)
+                print(
+                    f"{row['engine']:8} {row['cities']:>6} {row['concurrency']:>5} {row['requests']:>6} "
+                    f"{row['failed']:>5} {row['retries']:>6} {row['wall_s']:>8.3f} {row['rps']:>8.1f} "
+                    f"{row['p50_ms']:>8.1f} {row['p99_ms']:>8.1f}"
+                )
+
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({"config": vars(args), "results": rows}, fh, indent=2)
+        print(f"Wrote {len(rows)} rows to {args.json_path}")
+    if server:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Per-request CPU cost of building a count request: the dict path (deepcopy the base
+state, json-encode the payload, canonicalise + hash for the cache key) versus a
+compiled SearchStateTemplate splicing cached per-city fragments.
+
+    cd backend
+    python -m bench.bench_search_state --cities 1000 --rounds 5
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Callable, List
+
+from crawler.cache import canonical_search_state_key
+from crawler.cities import City, load_us_cities
+from crawler.search_state import default_search_state, search_state_for_city
+from crawler.state_template import SearchStateTemplate, location_fragments
+
+
+def time_per_city(fn: Callable[[City], object], cities: List[City], rounds: int) -> float:
+    best = float("inf")
+    for _ in range(max(1, rounds)):
+        start = time.perf_counter()
+        for city in cities:
+            fn(city)
+        best = min(best, time.perf_counter() - start)
+    return best / max(1, len(cities)) * 1e6
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Search-state build micro-benchmark.")
+    ap.add_argument("--cities", type=int, default=1000)
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--radius", type=float, default=25)
+    ap.add_argument("--query", default="software engineer")
+    args = ap.parse_args()
+
+    cities = load_us_cities(min_population=0, limit=args.cities)
+    base = default_search_state()
+
+    def dict_path(city: City) -> None:
+        st = search_state_for_city(city, base, args.radius, query=args.query)
+        canonical_search_state_key(st)
+        json.dumps({"searchState": st}).encode("utf-8")
+
+    template = SearchStateTemplate(base, query=args.query)
+
+    def template_path(city: City) -> None:
+        template.prepare(city, args.radius)
+
+    dict_us = time_per_city(dict_path, cities, args.rounds)
+    location_fragments.cache_clear()
+    cold_us = time_per_city(template_path, cities, 1)
+    warm_us = time_per_city(template_path, cities, args.rounds)
+
+    print(f"cities={len(cities)} rounds={args.rounds}")
+    print(f"{'path':22} {'us/request':>11} {'speedup':>8}")
+    for name, us in (("deepcopy+json", dict_us), ("template (cold)", cold_us), ("template (warm)", warm_us)):
+        print(f"{name:22} {us:>11.2f} {dict_us / us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Local stand-in for hiring.cafe's /api/search-jobs/get-total-count.
+
+Counts are a deterministic function of the canonical searchState (same request, same
+total, across runs and machines), so results can be diffed. Latency, 429/5xx injection
+and a server-side rate limit are configurable, so client retry/backoff paths can be
+exercised without touching the real site.
+
+    python -m bench.mock_server --port 8787 --latency lognormal:40:0.5 --error-rate-429 0.02
+    python main.py --mode cities --base-url http://127.0.0.1:8787 ...
+
+GET /stats returns request/status counters; POST /stats/reset clears them.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+from crawler.cache import canonical_json, canonical_search_state
+
+COUNT_PATH = "/api/search-jobs/get-total-count"
+
+
+@dataclass
+class MockConfig:
+    latency: str = "fixed:0"  # fixed:MS | uniform:LO_MS:HI_MS | lognormal:MEDIAN_MS:SIGMA
+    error_rate_429: float = 0.0
+    error_rate_5xx: float = 0.0
+    retry_after_s: Optional[float] = 1.0
+    limit_rps: float = 0.0  # server-side token bucket; 0 = unlimited
+    seed: int = 0
+
+
+def parse_latency(spec: str):
+    """Return sampler(rng) -> seconds for a latency spec like lognormal:40:0.5."""
+    kind, _, rest = spec.partition(":")
+    params = [float(p) for p in rest.split(":") if p]
+    if kind == "fixed":
+        ms = params[0] if params else 0.0
+        return lambda rng: ms / 1000
+    if kind == "uniform":
+        lo, hi = params
+        return lambda rng: rng.uniform(lo, hi) / 1000
+    if kind == "lognormal":
+        median, sigma = params
+        mu = math.log(median)
+        return lambda rng: rng.lognormvariate(mu, sigma) / 1000
+    raise ValueError(f"Unknown latency spec '{spec}'")
+
+
+def mock_total(search_state: dict) -> int:
+    """
+    Deterministic count: population-scaled base plus a hash-derived spread, so bigger
+    cities get bigger numbers and different queries/radii differ.
+    """
+    digest = hashlib.sha256(canonical_json(canonical_search_state(search_state)).encode("utf-8")).digest()
+    spread = int.from_bytes(digest[:4], "big") % 1000
+    population = 0
+    for loc in search_state.get("locations") or []:
+        if isinstance(loc, dict):
+            population += int(loc.get("population") or 0)
+    return population // 500 + spread
+
+
+class MockState:
+    def __init__(self, config: MockConfig) -> None:
+        self.config = config
+        self.sample_latency = parse_latency(config.latency)
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self._tokens = max(1.0, config.limit_rps)
+        self._last = time.monotonic()
+        self.counters: Dict[str, int] = {}
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def draw(self) -> Tuple[float, float]:
+        """(latency seconds, uniform [0,1) for error injection) from the seeded RNG."""
+        with self._lock:
+            return self.sample_latency(self._rng), self._rng.random()
+
+    def take_token(self) -> bool:
+        if self.config.limit_rps <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.config.limit_rps, self._tokens + (now - self._last) * self.config.limit_rps)
+            self._last = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters = {}
+
+
+def make_handler(state: MockState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self) -> None:
+            super().setup()
+            # Headers and body go out in separate writes; without this, Nagle + delayed
+            # ACK adds ~40ms to every keep-alive response and swamps the configured latency.
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def do_GET(self) -> None:
+            if self.path == "/stats":
+                with state._lock:
+                    self._send(200, dict(state.counters))
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length)
+            if self.path == "/stats/reset":
+                state.reset()
+                self._send(200, {"ok": True})
+                return
+            if self.path != COUNT_PATH:
+                self._send(404, {"error": "not found"})
+                return
+
+            state.count("requests")
+            latency_s, roll = state.draw()
+            if latency_s > 0:
+                time.sleep(latency_s)
+
+            cfg = state.config
+            if not state.take_token() or roll < cfg.error_rate_429:
+                state.count("429")
+                self._send(429, {"error": "Too Many Requests"}, retry_after=cfg.retry_after_s)
+                return
+            if roll < cfg.error_rate_429 + cfg.error_rate_5xx:
+                state.count("503")
+                self._send(503, {"error": "Service Unavailable"}, retry_after=cfg.retry_after_s)
+                return
+            try:
+                payload = json.loads(body or b"{}")
+                search_state = payload["searchState"]
+            except (ValueError, KeyError, TypeError):
+                state.count("400")
+                self._send(400, {"error": "expected {\"searchState\": {...}}"})
+                return
+            state.count("200")
+            self._send(200, {"total": mock_total(search_state)})
+
+        def _send(self, status: int, payload: dict, retry_after: Optional[float] = None) -> None:
+            out = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            if retry_after is not None and status in (429, 503):
+                self.send_header("Retry-After", f"{retry_after:g}")
+            self.end_headers()
+            self.wfile.write(out)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    return Handler
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, state: MockState) -> None:
+        super().__init__(address, make_handler(state))
+        self.state = state
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_mock_server(config: Optional[MockConfig] = None, host: str = "127.0.0.1", port: int = 0) -> MockServer:
+    """Start the mock on a daemon thread (port 0 = pick a free one); stop with .shutdown()."""
+    server = MockServer((host, port), MockState(config or MockConfig()))
+    threading.Thread(target=server.serve_forever, name="mock-hiring-cafe", daemon=True).start()
+    return server
+
+
+def add_mock_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", default="fixed:0", help="fixed:MS | uniform:LO:HI | lognormal:MEDIAN_MS:SIGMA")
+    parser.add_argument("--error-rate-429", type=float, default=0.0, help="Fraction of requests answered 429.")
+    parser.add_argument("--error-rate-5xx", type=float, default=0.0, help="Fraction of requests answered 503.")
+    parser.add_argument("--retry-after-s", type=float, default=1.0, help="Retry-After sent with 429/503.")
+    parser.add_argument("--limit-rps", type=float, default=0.0, help="Server-side rate limit (429 above it).")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def mock_config_from_args(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(
+        latency=args.latency,
+        error_rate_429=args.error_rate_429,
+        error_rate_5xx=args.error_rate_5xx,
+        retry_after_s=args.retry_after_s,
+        limit_rps=args.limit_rps,
+        seed=args.seed,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local hiring.cafe count endpoint for tests and benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    add_mock_args(parser)
+    args = parser.parse_args()
+    parse_latency(args.latency)
+    server = MockServer((args.host, args.port), MockState(mock_config_from_args(args)))
+    print(f"Mock hiring.cafe listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
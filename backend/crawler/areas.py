@@ -1,23 +1,25 @@
 from __future__ import annotations
 
 import math
-from typing import Dict, Tuple
+from typing import Dict, Optional, Tuple
 from pathlib import Path
 
 from .db import load_area_lookup_from_pg, upsert_areas_to_pg
 from .util import normalize_place_name
 from .search_state import round_radius_miles
 from .gazetteer import load_gazetteer_area_sqmi
+from .tracing import span
 
 
-def radius_from_lookup(area_lookup: Dict[Tuple[str, str], float], city, default_radius, min_radius, max_radius, map_boroughs: bool):
-    state = city.state_code.upper()
+def area_for_city(area_lookup: Dict[Tuple[str, str], float], name: str, state_code: str, map_boroughs: bool) -> Optional[float]:
+    state = state_code.upper()
+    normalized = normalize_place_name(name)
     candidates = [
-        (city.name.lower(), state),
-        (normalize_place_name(city.name), state),
+        (name.lower(), state),
+        (normalized, state),
     ]
     if map_boroughs:
-        borough_alias = state == "NY" and normalize_place_name(city.name) in {
+        borough_alias = state == "NY" and normalized in {
             "brooklyn",
             "queens",
             "manhattan",
@@ -28,11 +30,14 @@ def radius_from_lookup(area_lookup: Dict[Tuple[str, str], float], city, default_
             candidates.append(("new york city", "NY"))
             candidates.append(("new york", "NY"))
 
-    area_sqmi = None
     for key in candidates:
         if key in area_lookup:
-            area_sqmi = area_lookup[key]
-            break
+            return area_lookup[key]
+    return None
+
+
+def radius_from_lookup(area_lookup: Dict[Tuple[str, str], float], city, default_radius, min_radius, max_radius, map_boroughs: bool):
+    area_sqmi = area_for_city(area_lookup, city.name, city.state_code, map_boroughs)
     if area_sqmi and area_sqmi > 0:
         radius = math.sqrt(area_sqmi / math.pi)
         return round_radius_miles(max(min_radius, min(max_radius, radius)))
@@ -47,11 +52,13 @@ def build_area_lookup(args, cities=None) -> Dict[Tuple[str, str], float]:
 
     if args.pg_url and args.pg_areas_table:
         try:
-            area_lookup = load_area_lookup_from_pg(args.pg_url, args.pg_areas_table, args.pg_create_table)
+            with span("load_area_lookup_from_pg", cat="db"):
+                area_lookup = load_area_lookup_from_pg(args.pg_url, args.pg_areas_table, args.pg_create_table)
             if area_lookup:
                 print(f"Loaded {len(area_lookup)} areas from Postgres table {args.pg_areas_table}")
             elif args.pg_load_gazetteer_to_pg and args.gazetteer_path:
-                area_lookup = load_gazetteer_area_sqmi(Path(args.gazetteer_path))
+                with span("load_gazetteer", cat="io"):
+                    area_lookup = load_gazetteer_area_sqmi(Path(args.gazetteer_path))
                 if area_lookup:
                     saved = upsert_areas_to_pg(area_lookup, args.pg_url, args.pg_areas_table, args.pg_create_table)
                     print(f"Cached {saved} Gazetteer areas into {args.pg_areas_table}")
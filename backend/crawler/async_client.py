@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Dict, Optional, Union
+
+from .cache import ResponseCache, canonical_search_state_key
+from .client import (
+    COUNT_PATH,
+    DEFAULT_HEADERS,
+    HiringCafeHTTPError,
+    count_request_body,
+    default_rate_limiter,
+    is_count_response,
+)
+from .fastjson import dumps_canonical, loads
+from .metrics import RATELIMIT_RATE, RATELIMIT_WAIT, UPSTREAM_LATENCY, UPSTREAM_REQUESTS
+from .ratelimit import AdaptiveRateLimiter, parse_retry_after
+from .singleflight import AsyncSingleFlight
+from .state_template import PreparedCount
+from .tracing import span
+
+JSON = Dict[str, Any]
+
+
+def ensure_aiohttp():
+    try:
+        import aiohttp
+    except ImportError as exc:
+        raise RuntimeError("aiohttp is required for the async engine. Install with `pip install aiohttp`.") from exc
+    return aiohttp
+
+
+class AsyncHiringCafeClient:
+    """
+    asyncio counterpart of HiringCafeClient backed by one keep-alive aiohttp session.
+    Use as `async with AsyncHiringCafeClient(...) as client:` so the pool is closed.
+    """
+
+    def __init__(
+        self,
+        base_url: str = "https://hiring.cafe",
+        timeout_s: int = 30,
+        min_delay_s: float = 0.35,
+        pool_size: int = 20,
+        keepalive_s: float = 30.0,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None,
+        cache: Optional[ResponseCache] = None,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.timeout_s = timeout_s
+        self.min_delay_s = min_delay_s
+        self.pool_size = max(1, pool_size)
+        self.keepalive_s = keepalive_s
+        self.rate_limiter = rate_limiter or default_rate_limiter(self.base_url, min_delay_s)
+        if self.rate_limiter:
+            RATELIMIT_RATE.set_function(lambda limiter=self.rate_limiter: limiter.rate, upstream=self.base_url)
+        self.cache = cache
+        self.singleflight = AsyncSingleFlight()
+        self._session = None
+
+    async def __aenter__(self) -> "AsyncHiringCafeClient":
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def open(self) -> None:
+        if self._session is not None:
+            return
+        aiohttp = ensure_aiohttp()
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size,
+            limit_per_host=self.pool_size,
+            keepalive_timeout=self.keepalive_s,
+        )
+        self._session = aiohttp.ClientSession(
+            headers=DEFAULT_HEADERS,
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout_s),
+        )
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def post_json(self, path: str, payload: JSON) -> JSON:
+        return await self.post_body(path, dumps_canonical(payload))
+
+    async def post_body(self, path: str, body: bytes) -> JSON:
+        if self._session is None:
+            await self.open()
+        aiohttp = ensure_aiohttp()
+        if self.rate_limiter:
+            with span("ratelimit_wait", cat="ratelimit"):
+                RATELIMIT_WAIT.observe(await self.rate_limiter.acquire_async())
+        url = f"{self.base_url}{path}"
+        with span(f"POST {path}", cat="http") as trace_args:
+            start = time.perf_counter()
+            try:
+                resp = await self._session.post(url, data=body)
+            except (aiohttp.ClientError, TimeoutError):
+                UPSTREAM_LATENCY.observe(time.perf_counter() - start)
+                UPSTREAM_REQUESTS.inc(status="error")
+                trace_args["status"] = "error"
+                if self.rate_limiter:
+                    self.rate_limiter.on_response(None)
+                raise
+            UPSTREAM_LATENCY.observe(time.perf_counter() - start)
+            UPSTREAM_REQUESTS.inc(status=str(resp.status))
+            trace_args["status"] = resp.status
+        async with resp:
+            retry_after_s = parse_retry_after(resp.headers.get("Retry-After"))
+            if self.rate_limiter:
+                self.rate_limiter.on_response(resp.status, retry_after_s)
+            if resp.status >= 400:
+                body = await resp.text()
+                raise HiringCafeHTTPError(
+                    f"{resp.status} Error: {resp.reason} for url: {url} | status={resp.status} | body={body[:400]}",
+                    status=resp.status,
+                    retry_after_s=retry_after_s,
+                )
+            return loads(await resp.read())
+
+    async def get_total_count(self, search_state: Union[JSON, PreparedCount]) -> JSON:
+        if isinstance(search_state, PreparedCount):
+            key = search_state.key
+        else:
+            key = canonical_search_state_key(search_state)
+        return await self.singleflight.do(key, lambda: self._fetch_total_count(key, search_state))
+
+    async def _fetch_total_count(self, key: str, search_state: Union[JSON, PreparedCount]) -> JSON:
+        # Cache backends are blocking (sqlite/psycopg), so keep them off the event loop.
+        if self.cache:
+            with span("cache_get", cat="cache") as trace_args:
+                cached = await asyncio.to_thread(self.cache.get, key)
+                trace_args["hit"] = cached is not None
+            if cached is not None and is_count_response(cached):
+                return cached
+        raw = await self.post_body(COUNT_PATH, count_request_body(search_state))
+        if self.cache and is_count_response(raw):
+            await asyncio.to_thread(self.cache.set, key, raw)
+        return raw
@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+import asyncio
+import queue
+import threading
+from itertools import islice
+from typing import AsyncIterator, Callable, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .async_client import AsyncHiringCafeClient
+from .cache import ResponseCache
+from .ratelimit import AdaptiveRateLimiter
+from .cities import City
+from .metrics import CITY_RESULTS, RETRIES
+from .retry import CircuitBreaker, CircuitOpenError, RetryPolicy, is_retryable
+from .types import CityCountResult, JSON
+from .state_template import SearchStateTemplate
+from .tracing import span
+from .search_state import default_search_state, search_state_for_city
+from .service import DEFAULT_RETRY_POLICY, extract_total
+
+
+async def fetch_total_with_retry_async(
+    client: AsyncHiringCafeClient,
+    search_state: JSON,
+    retry_policy: Optional[RetryPolicy] = None,
+    breaker: Optional[CircuitBreaker] = None,
+) -> Tuple[JSON, int, int]:
+    """Async twin of service.fetch_total_with_retry."""
+    policy = retry_policy or DEFAULT_RETRY_POLICY
+    attempt = 0
+    while True:
+        attempt += 1
+        probe = False
+        try:
+            if breaker:
+                probe = await breaker.before_request_async()
+            raw = await client.get_total_count(search_state)
+            total = extract_total(raw)
+        except CircuitOpenError as exc:
+            exc.attempts = attempt - 1
+            raise
+        except Exception as exc:
+            retryable = is_retryable(exc)
+            if breaker:
+                breaker.record_error(exc, probe)
+            if not retryable or attempt >= policy.max_attempts:
+                exc.attempts = attempt
+                raise
+            RETRIES.inc()
+            with span("retry_backoff", cat="retry", attempt=attempt):
+                await asyncio.sleep(policy.delay_for(attempt, exc))
+            continue
+        if breaker:
+            breaker.record(True, probe)
+        return raw, total, attempt
+
+
+async def get_count_for_city_async(
+    client: AsyncHiringCafeClient,
+    city: City,
+    radius_miles: float = 25,
+    base_search_state: Optional[JSON] = None,
+    query: Optional[str] = None,
+    seniority_levels: Optional[List[str]] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    breaker: Optional[CircuitBreaker] = None,
+    template: Optional[SearchStateTemplate] = None,
+) -> CityCountResult:
+    """Async twin of service.get_count_for_city."""
+    if template is not None:
+        with span("prepare_search_state", cat="cpu"):
+            st = template.prepare(city, radius_miles)
+    else:
+        with span("search_state_for_city", cat="cpu"):
+            st = search_state_for_city(
+                city,
+                base_search_state or default_search_state(),
+                radius_miles,
+                query=query,
+                seniority_levels=seniority_levels,
+            )
+    try:
+        raw, total, attempts = await fetch_total_with_retry_async(client, st, retry_policy, breaker)
+        CITY_RESULTS.inc(outcome="ok")
+        return CityCountResult(city=city, total=total, raw=raw, radius_miles=radius_miles, attempts=attempts)
+    except CircuitOpenError:
+        # An aborting breaker stops the run; it is not one more failed city.
+        raise
+    except Exception as e:
+        CITY_RESULTS.inc(outcome="failed")
+        return CityCountResult(
+            city=city,
+            total=None,
+            raw=None,
+            error=str(e),
+            radius_miles=radius_miles,
+            attempts=getattr(e, "attempts", 1),
+        )
+
+
+async def aiter_counts_for_cities(
+    client: AsyncHiringCafeClient,
+    cities: Iterable[City],
+    radius_miles: float = 25,
+    radius_selector: Optional[Callable[[City], float]] = None,
+    concurrency: int = 8,
+    base_search_state: Optional[JSON] = None,
+    query: Optional[str] = None,
+    seniority_levels: Optional[List[str]] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    breaker: Optional[CircuitBreaker] = None,
+) -> AsyncIterator[CityCountResult]:
+    """
+    Yield results in completion order with at most `concurrency` requests in flight;
+    cities are pulled lazily, so only in-flight work is held in memory.
+    """
+    base = base_search_state or default_search_state()
+    template = SearchStateTemplate(base, query=query, seniority_levels=seniority_levels)
+    city_iter = iter(cities)
+    pending: Set[asyncio.Task] = set()
+
+    def top_up() -> None:
+        for city in islice(city_iter, max(1, concurrency) - len(pending)):
+            radius = radius_selector(city) if radius_selector else radius_miles
+            pending.add(
+                asyncio.ensure_future(
+                    get_count_for_city_async(
+                        client,
+                        city,
+                        radius,
+                        base,
+                        query=query,
+                        seniority_levels=seniority_levels,
+                        retry_policy=retry_policy,
+                        breaker=breaker,
+                        template=template,
+                    )
+                )
+            )
+
+    top_up()
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            aborted = None
+            for task in done:
+                pending.discard(task)
+                try:
+                    result = task.result()
+                except CircuitOpenError as exc:
+                    aborted = exc
+                    continue
+                yield result
+            if aborted:
+                raise aborted
+            top_up()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def get_counts_for_cities_async(
+    client: AsyncHiringCafeClient,
+    cities: List[City],
+    radius_miles: float = 25,
+    radius_selector: Optional[Callable[[City], float]] = None,
+    concurrency: int = 8,
+    base_search_state: Optional[JSON] = None,
+    query: Optional[str] = None,
+    seniority_levels: Optional[List[str]] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    breaker: Optional[CircuitBreaker] = None,
+) -> List[CityCountResult]:
+    """
+    Same contract as service.get_counts_for_cities, but at most `concurrency`
+    requests are in flight at once and they share the client's keep-alive pool.
+    Results are returned in completion order.
+    """
+    return [
+        r
+        async for r in aiter_counts_for_cities(
+            client,
+            cities,
+            radius_miles=radius_miles,
+            radius_selector=radius_selector,
+            concurrency=concurrency,
+            base_search_state=base_search_state,
+            query=query,
+            seniority_levels=seniority_levels,
+            retry_policy=retry_policy,
+            breaker=breaker,
+        )
+    ]
+
+
+_DONE = object()
+
+
+def iter_counts_for_cities_async(
+    cities: Iterable[City],
+    radius_miles: float = 25,
+    radius_selector: Optional[Callable[[City], float]] = None,
+    concurrency: int = 8,
+    base_search_state: Optional[JSON] = None,
+    query: Optional[str] = None,
+    seniority_levels: Optional[List[str]] = None,
+    base_url: str = "https://hiring.cafe",
+    min_delay_s: float = 0.35,
+    pool_size: int = 0,
+    keepalive_s: float = 30.0,
+    rate_limiter: Optional[AdaptiveRateLimiter] = None,
+    cache: Optional[ResponseCache] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    breaker: Optional[CircuitBreaker] = None,
+) -> Iterator[CityCountResult]:
+    """
+    Blocking generator over the async engine for callers without an event loop
+    (e.g. main.py). The loop runs on a background thread and hands results over a
+    bounded queue; pool_size=0 sizes the keep-alive pool to the concurrency.
+    """
+    handoff: queue.Queue = queue.Queue(maxsize=max(1, concurrency) * 4)
+    stop = threading.Event()
+    failure: List[BaseException] = []
+
+    def put(item) -> None:
+        while not stop.is_set():
+            try:
+                handoff.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    async def produce() -> None:
+        async with AsyncHiringCafeClient(
+            base_url=base_url,
+            min_delay_s=min_delay_s,
+            pool_size=pool_size or concurrency,
+            keepalive_s=keepalive_s,
+            rate_limiter=rate_limiter,
+            cache=cache,
+        ) as client:
+            async for result in aiter_counts_for_cities(
+                client,
+                cities,
+                radius_miles=radius_miles,
+                radius_selector=radius_selector,
+                concurrency=concurrency,
+                base_search_state=base_search_state,
+                query=query,
+                seniority_levels=seniority_levels,
+                retry_policy=retry_policy,
+                breaker=breaker,
+            ):
+                # Never block the event loop on a full queue; yield to in-flight requests instead.
+                while not stop.is_set():
+                    try:
+                        handoff.put_nowait(result)
+                        break
+                    except queue.Full:
+                        await asyncio.sleep(0.01)
+                if stop.is_set():
+                    return
+
+    def run() -> None:
+        try:
+            asyncio.run(produce())
+        except BaseException as exc:
+            failure.append(exc)
+        finally:
+            put(_DONE)
+
+    worker = threading.Thread(target=run, name="async-city-engine", daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = handoff.get()
+            if item is _DONE:
+                break
+            yield item
+    finally:
+        stop.set()
+        worker.join()
+    if failure:
+        raise failure[0]
+
+
+def run_counts_for_cities_async(
+    cities: List[City],
+    radius_miles: float = 25,
+    radius_selector: Optional[Callable[[City], float]] = None,
+    concurrency: int = 8,
+    base_search_state: Optional[JSON] = None,
+    query: Optional[str] = None,
+    seniority_levels: Optional[List[str]] = None,
+    base_url: str = "https://hiring.cafe",
+    min_delay_s: float = 0.35,
+    pool_size: int = 0,
+    keepalive_s: float = 30.0,
+    rate_limiter: Optional[AdaptiveRateLimiter] = None,
+    cache: Optional[ResponseCache] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    breaker: Optional[CircuitBreaker] = None,
+) -> List[CityCountResult]:
+    """List-returning wrapper around iter_counts_for_cities_async."""
+    return list(
+        iter_counts_for_cities_async(
+            cities,
+            radius_miles=radius_miles,
+            radius_selector=radius_selector,
+            concurrency=concurrency,
+            base_search_state=base_search_state,
+            query=query,
+            seniority_levels=seniority_levels,
+            base_url=base_url,
+            min_delay_s=min_delay_s,
+            pool_size=pool_size,
+            keepalive_s=keepalive_s,
+            rate_limiter=rate_limiter,
+            cache=cache,
+            retry_policy=retry_policy,
+            breaker=breaker,
+        )
+    )
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .db import ensure_psycopg
+from .fastjson import dumps_canonical
+from .metrics import CACHE_LOOKUPS
+
+JSON = Dict[str, Any]
+
+# Location fields that only label a place for humans (or drift between data refreshes)
+# and never change what hiring.cafe counts.
+VOLATILE_LOCATION_FIELDS = frozenset({"id", "formatted_address", "population"})
+
+
+def canonical_search_state(search_state: JSON) -> JSON:
+    """
+    Copy of `search_state` with volatile per-location fields removed, so two states
+    that ask upstream the same question compare equal.
+    """
+    st = dict(search_state)
+    locations = st.get("locations")
+    if isinstance(locations, list):
+        st["locations"] = [
+            {k: v for k, v in loc.items() if k not in VOLATILE_LOCATION_FIELDS} if isinstance(loc, dict) else loc
+            for loc in locations
+        ]
+    return st
+
+
+def canonical_json(obj: Any) -> str:
+    return dumps_canonical(obj).decode("utf-8")
+
+
+def canonical_search_state_key(search_state: JSON) -> str:
+    """Content address (sha256 hex) of a search state."""
+    return hashlib.sha256(dumps_canonical(canonical_search_state(search_state))).hexdigest()
+
+
+class ResponseCache(ABC):
+    """
+    TTL cache of upstream responses keyed by canonical_search_state_key.
+    Subclasses store entries; this base tracks hits/misses and triggers eviction.
+    """
+
+    evict_every = 500
+
+    def __init__(self, ttl_s: float, max_entries: int) -> None:
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._sets_since_evict = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[JSON]:
+        value = self._get(key, time.time() - self.ttl_s)
+        CACHE_LOOKUPS.inc(result="miss" if value is None else "hit")
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: JSON) -> None:
+        self._set(key, value, time.time())
+        with self._lock:
+            self._sets_since_evict += 1
+            due = self._sets_since_evict >= self.evict_every
+            if due:
+                self._sets_since_evict = 0
+        if due:
+            self.evict()
+
+    def evict(self) -> None:
+        self._evict(time.time() - self.ttl_s)
+
+    def close(self) -> None:
+        pass
+
+    @abstractmethod
+    def _get(self, key: str, fresh_after: float) -> Optional[JSON]:
+        ...
+
+    @abstractmethod
+    def _set(self, key: str, value: JSON, stored_at: float) -> None:
+        ...
+
+    @abstractmethod
+    def _evict(self, fresh_after: float) -> None:
+        ...
+
+
+class SqliteResponseCache(ResponseCache):
+    def __init__(self, path: Path, ttl_s: float, max_entries: int = 500_000) -> None:
+        super().__init__(ttl_s, max_entries)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                stored_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS response_cache_stored_at_idx ON response_cache (stored_at)")
+
+    def _get(self, key: str, fresh_after: float) -> Optional[JSON]:
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT value FROM response_cache WHERE key = ? AND stored_at >= ?",
+                (key, fresh_after),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _set(self, key: str, value: JSON, stored_at: float) -> None:
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, stored_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), stored_at),
+            )
+
+    def _evict(self, fresh_after: float) -> None:
+        with self._db_lock:
+            self._conn.execute("DELETE FROM response_cache WHERE stored_at < ?", (fresh_after,))
+            self._conn.execute(
+                """
+                DELETE FROM response_cache WHERE key IN (
+                    SELECT key FROM response_cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+
+    def close(self) -> None:
+        with self._db_lock:
+            self._conn.close()
+
+
+class PgResponseCache(ResponseCache):
+    def __init__(self, pg_url: str, table: str, ttl_s: float, max_entries: int = 500_000) -> None:
+        super().__init__(ttl_s, max_entries)
+        psycopg = ensure_psycopg()
+        self._sql = psycopg.sql
+        self._table = self._sql.Identifier(table)
+        self._db_lock = threading.Lock()
+        self._conn = psycopg.connect(pg_url, autocommit=True)
+        with self._conn.cursor() as cur:
+            cur.execute(
+                self._sql.SQL(
+                    """
+                    CREATE TABLE IF NOT EXISTS {table_name} (
+                        key TEXT PRIMARY KEY,
+                        value JSONB NOT NULL,
+                        stored_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                    )
+                    """
+                ).format(table_name=self._table)
+            )
+            cur.execute(
+                self._sql.SQL("CREATE INDEX IF NOT EXISTS {idx} ON {table_name} (stored_at)").format(
+                    idx=self._sql.Identifier(f"{table}_stored_at_idx"),
+                    table_name=self._table,
+                )
+            )
+
+    def _get(self, key: str, fresh_after: float) -> Optional[JSON]:
+        with self._db_lock, self._conn.cursor() as cur:
+            cur.execute(
+                self._sql.SQL(
+                    "SELECT value FROM {table_name} WHERE key = %s AND stored_at >= to_timestamp(%s)"
+                ).format(table_name=self._table),
+                (key, fresh_after),
+            )
+            row = cur.fetchone()
+        return row[0] if row else None
+
+    def _set(self, key: str, value: JSON, stored_at: float) -> None:
+        with self._db_lock, self._conn.cursor() as cur:
+            cur.execute(
+                self._sql.SQL(
+                    """
+                    INSERT INTO {table_name} (key, value, stored_at) VALUES (%s, %s, to_timestamp(%s))
+                    ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, stored_at = EXCLUDED.stored_at
+                    """
+                ).format(table_name=self._table),
+                (key, json.dumps(value), stored_at),
+            )
+
+    def _evict(self, fresh_after: float) -> None:
+        with self._db_lock, self._conn.cursor() as cur:
+            cur.execute(
+                self._sql.SQL("DELETE FROM {table_name} WHERE stored_at < to_timestamp(%s)").format(
+                    table_name=self._table
+                ),
+                (fresh_after,),
+            )
+            cur.execute(
+                self._sql.SQL(
+                    """
+                    DELETE FROM {table_name} WHERE key IN (
+                        SELECT key FROM {table_name} ORDER BY stored_at DESC OFFSET %s
+                    )
+                    """
+                ).format(table_name=self._table),
+                (self.max_entries,),
+            )
+
+    def close(self) -> None:
+        with self._db_lock:
+            self._conn.close()
+
+
+def build_response_cache(
+    backend: str,
+    ttl_s: float,
+    max_entries: int,
+    path: Optional[str] = None,
+    pg_url: Optional[str] = None,
+    pg_table: str = "response_cache",
+) -> Optional[ResponseCache]:
+    """
+    backend: none | sqlite | pg. Returns None when caching is disabled.
+    """
+    if backend == "sqlite":
+        return SqliteResponseCache(Path(path or "data/response_cache.sqlite"), ttl_s, max_entries)
+    if backend == "pg":
+        if not pg_url:
+            raise RuntimeError("--cache pg requires --pg-url")
+        return PgResponseCache(pg_url, pg_table, ttl_s, max_entries)
+    return None
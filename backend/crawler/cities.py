@@ -3,8 +3,6 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import List, Optional
 
-import geonamescache
-
 
 @dataclass(frozen=True)
 class City:
@@ -21,7 +19,23 @@ def load_us_cities(
     limit: Optional[int] = None,
 ) -> List[City]:
     """
-    Load US cities from the public geonames cache dataset.
+    Load US cities, largest first. Reads the precompiled index (crawler/city_index.py)
+    when it is present and current; otherwise scans the geonamescache dataset.
+    """
+    from .city_index import open_city_index
+
+    index = open_city_index()
+    if index is not None:
+        return index.cities(min_population, limit)
+    cities = scan_geonamescache_cities(min_population)
+    if limit:
+        cities = cities[:limit]
+    return cities
+
+
+def scan_geonamescache_cities(min_population: int = 0) -> List[City]:
+    """
+    Walk the public geonames cache dataset for US cities, sorted by population.
     Requires the `geonamescache` package (public domain data).
     """
     gc = _import_geonamescache()
@@ -66,8 +80,6 @@ def load_us_cities(
         )
 
     cities.sort(key=lambda c: c.population, reverse=True)
-    if limit:
-        cities = cities[:limit]
     return cities
 
 
@@ -78,6 +90,8 @@ def load_us_states():
 
 def _import_geonamescache():
     try:
+        import geonamescache
+
         return geonamescache.GeonamesCache()
     except Exception as exc:
         raise RuntimeError(
@@ -0,0 +1,212 @@
+"""
+Precompiled US city index.
+
+`load_us_cities` used to build a GeonamesCache and scan every worldwide city on each
+call. The index stores the filtered US cities once, sorted by population (descending)
+as fixed-width records, so a load is a binary search for the population cut-off plus
+decoding only the rows that are returned. Build it with:
+
+    cd backend
+    python -m crawler.city_index            # writes data/us_cities.idx
+    python -m crawler.city_index --out /tmp/us_cities.idx
+
+Layout (little-endian): header | state table | city records | UTF-8 string blob.
+The header records the format version and the geonamescache version it was built
+from; a mismatch marks the index stale and callers fall back to the scan.
+"""
+from __future__ import annotations
+
+import argparse
+import bisect
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .cities import City
+
+MAGIC = b"USCITIDX"
+FORMAT_VERSION = 1
+DEFAULT_INDEX_PATH = Path(__file__).resolve().parent.parent / "data" / "us_cities.idx"
+
+# magic, format version, state count, city count, string blob offset, source tag
+_HEADER = struct.Struct("<8sHHII32s")
+# code, name offset, name length
+_STATE = struct.Struct("<2sIH")
+# latitude, longitude, population, name offset, name length, state index, pad
+_RECORD = struct.Struct("<ddIIHBx")
+_POPULATION = struct.Struct("<I")
+_POPULATION_OFFSET = 16
+
+
+def index_path() -> Path:
+    return Path(os.getenv("JOBS_CITY_INDEX") or DEFAULT_INDEX_PATH)
+
+
+def source_tag() -> str:
+    """Identifies the data the index was built from (the installed geonamescache)."""
+    try:
+        import geonamescache  # module import only; the dataset is not loaded
+    except ImportError:
+        return ""
+    return f"geonamescache {getattr(geonamescache, '__version__', '')}"
+
+
+class _Populations(Sequence[int]):
+    """Negated populations read straight from the mapped records, for bisect."""
+
+    def __init__(self, index: "CityIndex") -> None:
+        self._index = index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __getitem__(self, i):  # type: ignore[override]
+        return -_POPULATION.unpack_from(self._index._buf, self._index._record_offset(i) + _POPULATION_OFFSET)[0]
+
+
+class CityIndex:
+    """Read-only view over an index file; City objects are decoded on first use."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with path.open("rb") as fh:
+            self._buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n_states, n_cities, strings_off, tag = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a city index")
+        self.version = version
+        self.source = tag.rstrip(b"\0").decode("ascii")
+        self._count = n_cities
+        self._strings_off = strings_off
+        self._records_off = _HEADER.size + n_states * _STATE.size
+        self._states: List[Tuple[str, str]] = []
+        for i in range(n_states):
+            code, off, length = _STATE.unpack_from(self._buf, _HEADER.size + i * _STATE.size)
+            self._states.append((code.decode("ascii"), self._string(off, length)))
+        self._decoded: List[City] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _record_offset(self, i: int) -> int:
+        return self._records_off + i * _RECORD.size
+
+    def _string(self, off: int, length: int) -> str:
+        start = self._strings_off + off
+        return self._buf[start : start + length].decode("utf-8")
+
+    def count_at_least(self, min_population: int) -> int:
+        """Number of cities with population >= min_population (they are a prefix)."""
+        return bisect.bisect_right(_Populations(self), -min_population)
+
+    def cities(self, min_population: int = 0, limit: Optional[int] = None) -> List[City]:
+        n = self.count_at_least(min_population)
+        if limit:
+            n = min(n, limit)
+        if n > len(self._decoded):
+            with self._lock:
+                for i in range(len(self._decoded), n):
+                    lat, lon, population, name_off, name_len, state_idx = _RECORD.unpack_from(
+                        self._buf, self._record_offset(i)
+                    )
+                    state_code, state_name = self._states[state_idx]
+                    self._decoded.append(
+                        City(
+                            name=self._string(name_off, name_len),
+                            state_code=state_code,
+                            state_name=state_name,
+                            latitude=lat,
+                            longitude=lon,
+                            population=population,
+                        )
+                    )
+        return self._decoded[:n]
+
+
+def write_city_index(path: Path, cities: List[City], source: Optional[str] = None) -> int:
+    """Write `cities` as an index file (atomically). Returns the number of cities written."""
+    ordered = sorted(cities, key=lambda c: c.population, reverse=True)
+    strings = bytearray()
+    offsets: Dict[str, Tuple[int, int]] = {}
+
+    def intern(s: str) -> Tuple[int, int]:
+        if s not in offsets:
+            raw = s.encode("utf-8")
+            offsets[s] = (len(strings), len(raw))
+            strings.extend(raw)
+        return offsets[s]
+
+    states: Dict[Tuple[str, str], int] = {}
+    for c in ordered:
+        states.setdefault((c.state_code, c.state_name), len(states))
+    if len(states) > 255:
+        raise ValueError("city index supports at most 255 distinct states")
+
+    body = bytearray()
+    for code, name in states:
+        off, length = intern(name)
+        body += _STATE.pack(code.encode("ascii"), off, length)
+    for c in ordered:
+        off, length = intern(c.name)
+        body += _RECORD.pack(c.latitude, c.longitude, c.population, off, length, states[(c.state_code, c.state_name)])
+
+    tag = (source if source is not None else source_tag()).encode("ascii")[:32]
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, len(states), len(ordered), _HEADER.size + len(body), tag)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with tmp.open("wb") as fh:
+        fh.write(header)
+        fh.write(body)
+        fh.write(strings)
+    os.replace(tmp, path)
+    return len(ordered)
+
+
+_OPEN: Dict[Path, Tuple[float, CityIndex]] = {}
+_OPEN_LOCK = threading.Lock()
+
+
+def open_city_index(path: Optional[Path] = None) -> Optional[CityIndex]:
+    """
+    The index at `path` (default: JOBS_CITY_INDEX or data/us_cities.idx), or None when
+    it is missing, unreadable or stale. Opened once per process and file version.
+    """
+    path = Path(path) if path else index_path()
+    try:
+        mtime = path.stat().st_mtime
+    except OSError:
+        return None
+    with _OPEN_LOCK:
+        cached = _OPEN.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            index = CityIndex(path)
+        except (OSError, ValueError, struct.error):
+            return None
+        current = source_tag()
+        if index.version != FORMAT_VERSION or (current and index.source != current):
+            return None
+        _OPEN[path] = (mtime, index)
+        return index
+
+
+def main() -> None:
+    from .cities import scan_geonamescache_cities
+
+    ap = argparse.ArgumentParser(description="Build the precompiled US city index from geonamescache.")
+    ap.add_argument("--out", default=str(index_path()), help="Index file to write (default: %(default)s).")
+    args = ap.parse_args()
+
+    start = time.perf_counter()
+    count = write_city_index(Path(args.out), scan_geonamescache_cities(min_population=0))
+    print(f"Wrote {count} cities to {args.out} ({source_tag() or 'unknown source'}) in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import sys
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from .cities import City
+
+
+def ensure_numpy():
+    try:
+        import numpy
+    except ImportError as exc:
+        raise RuntimeError("numpy is required for city tables. Install with `pip install numpy`.") from exc
+    return numpy
+
+
+class CityTable:
+    """
+    Struct-of-arrays copy of a city list: coordinates, population, land area and radius
+    live in NumPy arrays and names are interned, so per-city math (radii, distances)
+    runs as one vectorised pass. Rows come back out as ordinary City values.
+    """
+
+    def __init__(self, cities: Iterable[City]) -> None:
+        np = ensure_numpy()
+        rows = list(cities)
+        n = len(rows)
+        self.names: List[str] = [sys.intern(c.name) for c in rows]
+        self.state_codes: List[str] = [sys.intern(c.state_code) for c in rows]
+        self.state_names: List[str] = [sys.intern(c.state_name) for c in rows]
+        self.lat = np.fromiter((c.latitude for c in rows), dtype=np.float64, count=n)
+        self.lon = np.fromiter((c.longitude for c in rows), dtype=np.float64, count=n)
+        self.population = np.fromiter((c.population for c in rows), dtype=np.int64, count=n)
+        self.area_sqmi = np.full(n, np.nan)
+        self.radius = np.full(n, np.nan)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getitem__(self, i: int) -> City:
+        return City(
+            name=self.names[i],
+            state_code=self.state_codes[i],
+            state_name=self.state_names[i],
+            latitude=float(self.lat[i]),
+            longitude=float(self.lon[i]),
+            population=int(self.population[i]),
+        )
+
+    def __iter__(self) -> Iterator[City]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def attach_areas(self, area_lookup: Mapping[Tuple[str, str], float], map_boroughs: bool = False) -> int:
+        """Fill area_sqmi from a Gazetteer lookup (see areas.area_for_city). Returns rows matched."""
+        from .areas import area_for_city
+
+        matched = 0
+        for i, (name, state) in enumerate(zip(self.names, self.state_codes)):
+            area = area_for_city(area_lookup, name, state, map_boroughs)
+            if area:
+                self.area_sqmi[i] = area
+                matched += 1
+        return matched
+
+    def radii_from_area(self, default_radius: float, min_radius: float, max_radius: float):
+        """
+        Same result as areas.radius_from_lookup for every row: sqrt(area / pi), clamped,
+        rounded to 5 miles; rows without an area get default_radius.
+        """
+        np = ensure_numpy()
+        area = self.area_sqmi
+        has_area = area > 0
+        raw = np.sqrt(np.where(has_area, area, 0.0) / np.pi)
+        rounded = np.round(np.clip(raw, min_radius, max_radius) / 5.0) * 5.0
+        self.radius = np.where(has_area, np.clip(rounded, 5.0, 50.0), float(default_radius))
+        return self.radius
+
+    def radii_from_population(self, density_per_sq_mile: float, min_radius: float, max_radius: float, fallback: float):
+        """Radius of a disc holding the population at `density_per_sq_mile`, clamped."""
+        np = ensure_numpy()
+        pop = self.population.astype(np.float64)
+        if density_per_sq_mile <= 0:
+            self.radius = np.full(len(self), float(fallback))
+            return self.radius
+        raw = np.sqrt(pop / density_per_sq_mile / np.pi)
+        self.radius = np.where(pop > 0, np.clip(raw, min_radius, max_radius), float(fallback))
+        return self.radius
+
+    def radius_lookup(self, fallback: Optional[Callable[[City], float]] = None) -> Callable[[City], float]:
+        """
+        City -> radius from the last computed radii. Cities outside the table go to
+        `fallback` (the scalar selector) when given.
+        """
+        keys = zip(self.names, self.state_codes, self.lat.tolist(), self.lon.tolist())
+        by_key: Dict[Tuple[str, str, float, float], float] = dict(zip(keys, self.radius.tolist()))
+
+        def radius_for(city: City) -> float:
+            key = (city.name, city.state_code, city.latitude, city.longitude)
+            radius = by_key.get(key)
+            if radius is None:
+                if fallback is None:
+                    raise KeyError(f"{city.name}, {city.state_code} is not in the city table")
+                radius = by_key[key] = fallback(city)
+            return radius
+
+        return radius_for
@@ -1,8 +1,18 @@
 from __future__ import annotations
 
 import time
+
 import requests
-from typing import Any, Dict, Optional
+from requests.adapters import HTTPAdapter
+from typing import Any, Dict, Optional, Union
+
+from .cache import ResponseCache, canonical_search_state_key
+from .fastjson import dumps_canonical, loads
+from .metrics import RATELIMIT_RATE, RATELIMIT_WAIT, UPSTREAM_LATENCY, UPSTREAM_REQUESTS
+from .ratelimit import AdaptiveRateLimiter, parse_retry_after, shared_rate_limiter
+from .singleflight import SingleFlight
+from .state_template import PreparedCount
+from .tracing import span
 
 JSON = Dict[str, Any]
 
@@ -16,44 +26,145 @@ DEFAULT_HEADERS = {
 }
 
 
+COUNT_PATH = "/api/search-jobs/get-total-count"
+
+
+def count_request_body(search_state: Union[JSON, PreparedCount]) -> bytes:
+    if isinstance(search_state, PreparedCount):
+        return search_state.body
+    return dumps_canonical({"searchState": search_state})
+
+
+def extract_total(count_response: JSON) -> int:
+    if isinstance(count_response, dict):
+        if "total" in count_response and isinstance(count_response["total"], int):
+            return count_response["total"]
+        if "count" in count_response and isinstance(count_response["count"], int):
+            return count_response["count"]
+    raise ValueError(f"Unexpected count response shape: {count_response}")
+
+
+def is_count_response(raw: Any) -> bool:
+    """True when `raw` is a count body extract_total accepts; only those are cached."""
+    try:
+        extract_total(raw)
+    except ValueError:
+        return False
+    return True
+
+
+class HiringCafeHTTPError(requests.HTTPError):
+    """
+    Non-2xx response from hiring.cafe; keeps the status and Retry-After for retry decisions.
+    """
+
+    def __init__(self, *args, status: Optional[int] = None, retry_after_s: Optional[float] = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.status = status
+        self.retry_after_s = retry_after_s
+
+
+def default_rate_limiter(base_url: str, min_delay_s: float) -> Optional[AdaptiveRateLimiter]:
+    """
+    Shared limiter for `base_url` that enforces `min_delay_s` between requests
+    (as a 1/min_delay_s req/s bucket). Returns None when no delay is requested.
+    """
+    if min_delay_s <= 0:
+        return None
+    return shared_rate_limiter(base_url.rstrip("/"), rate=1.0 / min_delay_s)
+
+
 class HiringCafeClient:
     def __init__(
         self,
         base_url: str = "https://hiring.cafe",
         timeout_s: int = 30,
         min_delay_s: float = 0.35,  # be polite; prevents hammering
+        pool_size: int = 10,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None,
+        cache: Optional[ResponseCache] = None,
     ) -> None:
         self.base_url = base_url.rstrip("/")
         self.timeout_s = timeout_s
         self.min_delay_s = min_delay_s
+        self.cache = cache
+        # Identical in-flight count requests (same canonical key) share one upstream call.
+        self.singleflight = SingleFlight()
+        # One bucket per upstream per process, so every worker thread (and every
+        # client built for the same host) draws from the same budget.
+        self.rate_limiter = rate_limiter or default_rate_limiter(self.base_url, min_delay_s)
+        if self.rate_limiter:
+            RATELIMIT_RATE.set_function(lambda limiter=self.rate_limiter: limiter.rate, upstream=self.base_url)
         self._session = requests.Session()
         self._session.headers.update(DEFAULT_HEADERS)
-        self._last_request_ts = 0.0
-
-    def _throttle(self) -> None:
-        elapsed = time.time() - self._last_request_ts
-        if elapsed < self.min_delay_s:
-            time.sleep(self.min_delay_s - elapsed)
+        # urllib3 keeps 10 connections per host by default; size it to the worker count
+        # so higher concurrency reuses keep-alive connections instead of churning them.
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
 
     def post_json(self, path: str, payload: JSON) -> JSON:
-        self._throttle()
+        return self.post_body(path, dumps_canonical(payload))
+
+    def post_body(self, path: str, body: bytes) -> JSON:
+        """POST an already-encoded JSON body (see state_template.PreparedCount)."""
+        if self.rate_limiter:
+            with span("ratelimit_wait", cat="ratelimit"):
+                RATELIMIT_WAIT.observe(self.rate_limiter.acquire())
         url = f"{self.base_url}{path}"
-        resp = self._session.post(url, json=payload, timeout=self.timeout_s)
-        self._last_request_ts = time.time()
+        with span(f"POST {path}", cat="http") as trace_args:
+            start = time.perf_counter()
+            try:
+                resp = self._session.post(url, data=body, timeout=self.timeout_s)
+            except requests.RequestException:
+                UPSTREAM_LATENCY.observe(time.perf_counter() - start)
+                UPSTREAM_REQUESTS.inc(status="error")
+                trace_args["status"] = "error"
+                if self.rate_limiter:
+                    self.rate_limiter.on_response(None)
+                raise
+            UPSTREAM_LATENCY.observe(time.perf_counter() - start)
+            UPSTREAM_REQUESTS.inc(status=str(resp.status_code))
+            trace_args["status"] = resp.status_code
+        retry_after_s = parse_retry_after(resp.headers.get("Retry-After"))
+        if self.rate_limiter:
+            self.rate_limiter.on_response(resp.status_code, retry_after_s)
 
         # Raise useful error
         try:
             resp.raise_for_status()
         except requests.HTTPError as e:
             # Attach response text for debugging
-            raise requests.HTTPError(
-                f"{e} | status={resp.status_code} | body={resp.text[:400]}"
+            raise HiringCafeHTTPError(
+                f"{e} | status={resp.status_code} | body={resp.text[:400]}",
+                status=resp.status_code,
+                retry_after_s=retry_after_s,
+                response=resp,
             ) from e
 
-        return resp.json()
+        return loads(resp.content)
+
+    def get_total_count(self, search_state: Union[JSON, PreparedCount]) -> JSON:
+        """
+        Count for a searchState dict, or for a PreparedCount from a SearchStateTemplate
+        (which skips re-encoding and re-hashing the state).
+        """
+        if isinstance(search_state, PreparedCount):
+            key = search_state.key
+        else:
+            key = canonical_search_state_key(search_state)
+        return self.singleflight.do(key, lambda: self._fetch_total_count(key, search_state))
 
-    def get_total_count(self, search_state: JSON) -> JSON:
-        return self.post_json(
-            "/api/search-jobs/get-total-count",
-            {"searchState": search_state},
-        )
+    def _fetch_total_count(self, key: str, search_state: Union[JSON, PreparedCount]) -> JSON:
+        if self.cache:
+            with span("cache_get", cat="cache") as trace_args:
+                cached = self.cache.get(key)
+                trace_args["hit"] = cached is not None
+            # Entries written before bodies were validated may be malformed; refetch those.
+            if cached is not None and is_count_response(cached):
+                return cached
+        raw = self.post_body(COUNT_PATH, count_request_body(search_state))
+        # An unexpected body would otherwise fail every re-run until the TTL expires.
+        if self.cache and is_count_response(raw):
+            self.cache.set(key, raw)
+        return raw
@@ -5,6 +5,8 @@ import os
 from pathlib import Path
 from typing import List
 
+from .db import BULK_MIN_ROWS
+
 
 QUERIES_BY_CATEGORY = {
     "frontend": [
@@ -70,6 +72,17 @@ SENIORITY_LEVELS = {
     "all": [],
 }
 
+# Role presets swept by `--mode sweep` (and shown in the frontend); key -> searchQuery.
+ROLE_QUERIES = {
+    "software": "Software Engineer",
+    "frontend": "Frontend Engineer",
+    "backend": "Backend Engineer",
+    "fullstack": "Full Stack Engineer",
+    "devops": "DevOps Engineer",
+    "data": "Data Engineer",
+    "mobile": "Mobile Developer",
+}
+
 # Backwards-compatible default set for simple runs.
 JOB_QUERIES = [
     "software engineer",
@@ -133,9 +146,76 @@ def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Fetch hiring.cafe job counts.")
     parser.add_argument(
         "--mode",
-        choices=["queries", "cities"],
+        choices=["queries", "cities", "sweep", "worker"],
         default=os.getenv("JOBS_MODE", "queries"),
-        help="queries=use JOB_QUERIES list, cities=iterate US cities with radius",
+        help="queries=use JOB_QUERIES list, cities=iterate US cities with radius, "
+        "sweep=every role x seniority cell over US cities in one process, "
+        "worker=pull sweep tasks from the Postgres work queue (see --enqueue)",
+    )
+    parser.add_argument(
+        "--roles",
+        default=os.getenv("JOBS_ROLES", ",".join(ROLE_QUERIES)),
+        help="Sweep mode: comma-separated ROLE_QUERIES keys or literal queries.",
+    )
+    parser.add_argument(
+        "--seniority-levels",
+        default=os.getenv("JOBS_SENIORITY_LEVELS", "entry,mid,senior,all"),
+        help="Sweep mode: comma-separated seniority sets to cross with --roles.",
+    )
+    parser.add_argument(
+        "--states",
+        default=os.getenv("JOBS_STATES"),
+        help="Sweep mode: only include cities in these comma-separated state codes.",
+    )
+    parser.add_argument(
+        "--sweep-spec",
+        default=os.getenv("JOBS_SWEEP_SPEC"),
+        help="Sweep mode: JSON file with roles/seniorities/min_population/city_limit/states (overrides flags).",
+    )
+    parser.add_argument(
+        "--resume",
+        default=os.getenv("JOBS_RESUME"),
+        metavar="RUN_ID",
+        help="Sweep mode: continue a checkpointed run, skipping cells/cities already saved for its run_date.",
+    )
+    parser.add_argument(
+        "--flush-every",
+        type=int,
+        default=env_int("JOBS_FLUSH_EVERY", BULK_MIN_ROWS),
+        help=(
+            "Sweep mode: commit results to Postgres every N completed cities. "
+            f"Batches of {BULK_MIN_ROWS}+ rows are written with COPY; smaller ones row by row."
+        ),
+    )
+    parser.add_argument(
+        "--plan-stale",
+        action="store_true",
+        default=env_bool("JOBS_PLAN_STALE", False),
+        help="Sweep mode: only fetch cells whose last successful count is older than its tier TTL (needs --pg-url).",
+    )
+    parser.add_argument(
+        "--plan-only",
+        action="store_true",
+        default=env_bool("JOBS_PLAN_ONLY", False),
+        help="With --plan-stale: print the refresh plan and exit without fetching.",
+    )
+    parser.add_argument(
+        "--refresh-tiers",
+        default=os.getenv("JOBS_REFRESH_TIERS"),
+        help="Refresh TTLs as min_population:ttl_hours pairs (default 1000000:24,250000:72,0:168). "
+        "Volatile counts get half the TTL, stable ones double.",
+    )
+    parser.add_argument(
+        "--refresh-budget",
+        type=int,
+        default=env_int("JOBS_REFRESH_BUDGET", 0),
+        help="Cap on requests per planned refresh, most overdue first (0 = no cap).",
+    )
+    parser.add_argument(
+        "--refresh-lookback-days",
+        type=int,
+        default=env_int("JOBS_REFRESH_LOOKBACK_DAYS", 60),
+        help="History window used for staleness and volatility.",
     )
     parser.add_argument(
         "--radius-miles",
@@ -161,6 +241,138 @@ def parse_args() -> argparse.Namespace:
         default=env_int("JOBS_CONCURRENCY", 1),
         help="Number of parallel requests for city mode (be polite; 3-5 is reasonable).",
     )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=env_float("JOBS_RATE", 2.0),
+        help="Starting request rate (req/s) shared by all workers; backs off on 429/5xx. 0 disables throttling.",
+    )
+    parser.add_argument(
+        "--max-rate",
+        type=float,
+        default=env_float("JOBS_MAX_RATE", 0.0),
+        help="Ceiling the adaptive limiter may climb to while responses are healthy (0 = --rate).",
+    )
+    parser.add_argument(
+        "--burst",
+        type=int,
+        default=env_int("JOBS_BURST", 1),
+        help="Token-bucket burst size for the shared rate limiter.",
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=env_int("JOBS_MAX_RETRIES", 3),
+        help="Retries per count request for 429/5xx/timeouts (0 = fail fast).",
+    )
+    parser.add_argument(
+        "--retry-base-delay",
+        type=float,
+        default=env_float("JOBS_RETRY_BASE_DELAY", 1.0),
+        help="Base delay (s) for jittered exponential backoff between retries.",
+    )
+    parser.add_argument(
+        "--breaker-threshold",
+        type=float,
+        default=env_float("JOBS_BREAKER_THRESHOLD", 0.5),
+        help="Failure ratio over the recent window that opens the circuit breaker (0 = disabled).",
+    )
+    parser.add_argument(
+        "--breaker-min-requests",
+        type=int,
+        default=env_int("JOBS_BREAKER_MIN_REQUESTS", 20),
+        help="Minimum outcomes in the window before the breaker may open.",
+    )
+    parser.add_argument(
+        "--breaker-cooldown-s",
+        type=float,
+        default=env_float("JOBS_BREAKER_COOLDOWN_S", 60.0),
+        help="How long an open breaker pauses the sweep before probing again.",
+    )
+    parser.add_argument(
+        "--breaker-mode",
+        choices=["pause", "abort"],
+        default=os.getenv("JOBS_BREAKER_MODE", "pause"),
+        help="pause=wait out the cooldown and probe, abort=fail remaining cities immediately.",
+    )
+    parser.add_argument(
+        "--cache",
+        choices=["none", "sqlite", "pg"],
+        default=os.getenv("JOBS_CACHE", "none"),
+        help="Cache upstream count responses by canonical searchState (pg uses --pg-url).",
+    )
+    parser.add_argument(
+        "--cache-path",
+        default=os.getenv("JOBS_CACHE_PATH", "data/response_cache.sqlite"),
+        help="SQLite file for --cache sqlite.",
+    )
+    parser.add_argument(
+        "--cache-table",
+        default=os.getenv("JOBS_CACHE_TABLE", "response_cache"),
+        help="Postgres table for --cache pg.",
+    )
+    parser.add_argument(
+        "--cache-ttl-hours",
+        type=float,
+        default=env_float("JOBS_CACHE_TTL_HOURS", 20.0),
+        help="How long a cached count stays fresh.",
+    )
+    parser.add_argument(
+        "--cache-max-entries",
+        type=int,
+        default=env_int("JOBS_CACHE_MAX_ENTRIES", 500000),
+        help="Oldest entries beyond this many are evicted.",
+    )
+    parser.add_argument(
+        "--trace",
+        default=os.getenv("JOBS_TRACE"),
+        metavar="OUT_JSON",
+        help="Record a Chrome trace-event timeline (city loading, area lookup, requests, limiter waits, DB flushes).",
+    )
+    parser.add_argument(
+        "--metrics-textfile",
+        default=os.getenv("JOBS_METRICS_TEXTFILE"),
+        help="Write Prometheus metrics to this file periodically (node_exporter textfile collector).",
+    )
+    parser.add_argument(
+        "--metrics-push-url",
+        default=os.getenv("JOBS_METRICS_PUSH_URL"),
+        help="Push Prometheus metrics to this Pushgateway periodically.",
+    )
+    parser.add_argument(
+        "--metrics-job",
+        default=os.getenv("JOBS_METRICS_JOB", "jobs_crawler"),
+        help="Pushgateway job name.",
+    )
+    parser.add_argument(
+        "--metrics-interval-s",
+        type=float,
+        default=env_float("JOBS_METRICS_INTERVAL_S", 15.0),
+        help="Seconds between metrics exports (a final export always runs on exit).",
+    )
+    parser.add_argument(
+        "--base-url",
+        default=os.getenv("JOBS_BASE_URL", "https://hiring.cafe"),
+        help="hiring.cafe origin; point at bench/mock_server.py for local runs and benchmarks.",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["threads", "async"],
+        default=os.getenv("JOBS_ENGINE", "threads"),
+        help="City mode engine: threads=ThreadPoolExecutor + requests, async=asyncio + aiohttp.",
+    )
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        default=env_int("JOBS_POOL_SIZE", 0),
+        help="Keep-alive HTTP connections to hiring.cafe (0 = match --concurrency, min 10 for threads).",
+    )
+    parser.add_argument(
+        "--keepalive-s",
+        type=float,
+        default=env_float("JOBS_KEEPALIVE_S", 30.0),
+        help="Idle keep-alive timeout for pooled connections (async engine).",
+    )
     parser.add_argument(
         "--query",
         default=os.getenv("JOBS_QUERY", ""),
@@ -191,13 +403,13 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--output",
         default=os.getenv("JOBS_OUTPUT"),
-        help="Optional file path to write city-mode results (json or csv).",
+        help="Optional file path to stream city/sweep results to (json, ndjson or csv).",
     )
     parser.add_argument(
         "--output-format",
-        choices=["json", "csv"],
+        choices=["json", "ndjson", "csv"],
         default=os.getenv("JOBS_OUTPUT_FORMAT", "json"),
-        help="Format for --output when in city mode.",
+        help="Format for --output. Records are written as they arrive; ndjson is line-flushed.",
     )
     parser.add_argument(
         "--pg-url",
@@ -209,6 +421,63 @@ def parse_args() -> argparse.Namespace:
         default=os.getenv("JOBS_PG_TABLE", "city_counts"),
         help="Postgres table name for city results.",
     )
+    parser.add_argument(
+        "--pg-runs-table",
+        default=os.getenv("JOBS_PG_RUNS_TABLE", "sweep_runs"),
+        help="Postgres table for sweep checkpoints (<table>_cells holds finished cells).",
+    )
+    parser.add_argument(
+        "--enqueue",
+        action="store_true",
+        default=env_bool("JOBS_ENQUEUE", False),
+        help="Sweep mode: put the tasks on the Postgres work queue for --mode worker processes instead of running them.",
+    )
+    parser.add_argument(
+        "--queue-table",
+        default=os.getenv("JOBS_QUEUE_TABLE", "crawl_queue"),
+        help="Postgres work-queue table shared by sweep --enqueue and worker mode.",
+    )
+    parser.add_argument(
+        "--queue-run",
+        default=os.getenv("JOBS_QUEUE_RUN"),
+        metavar="RUN_ID",
+        help="Worker mode: only claim tasks from this run (default: any).",
+    )
+    parser.add_argument(
+        "--worker-id",
+        default=os.getenv("JOBS_WORKER_ID"),
+        help="Worker mode: lease owner name (default: hostname-pid).",
+    )
+    parser.add_argument(
+        "--lease-s",
+        type=float,
+        default=env_float("JOBS_LEASE_S", 300.0),
+        help="Worker mode: task lease; leases are renewed while a batch runs and expire if the worker dies.",
+    )
+    parser.add_argument(
+        "--queue-batch",
+        type=int,
+        default=env_int("JOBS_QUEUE_BATCH", 0),
+        help="Worker mode: tasks claimed per batch (0 = 4 x --concurrency).",
+    )
+    parser.add_argument(
+        "--queue-max-attempts",
+        type=int,
+        default=env_int("JOBS_QUEUE_MAX_ATTEMPTS", 3),
+        help="Worker mode: claims per task before it is left as failed.",
+    )
+    parser.add_argument(
+        "--worker-poll-s",
+        type=float,
+        default=env_float("JOBS_WORKER_POLL_S", 5.0),
+        help="Worker mode: sleep between claims when the queue is empty.",
+    )
+    parser.add_argument(
+        "--worker-forever",
+        action="store_true",
+        default=env_bool("JOBS_WORKER_FOREVER", False),
+        help="Worker mode: keep polling instead of exiting once the queue drains.",
+    )
     parser.add_argument(
         "--pg-areas-table",
         default=os.getenv("JOBS_PG_AREAS_TABLE", "city_areas"),
@@ -220,6 +489,20 @@ def parse_args() -> argparse.Namespace:
         default=env_bool("JOBS_PG_CREATE_TABLE", False),
         help="Create the Postgres table if it does not exist.",
     )
+    parser.add_argument(
+        "--pg-partitioned",
+        action="store_true",
+        default=env_bool("JOBS_PG_PARTITIONED", False),
+        help="With --pg-create-table, create the counts table partitioned by month of run_date "
+        "(see python -m crawler.partitions).",
+    )
+    parser.add_argument(
+        "--pg-storage",
+        choices=["wide", "normalized"],
+        default=os.getenv("JOBS_PG_STORAGE", "wide"),
+        help="With --pg-create-table: one wide row per count, or city/query dimension tables "
+        "plus a narrow fact table (see python -m crawler.normalize).",
+    )
     parser.add_argument(
         "--pg-load-gazetteer-to-pg",
         action="store_true",
@@ -229,7 +512,7 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--gazetteer-path",
         default=os.getenv("JOBS_GAZETTEER_PATH"),
-        help="Path to Census Gazetteer places file to derive city area/radius.",
+        help="Census Gazetteer places file (.txt, or the Census .zip as downloaded) to derive city area/radius.",
     )
     parser.add_argument(
         "--auto-radius-from-population",
@@ -1,10 +1,17 @@
 from __future__ import annotations
 
 import json
+import select
+import threading
 import urllib.parse
+import weakref
+from contextlib import contextmanager
 from datetime import date
-from typing import Dict, Tuple, Optional
+from functools import lru_cache, partial
+from typing import Callable, Dict, Tuple, Optional
 
+from .metrics import DB_QUERY_LATENCY
+from .tracing import span
 from .util import normalize_place_name
 SENIORITY_MAP = {
     "entry": ["No Prior Experience Required", "Entry Level"],
@@ -21,6 +28,202 @@ def ensure_psycopg():
     return psycopg
 
 
+def ensure_psycopg_pool():
+    try:
+        import psycopg_pool
+    except ImportError as exc:
+        raise RuntimeError(
+            "psycopg_pool is required for the API connection pool. Install with `pip install 'psycopg-pool>=3.2'`."
+        ) from exc
+    return psycopg_pool
+
+
+def create_pg_pool(
+    pg_url: str,
+    min_size: int = 1,
+    max_size: int = 10,
+    timeout_s: float = 10.0,
+    max_idle_s: float = 300.0,
+    max_lifetime_s: float = 3600.0,
+    connect_timeout_s: int = 5,
+    name: str = "jobs-api",
+):
+    """
+    Process-wide connection pool. Connections are opened in the background (so the
+    API starts even while Postgres is down), checked with a cheap round trip before
+    each checkout, and recycled after max_lifetime_s.
+    """
+    psycopg_pool = ensure_psycopg_pool()
+    pool_cls = psycopg_pool.ConnectionPool
+    return pool_cls(
+        pg_url,
+        min_size=min_size,
+        max_size=max(min_size, max_size),
+        timeout=timeout_s,
+        max_idle=max_idle_s,
+        max_lifetime=max_lifetime_s,
+        kwargs={"connect_timeout": connect_timeout_s},
+        check=pool_cls.check_connection,
+        name=name,
+        open=True,
+    )
+
+
+@contextmanager
+def _connection(pg_url: str, pool=None):
+    """A pooled connection when `pool` is given, else a fresh one closed on exit."""
+    if pool is not None:
+        with pool.connection() as conn:
+            yield conn
+        return
+    psycopg = ensure_psycopg()
+    with psycopg.connect(pg_url) as conn:
+        yield conn
+
+
+# The process-wide schema caches below (_PARTITIONED, _PARTITIONS_READY, _DERIVED_READY,
+# _NORMALIZED) must only learn about tables that are committed. Inside _schema_transaction
+# updates are queued per connection and applied after COMMIT succeeds; a rollback drops
+# them, so the next write looks again instead of assuming a table that never landed.
+_DEFERRED_SCHEMA: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _remember(cur, update: Callable[[], None]) -> None:
+    """Apply a schema-cache update now, or at commit if a _schema_transaction is open."""
+    pending = _DEFERRED_SCHEMA.get(cur.connection)
+    if pending is None:
+        update()
+    else:
+        pending.append(update)
+
+
+@contextmanager
+def _schema_transaction(conn):
+    """Commit on success and then apply the queued cache updates; roll back on error."""
+    pending: list = []
+    _DEFERRED_SCHEMA[conn] = pending
+    try:
+        yield
+        conn.commit()
+    except BaseException:
+        if not conn.broken:
+            conn.rollback()
+        raise
+    finally:
+        _DEFERRED_SCHEMA.pop(conn, None)
+    for update in pending:
+        update()
+
+
+# Every city_counts write NOTIFYs this channel with the table name on commit, so API
+# processes can drop cached /heatmap responses as soon as new rows are visible.
+CHANGES_CHANNEL = "jobs_city_counts_changed"
+
+
+def _notify_change(cur, table: str) -> None:
+    # Delivered at commit, and Postgres folds repeats within one transaction into one.
+    cur.execute("SELECT pg_notify(%s, %s)", (CHANGES_CHANNEL, table))
+
+
+def listen_for_changes(
+    pg_url: str,
+    on_change: Callable[[Optional[str]], None],
+    stop: threading.Event,
+    poll_s: float = 5.0,
+    reconnect_s: float = 5.0,
+) -> None:
+    """
+    Call on_change(table) for each CHANGES_CHANNEL notification until `stop` is set.
+    Runs on its own autocommit connection (a pooled one would be handed back mid-LISTEN).
+    on_change(None) is called after every (re)connect, since notifications sent while
+    disconnected are lost. Any failure, including one raised by on_change, is logged
+    and followed by a reconnect: if this thread died, cached responses would only
+    expire by TTL.
+    """
+    psycopg = ensure_psycopg()
+    while not stop.is_set():
+        try:
+            with psycopg.connect(pg_url, autocommit=True) as conn:
+                conn.add_notify_handler(lambda n: on_change(n.payload))
+                conn.execute(psycopg.sql.SQL("LISTEN {}").format(psycopg.sql.Identifier(CHANGES_CHANNEL)))
+                on_change(None)
+                while not stop.is_set():
+                    # Wait for the socket, then run a no-op so psycopg reads and
+                    # dispatches whatever notifications arrived.
+                    select.select([conn.fileno()], [], [], poll_s)
+                    conn.execute("SELECT 1")
+        except Exception as exc:
+            print(f"Change listener failed ({type(exc).__name__}: {exc}); reconnecting in {reconnect_s:.0f}s")
+            stop.wait(reconnect_s)
+
+
+# Below this many rows the extra CREATE/COPY/TRUNCATE statements cost more than the
+# row-at-a-time upsert saves (a 10-row flush was ~3x slower through COPY).
+BULK_MIN_ROWS = 100
+
+AREA_STAGE_COLUMNS = (("city", "TEXT"), ("state_code", "TEXT"), ("area_sqmi", "DOUBLE PRECISION"))
+
+CITY_ROW_STAGE_COLUMNS = (
+    ("city", "TEXT"),
+    ("state_code", "TEXT"),
+    ("state_name", "TEXT"),
+    ("lat", "DOUBLE PRECISION"),
+    ("lon", "DOUBLE PRECISION"),
+    ("population", "BIGINT"),
+    # Radii arrive as floats; the merge's assignment cast rounds them like the row path did.
+    ("radius_miles", "DOUBLE PRECISION"),
+    ("query", "TEXT"),
+    ("job_title_query", "TEXT"),
+    ("role", "TEXT"),
+    ("seniority_level", "TEXT"),
+    ("total", "BIGINT"),
+    ("error", "TEXT"),
+    ("run_date", "DATE"),
+)
+
+
+def _copy_to_stage(cur, sql, table: str, stage_columns, rows):
+    """
+    COPY `rows` into the per-session temp staging table for `table` (temp tables skip
+    the WAL), numbering them in a `_seq` column. Returns the stage identifier; the
+    caller merges from it and truncates it.
+    """
+    stage = sql.Identifier(f"_stage_{table}")
+    cols = sql.SQL(", ").join(sql.Identifier(n) for n, _ in stage_columns)
+    cur.execute(
+        sql.SQL("CREATE TEMP TABLE IF NOT EXISTS {stage} ({defs}, _seq BIGINT NOT NULL)").format(
+            stage=stage,
+            defs=sql.SQL(", ").join(sql.SQL("{} " + typ).format(sql.Identifier(n)) for n, typ in stage_columns),
+        )
+    )
+    with cur.copy(sql.SQL("COPY {stage} ({cols}, _seq) FROM STDIN").format(stage=stage, cols=cols)) as copy:
+        for seq, row in enumerate(rows):
+            copy.write_row((*row, seq))
+    return stage
+
+
+def _copy_merge(cur, sql, table: str, stage_columns, rows, conflict_columns, update_sql) -> None:
+    """
+    Bulk upsert: COPY `rows` into a staging table and merge it with one
+    INSERT ... SELECT ... ON CONFLICT DO UPDATE, in the caller's transaction. When a
+    batch repeats a conflict key, its last row wins.
+    """
+    stage = _copy_to_stage(cur, sql, table, stage_columns, rows)
+    cols = sql.SQL(", ").join(sql.Identifier(n) for n, _ in stage_columns)
+    keys = sql.SQL(", ").join(sql.Identifier(n) for n in conflict_columns)
+    cur.execute(
+        sql.SQL(
+            """
+            INSERT INTO {table_name} ({cols})
+            SELECT DISTINCT ON ({keys}) {cols} FROM {stage}
+            ORDER BY {keys}, _seq DESC
+            ON CONFLICT ({keys}) DO UPDATE SET {updates}
+            """
+        ).format(table_name=sql.Identifier(table), cols=cols, keys=keys, stage=stage, updates=update_sql)
+    )
+    cur.execute(sql.SQL("TRUNCATE {stage}").format(stage=stage))
+
+
 def load_area_lookup_from_pg(pg_url: str, table: str, create_table: bool) -> Dict[Tuple[str, str], float]:
     psycopg = ensure_psycopg()
     connect = psycopg.connect
@@ -59,7 +262,18 @@ def load_area_lookup_from_pg(pg_url: str, table: str, create_table: bool) -> Dic
     return area_lookup
 
 
-def upsert_areas_to_pg(area_lookup: Dict[Tuple[str, str], float], pg_url: str, table: str, create_table: bool) -> int:
+def upsert_areas_to_pg(
+    area_lookup: Dict[Tuple[str, str], float],
+    pg_url: str,
+    table: str,
+    create_table: bool,
+    bulk: bool = True,
+) -> int:
+    """
+    Save Gazetteer areas. bulk=True streams them with COPY and merges in one statement
+    (see _copy_merge) when there are at least BULK_MIN_ROWS; otherwise rows go through
+    executemany.
+    """
     if not area_lookup:
         return 0
     psycopg = ensure_psycopg()
@@ -82,88 +296,176 @@ def upsert_areas_to_pg(area_lookup: Dict[Tuple[str, str], float], pg_url: str, t
                     ).format(table_name=sql.Identifier(table))
                 )
 
-            insert_sql = sql.SQL(
-                """
-                INSERT INTO {table_name} (city, state_code, area_sqmi)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (city, state_code) DO UPDATE SET area_sqmi = EXCLUDED.area_sqmi
-                """
-            ).format(table_name=sql.Identifier(table))
-
             payload = [(city, state, area) for (city, state), area in area_lookup.items() if state and len(state) == 2]
-            cur.executemany(insert_sql, payload)
+            bulk = bulk and len(payload) >= BULK_MIN_ROWS
+            with span("db_upsert_areas", cat="db", table=table, rows=len(payload), bulk=bulk):
+                if bulk:
+                    _copy_merge(
+                        cur,
+                        sql,
+                        table,
+                        AREA_STAGE_COLUMNS,
+                        payload,
+                        conflict_columns=("city", "state_code"),
+                        update_sql=sql.SQL("area_sqmi = EXCLUDED.area_sqmi"),
+                    )
+                else:
+                    insert_sql = sql.SQL(
+                        """
+                        INSERT INTO {table_name} (city, state_code, area_sqmi)
+                        VALUES (%s, %s, %s)
+                        ON CONFLICT (city, state_code) DO UPDATE SET area_sqmi = EXCLUDED.area_sqmi
+                        """
+                    ).format(table_name=sql.Identifier(table))
+                    cur.executemany(insert_sql, payload)
             count = len(payload)
         conn.commit()
     return count
 
 
-def save_city_results_to_pg(
-    results,
-    pg_url: str,
-    table: str,
-    create_table: bool,
-    query: str,
-    radius_miles: float,
-    role: Optional[str] = None,
-    seniority_level: Optional[str] = None,
-    job_title_query: Optional[str] = None,
-    run_date: Optional[date] = None,
-) -> None:
-    psycopg = ensure_psycopg()
-    connect = psycopg.connect
-    sql = psycopg.sql
+def _create_city_counts_table(cur, sql, table: str, partitioned: bool = False) -> None:
+    """
+    History table, one row per (city, state, query, seniority, run_date). With
+    `partitioned` it is created PARTITION BY RANGE (run_date) with one partition per
+    month (added on demand by _ensure_partitions); Postgres requires the partition key
+    in every unique constraint, so the primary key becomes (id, run_date).
+    """
+    cur.execute(
+        sql.SQL(
+            """
+            CREATE TABLE IF NOT EXISTS {table_name} (
+                id BIGSERIAL {id_pk},
+                city TEXT NOT NULL,
+                state_code TEXT NOT NULL,
+                state_name TEXT NOT NULL,
+                lat DOUBLE PRECISION NOT NULL,
+                lon DOUBLE PRECISION NOT NULL,
+                population INTEGER,
+                radius_miles INTEGER,
+                query TEXT,
+                job_title_query TEXT,
+                role TEXT,
+                seniority_level TEXT,
+                total INTEGER,
+                error TEXT,
+                run_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                run_date DATE NOT NULL DEFAULT CURRENT_DATE,
+                {table_pk}UNIQUE (city, state_code, query, seniority_level, run_date)
+            ){partition_by}
+            """
+        ).format(
+            table_name=sql.Identifier(table),
+            id_pk=sql.SQL("" if partitioned else "PRIMARY KEY"),
+            table_pk=sql.SQL("PRIMARY KEY (id, run_date),\n                " if partitioned else ""),
+            partition_by=sql.SQL(" PARTITION BY RANGE (run_date)" if partitioned else ""),
+        )
+    )
+    cur.execute(
+        sql.SQL(
+            "CREATE INDEX IF NOT EXISTS {idx} ON {table_name} (query, seniority_level, run_date)"
+        ).format(
+            idx=sql.Identifier(f"{table}_query_level_date_idx"),
+            table_name=sql.Identifier(table),
+        )
+    )
+    if partitioned:
+        _remember(cur, partial(_PARTITIONED.__setitem__, (cur.connection.info.dsn, table), True))
+        _ensure_partitions(cur, sql, table, [date.today()])
 
-    run_dt = run_date or date.today()
 
-    with connect(pg_url) as conn:
-        with conn.cursor() as cur:
-            if create_table:
-                cur.execute(
-                    sql.SQL(
-                        """
-                        CREATE TABLE IF NOT EXISTS {table_name} (
-                            id BIGSERIAL PRIMARY KEY,
-                            city TEXT NOT NULL,
-                            state_code TEXT NOT NULL,
-                            state_name TEXT NOT NULL,
-                            lat DOUBLE PRECISION NOT NULL,
-                            lon DOUBLE PRECISION NOT NULL,
-                            population INTEGER,
-                            radius_miles INTEGER,
-                            query TEXT,
-                            job_title_query TEXT,
-                            role TEXT,
-                            seniority_level TEXT,
-                            total INTEGER,
-                            error TEXT,
-                            run_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                            run_date DATE NOT NULL DEFAULT CURRENT_DATE,
-                            UNIQUE (city, state_code, query, seniority_level, run_date)
-                        )
-                        """
-                    ).format(table_name=sql.Identifier(table))
-                )
+# (dsn, table) -> whether the table is range-partitioned by run_date.
+_PARTITIONED: Dict[Tuple[str, str], bool] = {}
+# (dsn, table, month start) partitions known to exist in this process.
+_PARTITIONS_READY: set = set()
+
+
+def month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def next_month(d: date) -> date:
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def is_partitioned(cur, table: str) -> bool:
+    key = (cur.connection.info.dsn, table)
+    if key not in _PARTITIONED:
+        cur.execute(
+            "SELECT to_regclass(%s) IS NOT NULL, EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))",
+            (table, table),
+        )
+        exists, partitioned = cur.fetchone()
+        if exists:
+            _remember(cur, partial(_PARTITIONED.__setitem__, key, partitioned))
+        return partitioned
+    return _PARTITIONED[key]
+
+
+def _ensure_partitions(cur, sql, table: str, run_dates) -> None:
+    """
+    Make sure every month in `run_dates`, and the month after each, has a partition,
+    so writes never hit a missing range and the next month is ready before it starts.
+    A no-op for unpartitioned tables and for months already seen by this process.
+    """
+    if not is_partitioned(cur, table):
+        return
+    dsn = cur.connection.info.dsn
+    months = set()
+    for d in run_dates:
+        months.add(month_start(d))
+        months.add(next_month(month_start(d)))
+    missing = sorted(m for m in months if (dsn, table, m) not in _PARTITIONS_READY)
+    for month in missing:
+        name = partition_name(table, month)
+        cur.execute("SELECT to_regclass(%s)", (name,))
+        if cur.fetchone()[0] is None:
+            # Serialise concurrent writers racing to add the same month.
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (name,))
+            with span("db_create_partition", cat="db", table=name):
                 cur.execute(
                     sql.SQL(
-                        "CREATE INDEX IF NOT EXISTS {idx} ON {table_name} (query, seniority_level, run_date)"
+                        "CREATE TABLE IF NOT EXISTS {part} PARTITION OF {table_name} FOR VALUES FROM ({lo}) TO ({hi})"
                     ).format(
-                        idx=sql.Identifier(f"{table}_query_level_date_idx"),
+                        part=sql.Identifier(name),
                         table_name=sql.Identifier(table),
+                        lo=sql.Literal(month),
+                        hi=sql.Literal(next_month(month)),
                     )
                 )
+        _remember(cur, partial(_PARTITIONS_READY.add, (dsn, table, month)))
 
-            insert_sql = sql.SQL(
-                """
-                INSERT INTO {table_name} (
-                    city, state_code, state_name, lat, lon, population,
-                    radius_miles, query, job_title_query, role, seniority_level,
-                    total, error, run_date
-                ) VALUES (
-                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-                )
-                ON CONFLICT (city, state_code, query, seniority_level, run_date)
-                DO UPDATE SET
-                    total = EXCLUDED.total,
+
+def _upsert_city_rows(cur, sql, table: str, rows, bulk: bool = True) -> None:
+    """Write history rows and, in the same transaction, refresh {table}_latest and {table}_daily."""
+    _notify_change(cur, table)
+    if is_normalized(cur, table):
+        _upsert_normalized_rows(cur, sql, table, rows, bulk)
+        return
+    _ensure_partitions(cur, sql, table, {r[13] for r in rows})
+    _upsert_history_rows(cur, sql, table, rows, bulk)
+    _ensure_latest_table(cur, sql, table)
+    _upsert_latest_rows(cur, sql, table, rows, bulk)
+    _ensure_daily_table(cur, sql, table)
+    _upsert_daily_rows(cur, sql, table, rows, bulk)
+
+
+def _upsert_history_rows(cur, sql, table: str, rows, bulk: bool) -> None:
+    if bulk and len(rows) >= BULK_MIN_ROWS:
+        with span("db_upsert_city_rows", cat="db", table=table, rows=len(rows), bulk=True):
+            _copy_merge(
+                cur,
+                sql,
+                table,
+                CITY_ROW_STAGE_COLUMNS,
+                rows,
+                conflict_columns=("city", "state_code", "query", "seniority_level", "run_date"),
+                update_sql=sql.SQL(
+                    """
+                    total = COALESCE(EXCLUDED.total, {table_name}.total),
                     error = EXCLUDED.error,
                     population = EXCLUDED.population,
                     radius_miles = EXCLUDED.radius_miles,
@@ -173,32 +475,979 @@ def save_city_results_to_pg(
                     query = EXCLUDED.query,
                     job_title_query = EXCLUDED.job_title_query,
                     run_at = NOW()
+                    """
+                ).format(table_name=sql.Identifier(table)),
+            )
+        return
+    insert_sql = sql.SQL(
+        """
+        INSERT INTO {table_name} (
+            city, state_code, state_name, lat, lon, population,
+            radius_miles, query, job_title_query, role, seniority_level,
+            total, error, run_date
+        ) VALUES (
+            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+        )
+        ON CONFLICT (city, state_code, query, seniority_level, run_date)
+        DO UPDATE SET
+            total = COALESCE(EXCLUDED.total, {table_name}.total),
+            error = EXCLUDED.error,
+            population = EXCLUDED.population,
+            radius_miles = EXCLUDED.radius_miles,
+            lat = EXCLUDED.lat,
+            lon = EXCLUDED.lon,
+            state_name = EXCLUDED.state_name,
+            query = EXCLUDED.query,
+            job_title_query = EXCLUDED.job_title_query,
+            run_at = NOW()
+        """
+    ).format(table_name=sql.Identifier(table))
+    with span("db_upsert_city_rows", cat="db", table=table, rows=len(rows), bulk=False):
+        cur.executemany(insert_sql, rows)
+
+
+LATEST_STAGE_COLUMNS = (
+    ("city", "TEXT"),
+    ("state_code", "TEXT"),
+    ("state_name", "TEXT"),
+    ("lat", "DOUBLE PRECISION"),
+    ("lon", "DOUBLE PRECISION"),
+    ("population", "BIGINT"),
+    ("radius_miles", "DOUBLE PRECISION"),
+    ("query", "TEXT"),
+    ("job_title_query", "TEXT"),
+    ("role", "TEXT"),
+    ("seniority_level", "TEXT"),
+    ("total", "BIGINT"),
+    ("run_date", "DATE"),
+)
+
+# (dsn, table) pairs whose derived tables (_latest, _daily) are known to exist in this process.
+_DERIVED_READY: set = set()
+
+
+def latest_table_name(table: str) -> str:
+    return f"{table}_latest"
+
+
+def _create_latest_table(cur, sql, table: str) -> None:
+    """
+    One row per (city, state, query, seniority): the most recent successful count.
+    NULL query/seniority are stored as '' so they can be part of the primary key.
+    The two covering indexes serve /heatmap's query and role filters (plus the
+    seniority and min_total filters) without touching the heap.
+    """
+    latest = latest_table_name(table)
+    cur.execute(
+        sql.SQL(
+            """
+            CREATE TABLE IF NOT EXISTS {latest} (
+                city TEXT NOT NULL,
+                state_code TEXT NOT NULL,
+                state_name TEXT NOT NULL,
+                lat DOUBLE PRECISION NOT NULL,
+                lon DOUBLE PRECISION NOT NULL,
+                population INTEGER,
+                radius_miles INTEGER,
+                query TEXT NOT NULL DEFAULT '',
+                job_title_query TEXT,
+                role TEXT,
+                seniority_level TEXT NOT NULL DEFAULT '',
+                total INTEGER NOT NULL,
+                run_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                run_date DATE NOT NULL,
+                PRIMARY KEY (city, state_code, query, seniority_level)
+            )
+            """
+        ).format(latest=sql.Identifier(latest))
+    )
+    cur.execute(
+        sql.SQL(
+            """
+            CREATE INDEX IF NOT EXISTS {idx} ON {latest} (query, seniority_level, total)
+            INCLUDE (city, state_code, state_name, lat, lon, radius_miles, job_title_query, role, run_at)
+            """
+        ).format(idx=sql.Identifier(f"{latest}_query_level_total_idx"), latest=sql.Identifier(latest))
+    )
+    cur.execute(
+        sql.SQL(
+            """
+            CREATE INDEX IF NOT EXISTS {idx} ON {latest} (role, seniority_level, total)
+            INCLUDE (city, state_code, state_name, lat, lon, radius_miles, query, job_title_query, run_at)
+            """
+        ).format(idx=sql.Identifier(f"{latest}_role_level_total_idx"), latest=sql.Identifier(latest))
+    )
+
+
+def _latest_rows_sql(sql, table: str):
+    """{table}_latest's rows computed from history (the pick /heatmap used to make per request)."""
+    return sql.SQL(
+        """
+        SELECT DISTINCT ON (city, state_code, COALESCE(query, ''), COALESCE(seniority_level, ''))
+            city, state_code, state_name, lat, lon, population, radius_miles,
+            COALESCE(query, '') AS query, job_title_query, role,
+            COALESCE(seniority_level, '') AS seniority_level, total, run_at, run_date
+        FROM {table_name}
+        WHERE total IS NOT NULL
+        ORDER BY city, state_code, COALESCE(query, ''), COALESCE(seniority_level, ''), run_at DESC
+        """
+    ).format(table_name=sql.Identifier(table))
+
+
+def _backfill_latest(cur, sql, table: str) -> None:
+    """Seed {table}_latest from history."""
+    cur.execute(
+        sql.SQL(
+            """
+            INSERT INTO {latest} (
+                city, state_code, state_name, lat, lon, population, radius_miles,
+                query, job_title_query, role, seniority_level, total, run_at, run_date
+            )
+            {rows}
+            ON CONFLICT DO NOTHING
+            """
+        ).format(latest=sql.Identifier(latest_table_name(table)), rows=_latest_rows_sql(sql, table))
+    )
+
+
+def _derived_exists(cur, name: str) -> bool:
+    """Whether the derived table `name` exists (cached once its creation has committed)."""
+    key = (cur.connection.info.dsn, name)
+    if key in _DERIVED_READY:
+        return True
+    cur.execute("SELECT to_regclass(%s)", (name,))
+    if cur.fetchone()[0] is None:
+        return False
+    _remember(cur, partial(_DERIVED_READY.add, key))
+    return True
+
+
+def _ensure_derived_table(cur, name: str, build) -> None:
+    """
+    Run `build()` (create + backfill) on the write path the first time this process
+    touches the derived table `name`, unless it already exists, so existing deployments
+    pick new derived tables up without a separate migration step. Readers never build;
+    they fall back to history until the table exists.
+    """
+    if _derived_exists(cur, name):
+        return
+    # Serialise concurrent writers so only one of them creates and backfills.
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (name,))
+    cur.execute("SELECT to_regclass(%s)", (name,))
+    if cur.fetchone()[0] is None:
+        with span("db_backfill_derived", cat="db", table=name):
+            build()
+    _remember(cur, partial(_DERIVED_READY.add, (cur.connection.info.dsn, name)))
+
+
+def _ensure_latest_table(cur, sql, table: str) -> None:
+    def build() -> None:
+        _create_latest_table(cur, sql, table)
+        _backfill_latest(cur, sql, table)
+
+    _ensure_derived_table(cur, latest_table_name(table), build)
+
+
+def _upsert_latest_rows(cur, sql, table: str, rows, bulk: bool) -> None:
+    # city_result_row layout; failed fetches (total NULL) leave the last good count alone.
+    payload = [
+        (*r[:7], r[7] or "", r[8], r[9], r[10] or "", r[11], r[13])
+        for r in rows
+        if r[11] is not None
+    ]
+    if not payload:
+        return
+    latest = latest_table_name(table)
+    update_sql = sql.SQL(
+        """
+        state_name = EXCLUDED.state_name,
+        lat = EXCLUDED.lat,
+        lon = EXCLUDED.lon,
+        population = EXCLUDED.population,
+        radius_miles = EXCLUDED.radius_miles,
+        job_title_query = EXCLUDED.job_title_query,
+        role = EXCLUDED.role,
+        total = EXCLUDED.total,
+        run_at = NOW(),
+        run_date = EXCLUDED.run_date
+        """
+    )
+    with span("db_upsert_latest_rows", cat="db", table=latest, rows=len(payload)):
+        if bulk and len(payload) >= BULK_MIN_ROWS:
+            _copy_merge(
+                cur,
+                sql,
+                latest,
+                LATEST_STAGE_COLUMNS,
+                payload,
+                conflict_columns=("city", "state_code", "query", "seniority_level"),
+                update_sql=update_sql,
+            )
+            return
+        cur.executemany(
+            sql.SQL(
+                """
+                INSERT INTO {latest} (
+                    city, state_code, state_name, lat, lon, population, radius_miles,
+                    query, job_title_query, role, seniority_level, total, run_date
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (city, state_code, query, seniority_level) DO UPDATE SET {updates}
+                """
+            ).format(latest=sql.Identifier(latest), updates=update_sql),
+            payload,
+        )
+
+
+DAILY_STAGE_COLUMNS = (
+    ("city", "TEXT"),
+    ("state_code", "TEXT"),
+    ("run_date", "DATE"),
+    ("query", "TEXT"),
+    ("seniority_level", "TEXT"),
+    ("role", "TEXT"),
+    ("total", "BIGINT"),
+)
+
+
+def daily_table_name(table: str) -> str:
+    return f"{table}_daily"
+
+
+def _create_daily_table(cur, sql, table: str) -> None:
+    """
+    Narrow per-day series for /heatmap/history: one successful total per (city,
+    state, query, seniority, run_date). The primary key keeps each series contiguous
+    and in date order and carries role/total, so a city's series come out of one
+    index-only scan already grouped and sorted; the BRIN index serves date-range
+    scans across all cities cheaply, since rows arrive in run_date order.
+    """
+    daily = daily_table_name(table)
+    cur.execute(
+        sql.SQL(
+            """
+            CREATE TABLE IF NOT EXISTS {daily} (
+                city TEXT NOT NULL,
+                state_code TEXT NOT NULL,
+                run_date DATE NOT NULL,
+                query TEXT NOT NULL DEFAULT '',
+                seniority_level TEXT NOT NULL DEFAULT '',
+                role TEXT,
+                total INTEGER NOT NULL,
+                PRIMARY KEY (city, state_code, query, seniority_level, run_date) INCLUDE (role, total)
+            )
+            """
+        ).format(daily=sql.Identifier(daily))
+    )
+    cur.execute(
+        sql.SQL("CREATE INDEX IF NOT EXISTS {idx} ON {daily} USING BRIN (run_date)").format(
+            idx=sql.Identifier(f"{daily}_run_date_brin"), daily=sql.Identifier(daily)
+        )
+    )
+
+
+def _daily_rows_sql(sql, table: str):
+    """{table}_daily's rows computed from history: the last successful count per day."""
+    return sql.SQL(
+        """
+        SELECT DISTINCT ON (city, state_code, COALESCE(query, ''), COALESCE(seniority_level, ''), run_date)
+            city, state_code, COALESCE(query, '') AS query, COALESCE(seniority_level, '') AS seniority_level,
+            run_date, role, total
+        FROM {table_name}
+        WHERE total IS NOT NULL
+        ORDER BY city, state_code, COALESCE(query, ''), COALESCE(seniority_level, ''), run_date, run_at DESC
+        """
+    ).format(table_name=sql.Identifier(table))
+
+
+def _backfill_daily(cur, sql, table: str) -> None:
+    cur.execute(
+        sql.SQL(
+            """
+            INSERT INTO {daily} (city, state_code, query, seniority_level, run_date, role, total)
+            {rows}
+            ON CONFLICT DO NOTHING
+            """
+        ).format(daily=sql.Identifier(daily_table_name(table)), rows=_daily_rows_sql(sql, table))
+    )
+
+
+def _ensure_daily_table(cur, sql, table: str) -> None:
+    def build() -> None:
+        _create_daily_table(cur, sql, table)
+        _backfill_daily(cur, sql, table)
+
+    _ensure_derived_table(cur, daily_table_name(table), build)
+
+
+def _upsert_daily_rows(cur, sql, table: str, rows, bulk: bool) -> None:
+    # city_result_row layout; like _latest, only successful counts are kept.
+    payload = [(r[0], r[1], r[13], r[7] or "", r[10] or "", r[9], r[11]) for r in rows if r[11] is not None]
+    if not payload:
+        return
+    daily = daily_table_name(table)
+    update_sql = sql.SQL("role = EXCLUDED.role, total = EXCLUDED.total")
+    with span("db_upsert_daily_rows", cat="db", table=daily, rows=len(payload)):
+        if bulk and len(payload) >= BULK_MIN_ROWS:
+            _copy_merge(
+                cur,
+                sql,
+                daily,
+                DAILY_STAGE_COLUMNS,
+                payload,
+                conflict_columns=("city", "state_code", "query", "seniority_level", "run_date"),
+                update_sql=update_sql,
+            )
+            return
+        cur.executemany(
+            sql.SQL(
+                """
+                INSERT INTO {daily} (city, state_code, run_date, query, seniority_level, role, total)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (city, state_code, query, seniority_level, run_date) DO UPDATE SET {updates}
+                """
+            ).format(daily=sql.Identifier(daily), updates=update_sql),
+            payload,
+        )
+
+
+STORAGE_MODES = ("wide", "normalized")
+
+# (dsn, table) -> whether `table` is the view over the normalized schema.
+_NORMALIZED: Dict[Tuple[str, str], bool] = {}
+
+
+def cities_table_name(table: str) -> str:
+    return f"{table}_cities"
+
+
+def queries_table_name(table: str) -> str:
+    return f"{table}_queries"
+
+
+def facts_table_name(table: str) -> str:
+    return f"{table}_facts"
+
+
+def facts_latest_table_name(table: str) -> str:
+    return f"{table}_facts_latest"
+
+
+def is_normalized(cur, table: str) -> bool:
+    key = (cur.connection.info.dsn, table)
+    if key not in _NORMALIZED:
+        cur.execute("SELECT to_regclass(%s)", (facts_table_name(table),))
+        normalized = cur.fetchone()[0] is not None
+        _remember(cur, partial(_NORMALIZED.__setitem__, key, normalized))
+        return normalized
+    return _NORMALIZED[key]
+
+
+def history_table(cur, table: str) -> str:
+    """The physical table holding history rows: {table}_facts in normalized mode."""
+    return facts_table_name(table) if is_normalized(cur, table) else table
+
+
+def _normalized_rows_sql(sql, table: str, facts_source: str):
+    """
+    SELECT over `facts_source` (the facts table or one of its partitions) joined back
+    to the dimensions, with the wide table's column names and NULL conventions.
+    """
+    return sql.SQL(
+        """
+        SELECT c.name AS city, c.state_code, c.state_name, c.lat, c.lon, c.population,
+            f.radius_miles::integer AS radius_miles, NULLIF(q.query, '') AS query, q.job_title_query,
+            q.role, NULLIF(q.seniority_level, '') AS seniority_level, f.total, f.error,
+            f.run_date::timestamptz AS run_at, f.run_date
+        FROM {facts} f
+        JOIN {cities} c ON c.id = f.city_id
+        JOIN {queries} q ON q.id = f.query_id
+        """
+    ).format(
+        facts=sql.Identifier(facts_source),
+        cities=sql.Identifier(cities_table_name(table)),
+        queries=sql.Identifier(queries_table_name(table)),
+    )
+
+
+def _create_normalized_tables(cur, sql, table: str, partitioned: bool = False) -> None:
+    """
+    Normalized storage: {table}_cities and {table}_queries dimensions keyed by small
+    integer ids, a narrow {table}_facts (ids, run_date, total, radius, error) and
+    {table}_facts_latest for /heatmap. `table` itself becomes a view with the wide
+    table's columns, so history readers work unchanged; facts keep the run date only,
+    so the view's run_at is midnight of run_date.
+    """
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL AND to_regclass(%s) IS NULL", (table, facts_table_name(table)))
+    if cur.fetchone()[0]:
+        raise RuntimeError(
+            f"Table {table} already holds wide rows; run `python -m crawler.normalize migrate` to convert it."
+        )
+    cities = sql.Identifier(cities_table_name(table))
+    queries = sql.Identifier(queries_table_name(table))
+    facts = sql.Identifier(facts_table_name(table))
+    cur.execute(
+        sql.SQL(
+            """
+            CREATE TABLE IF NOT EXISTS {cities} (
+                id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                name TEXT NOT NULL,
+                state_code TEXT NOT NULL,
+                state_name TEXT NOT NULL,
+                lat DOUBLE PRECISION NOT NULL,
+                lon DOUBLE PRECISION NOT NULL,
+                population INTEGER,
+                area_sqmi DOUBLE PRECISION,
+                UNIQUE (name, state_code)
+            )
+            """
+        ).format(cities=cities)
+    )
+    cur.execute(
+        sql.SQL(
+            """
+            CREATE TABLE IF NOT EXISTS {queries} (
+                id SMALLINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                query TEXT NOT NULL DEFAULT '',
+                seniority_level TEXT NOT NULL DEFAULT '',
+                role TEXT,
+                job_title_query TEXT,
+                UNIQUE (query, seniority_level)
+            )
+            """
+        ).format(queries=queries)
+    )
+    # Fixed-width columns first, widest to narrowest, so rows carry no alignment padding.
+    cur.execute(
+        sql.SQL(
+            """
+            CREATE TABLE IF NOT EXISTS {facts} (
+                city_id INTEGER NOT NULL,
+                run_date DATE NOT NULL DEFAULT CURRENT_DATE,
+                total INTEGER,
+                query_id SMALLINT NOT NULL,
+                radius_miles SMALLINT,
+                error TEXT,
+                PRIMARY KEY (city_id, query_id, run_date)
+            ){partition_by}
+            """
+        ).format(facts=facts, partition_by=sql.SQL(" PARTITION BY RANGE (run_date)" if partitioned else ""))
+    )
+    cur.execute(
+        sql.SQL("CREATE INDEX IF NOT EXISTS {idx} ON {facts} (query_id, run_date)").format(
+            idx=sql.Identifier(f"{facts_table_name(table)}_query_date_idx"), facts=facts
+        )
+    )
+    cur.execute(
+        sql.SQL(
+            """
+            CREATE TABLE IF NOT EXISTS {latest} (
+                query_id SMALLINT NOT NULL,
+                city_id INTEGER NOT NULL,
+                total INTEGER NOT NULL,
+                radius_miles SMALLINT,
+                run_date DATE NOT NULL,
+                run_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                PRIMARY KEY (query_id, city_id)
+            )
+            """
+        ).format(latest=sql.Identifier(facts_latest_table_name(table)))
+    )
+    cur.execute(
+        sql.SQL("CREATE OR REPLACE VIEW {view} AS {rows}").format(
+            view=sql.Identifier(table), rows=_normalized_rows_sql(sql, table, facts_table_name(table))
+        )
+    )
+    dsn = cur.connection.info.dsn
+    _remember(cur, partial(_NORMALIZED.__setitem__, (dsn, table), True))
+    if partitioned:
+        _remember(cur, partial(_PARTITIONED.__setitem__, (dsn, facts_table_name(table)), True))
+        _ensure_partitions(cur, sql, facts_table_name(table), [date.today()])
+
+
+def _create_counts_schema(cur, sql, table: str, partitioned: bool = False, storage: str = "wide") -> None:
+    """Create the history schema for `storage`; an existing normalized schema is kept."""
+    if storage not in STORAGE_MODES:
+        raise ValueError(f"storage must be one of {STORAGE_MODES}")
+    # CREATE ... IF NOT EXISTS is not safe against itself: several workers starting with
+    # --pg-create-table would collide on the catalog, so serialise them.
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (table,))
+    if storage == "normalized" or is_normalized(cur, table):
+        _create_normalized_tables(cur, sql, table, partitioned=partitioned)
+    else:
+        _create_city_counts_table(cur, sql, table, partitioned=partitioned)
+        _ensure_latest_table(cur, sql, table)
+        _ensure_daily_table(cur, sql, table)
+
+
+def _unnest_rows_sql(sql, stage_columns, rows):
+    """
+    `rows` as a relation `s` shaped like the _copy_to_stage table, from one array
+    parameter per column: small batches skip the temp table and COPY round trips.
+    Returns (fragment, params).
+    """
+    columns = list(zip(*rows)) if rows else [()] * len(stage_columns)
+    fragment = sql.SQL("unnest({arrays}, %s::bigint[]) AS s({names}, _seq)").format(
+        arrays=sql.SQL(", ").join(sql.SQL("%s::" + typ + "[]") for _, typ in stage_columns),
+        names=sql.SQL(", ").join(sql.Identifier(n) for n, _ in stage_columns),
+    )
+    return fragment, [list(c) for c in columns] + [list(range(len(rows)))]
+
+
+def _upsert_normalized_rows(cur, sql, table: str, rows, bulk: bool = True) -> None:
+    """
+    Write city_result_row tuples to the normalized schema: stage them once (COPY for
+    BULK_MIN_ROWS and up, array parameters below that), add any new cities/queries,
+    then merge facts and facts_latest with set-based statements that resolve the
+    dimension ids by join.
+    """
+    facts = facts_table_name(table)
+    _ensure_partitions(cur, sql, facts, {r[13] for r in rows})
+    with span("db_upsert_normalized_rows", cat="db", table=facts, rows=len(rows), bulk=bulk):
+        stage = params = None
+        if bulk and len(rows) >= BULK_MIN_ROWS:
+            stage = _copy_to_stage(cur, sql, facts, CITY_ROW_STAGE_COLUMNS, rows)
+            source = sql.SQL("{} AS s").format(stage)
+        else:
+            source, params = _unnest_rows_sql(sql, CITY_ROW_STAGE_COLUMNS, rows)
+        names = {
+            "stage": source,
+            "cities": sql.Identifier(cities_table_name(table)),
+            "queries": sql.Identifier(queries_table_name(table)),
+            "facts": sql.Identifier(facts),
+            "latest": sql.Identifier(facts_latest_table_name(table)),
+        }
+        # Dimension rows are only rewritten when an attribute actually changed.
+        cur.execute(
+            sql.SQL(
+                """
+                INSERT INTO {cities} AS c (name, state_code, state_name, lat, lon, population)
+                SELECT DISTINCT ON (city, state_code) city, state_code, state_name, lat, lon, population
+                FROM {stage}
+                ORDER BY city, state_code, _seq DESC
+                ON CONFLICT (name, state_code) DO UPDATE SET
+                    state_name = EXCLUDED.state_name,
+                    lat = EXCLUDED.lat,
+                    lon = EXCLUDED.lon,
+                    population = EXCLUDED.population
+                WHERE (c.state_name, c.lat, c.lon, c.population)
+                    IS DISTINCT FROM (EXCLUDED.state_name, EXCLUDED.lat, EXCLUDED.lon, EXCLUDED.population)
+                """
+            ).format(**names),
+            params,
+        )
+        cur.execute(
+            sql.SQL(
+                """
+                INSERT INTO {queries} AS q (query, seniority_level, role, job_title_query)
+                SELECT DISTINCT ON (COALESCE(query, ''), COALESCE(seniority_level, ''))
+                    COALESCE(query, ''), COALESCE(seniority_level, ''), role, job_title_query
+                FROM {stage}
+                ORDER BY COALESCE(query, ''), COALESCE(seniority_level, ''), _seq DESC
+                ON CONFLICT (query, seniority_level) DO UPDATE SET
+                    role = COALESCE(EXCLUDED.role, q.role),
+                    job_title_query = COALESCE(EXCLUDED.job_title_query, q.job_title_query)
+                WHERE (q.role, q.job_title_query) IS DISTINCT FROM
+                    (COALESCE(EXCLUDED.role, q.role), COALESCE(EXCLUDED.job_title_query, q.job_title_query))
+                """
+            ).format(**names),
+            params,
+        )
+        resolved = sql.SQL(
+            """
+            FROM {stage}
+            JOIN {cities} c ON c.name = s.city AND c.state_code = s.state_code
+            JOIN {queries} q ON q.query = COALESCE(s.query, '') AND q.seniority_level = COALESCE(s.seniority_level, '')
+            """
+        ).format(**names)
+        cur.execute(
+            sql.SQL(
+                """
+                INSERT INTO {facts} AS f (city_id, query_id, run_date, total, radius_miles, error)
+                SELECT DISTINCT ON (c.id, q.id, s.run_date) c.id, q.id, s.run_date, s.total, s.radius_miles, s.error
+                {resolved}
+                ORDER BY c.id, q.id, s.run_date, s._seq DESC
+                ON CONFLICT (city_id, query_id, run_date) DO UPDATE SET
+                    total = COALESCE(EXCLUDED.total, f.total),
+                    error = EXCLUDED.error,
+                    radius_miles = EXCLUDED.radius_miles
+                """
+            ).format(resolved=resolved, **names),
+            params,
+        )
+        # Failed fetches (total NULL) leave the last good count alone, as in wide mode.
+        cur.execute(
+            sql.SQL(
+                """
+                INSERT INTO {latest} (query_id, city_id, total, radius_miles, run_date)
+                SELECT DISTINCT ON (q.id, c.id) q.id, c.id, s.total, s.radius_miles, s.run_date
+                {resolved}
+                WHERE s.total IS NOT NULL
+                ORDER BY q.id, c.id, s._seq DESC
+                ON CONFLICT (query_id, city_id) DO UPDATE SET
+                    total = EXCLUDED.total,
+                    radius_miles = EXCLUDED.radius_miles,
+                    run_date = EXCLUDED.run_date,
+                    run_at = NOW()
                 """
-            ).format(table_name=sql.Identifier(table))
+            ).format(resolved=resolved, **names),
+            params,
+        )
+        if stage is not None:
+            cur.execute(sql.SQL("TRUNCATE {stage}").format(stage=stage))
+
 
+def city_result_row(
+    r,
+    query: Optional[str],
+    radius_miles: float,
+    role: Optional[str],
+    seniority_level: Optional[str],
+    job_title_query: Optional[str],
+    run_date: date,
+) -> tuple:
+    return (
+        r.city.name,
+        r.city.state_code,
+        r.city.state_name,
+        r.city.latitude,
+        r.city.longitude,
+        r.city.population,
+        r.radius_miles or radius_miles,
+        query,
+        job_title_query,
+        role,
+        seniority_level,
+        r.total,
+        r.error,
+        run_date,
+    )
+
+
+def save_city_results_to_pg(
+    results,
+    pg_url: str,
+    table: str,
+    create_table: bool,
+    query: str,
+    radius_miles: float,
+    role: Optional[str] = None,
+    seniority_level: Optional[str] = None,
+    job_title_query: Optional[str] = None,
+    run_date: Optional[date] = None,
+    bulk: bool = True,
+    partitioned: bool = False,
+    storage: str = "wide",
+) -> None:
+    psycopg = ensure_psycopg()
+    connect = psycopg.connect
+    sql = psycopg.sql
+
+    run_dt = run_date or date.today()
+
+    with connect(pg_url) as conn:
+        with conn.cursor() as cur:
             payload = [
-                (
-                    r.city.name,
-                    r.city.state_code,
-                    r.city.state_name,
-                    r.city.latitude,
-                    r.city.longitude,
-                    r.city.population,
-                    r.radius_miles or radius_miles,
-                    query,
-                    job_title_query,
-                    role,
-                    seniority_level,
-                    r.total,
-                    r.error,
-                    run_dt,
-                )
+                city_result_row(r, query, radius_miles, role, seniority_level, job_title_query, run_dt)
                 for r in results
             ]
-            cur.executemany(insert_sql, payload)
+            with _schema_transaction(conn):
+                if create_table:
+                    _create_counts_schema(cur, sql, table, partitioned=partitioned, storage=storage)
+                _upsert_city_rows(cur, sql, table, payload, bulk=bulk)
+
+
+class CityResultsWriter:
+    """
+    Incremental city_counts writer for long sweeps: rows are buffered and committed
+    every `batch_size` results (and on flush/close), over one connection, so a crash
+    only loses the last partial batch.
+    """
+
+    def __init__(
+        self,
+        pg_url: str,
+        table: str,
+        create_table: bool,
+        radius_miles: float,
+        run_date: Optional[date] = None,
+        batch_size: int = BULK_MIN_ROWS,
+        bulk: bool = True,
+        partitioned: bool = False,
+        storage: str = "wide",
+    ) -> None:
+        psycopg = ensure_psycopg()
+        self._sql = psycopg.sql
+        self._conn = psycopg.connect(pg_url)
+        self.table = table
+        self.radius_miles = radius_miles
+        self.run_date = run_date or date.today()
+        self.batch_size = max(1, batch_size)
+        self.bulk = bulk
+        self.written = 0
+        self._rows: list = []
+        if create_table:
+            with _schema_transaction(self._conn), self._conn.cursor() as cur:
+                _create_counts_schema(cur, self._sql, table, partitioned=partitioned, storage=storage)
+
+    def __enter__(self) -> "CityResultsWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def add(
+        self,
+        result,
+        query: Optional[str],
+        role: Optional[str] = None,
+        seniority_level: Optional[str] = None,
+        job_title_query: Optional[str] = None,
+        run_date: Optional[date] = None,
+    ) -> None:
+        self._rows.append(
+            city_result_row(
+                result, query, self.radius_miles, role, seniority_level, job_title_query, run_date or self.run_date
+            )
+        )
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._rows:
+            return
+        with span("db_flush", cat="db", rows=len(self._rows)):
+            # Failed batches are rolled back and kept, so the connection stays usable.
+            with _schema_transaction(self._conn), self._conn.cursor() as cur:
+                _upsert_city_rows(cur, self._sql, self.table, self._rows, bulk=self.bulk)
+        self.written += len(self._rows)
+        self._rows = []
+
+    def close(self) -> None:
+        if self._conn.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._conn.close()
+
+
+def _create_sweep_tables(cur, sql, runs_table: str) -> None:
+    cur.execute(
+        sql.SQL(
+            """
+            CREATE TABLE IF NOT EXISTS {runs} (
+                run_id TEXT PRIMARY KEY,
+                run_date DATE NOT NULL,
+                spec JSONB NOT NULL,
+                status TEXT NOT NULL DEFAULT 'running',
+                started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                finished_at TIMESTAMPTZ
+            )
+            """
+        ).format(runs=sql.Identifier(runs_table))
+    )
+    cur.execute(
+        sql.SQL(
+            """
+            CREATE TABLE IF NOT EXISTS {cells} (
+                run_id TEXT NOT NULL REFERENCES {runs} (run_id) ON DELETE CASCADE,
+                query TEXT NOT NULL,
+                seniority_level TEXT NOT NULL,
+                completed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                PRIMARY KEY (run_id, query, seniority_level)
+            )
+            """
+        ).format(cells=sql.Identifier(f"{runs_table}_cells"), runs=sql.Identifier(runs_table))
+    )
+
+
+def start_sweep_run(pg_url: str, runs_table: str, run_id: str, run_date: date, spec: dict) -> None:
+    psycopg = ensure_psycopg()
+    sql = psycopg.sql
+    with psycopg.connect(pg_url) as conn:
+        with conn.cursor() as cur:
+            _create_sweep_tables(cur, sql, runs_table)
+            cur.execute(
+                sql.SQL("INSERT INTO {runs} (run_id, run_date, spec) VALUES (%s, %s, %s)").format(
+                    runs=sql.Identifier(runs_table)
+                ),
+                (run_id, run_date, json.dumps(spec)),
+            )
         conn.commit()
 
 
+def load_sweep_run(pg_url: str, runs_table: str, run_id: str) -> Optional[Tuple[date, dict, set]]:
+    """
+    Return (run_date, spec, completed_cells) for a recorded run, or None if unknown.
+    completed_cells holds (query, seniority_level) pairs with '' standing in for NULL.
+    """
+    psycopg = ensure_psycopg()
+    sql = psycopg.sql
+    with psycopg.connect(pg_url) as conn:
+        with conn.cursor() as cur:
+            _create_sweep_tables(cur, sql, runs_table)
+            cur.execute(
+                sql.SQL("SELECT run_date, spec FROM {runs} WHERE run_id = %s").format(runs=sql.Identifier(runs_table)),
+                (run_id,),
+            )
+            row = cur.fetchone()
+            if not row:
+                return None
+            cur.execute(
+                sql.SQL("SELECT query, seniority_level FROM {cells} WHERE run_id = %s").format(
+                    cells=sql.Identifier(f"{runs_table}_cells")
+                ),
+                (run_id,),
+            )
+            cells = {(q, s) for q, s in cur.fetchall()}
+        conn.commit()
+    return row[0], row[1], cells
+
+
+def mark_sweep_cell_done(pg_url: str, runs_table: str, run_id: str, query: Optional[str], seniority_level: Optional[str]) -> None:
+    psycopg = ensure_psycopg()
+    sql = psycopg.sql
+    with psycopg.connect(pg_url) as conn:
+        conn.execute(
+            sql.SQL(
+                """
+                INSERT INTO {cells} (run_id, query, seniority_level) VALUES (%s, %s, %s)
+                ON CONFLICT DO NOTHING
+                """
+            ).format(cells=sql.Identifier(f"{runs_table}_cells")),
+            (run_id, query or "", seniority_level or ""),
+        )
+
+
+def finish_sweep_run(pg_url: str, runs_table: str, run_id: str, status: str = "done") -> None:
+    psycopg = ensure_psycopg()
+    sql = psycopg.sql
+    with psycopg.connect(pg_url) as conn:
+        conn.execute(
+            sql.SQL("UPDATE {runs} SET status = %s, finished_at = NOW() WHERE run_id = %s").format(
+                runs=sql.Identifier(runs_table)
+            ),
+            (status, run_id),
+        )
+
+
+def load_completed_city_keys(pg_url: str, table: str, run_date: date) -> set:
+    """
+    (city, state_code, query, seniority_level) keys already fetched successfully on run_date.
+    """
+    psycopg = ensure_psycopg()
+    sql = psycopg.sql
+    with psycopg.connect(pg_url) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                sql.SQL(
+                    """
+                    SELECT city, state_code, query, seniority_level FROM {table_name}
+                    WHERE run_date = %s AND total IS NOT NULL
+                    """
+                ).format(table_name=sql.Identifier(table)),
+                (run_date,),
+            )
+            return {tuple(row) for row in cur.fetchall()}
+
+
+def load_refresh_history(pg_url: str, table: str, lookback_days: int = 60) -> Dict[Tuple, Tuple]:
+    """
+    Per (city, state_code, query, seniority_level): (last successful run_at, samples,
+    mean total, stddev of total) over the lookback window. Feeds planner.plan_refresh.
+    """
+    psycopg = ensure_psycopg()
+    sql = psycopg.sql
+    with psycopg.connect(pg_url) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass(%s)", (table,))
+            if cur.fetchone()[0] is None:
+                return {}
+            cur.execute(
+                sql.SQL(
+                    """
+                    SELECT city, state_code, query, seniority_level,
+                           MAX(run_at), COUNT(total), AVG(total)::float8, STDDEV_POP(total)::float8
+                    FROM {table_name}
+                    WHERE total IS NOT NULL
+                      -- run_date bound lets a partitioned table skip months outside the window
+                      AND run_at >= NOW() - make_interval(days => %s)
+                      AND run_date >= CURRENT_DATE - %s
+                    GROUP BY city, state_code, query, seniority_level
+                    """
+                ).format(table_name=sql.Identifier(table)),
+                (lookback_days, lookback_days + 1),
+            )
+            return {tuple(row[:4]): tuple(row[4:]) for row in cur.fetchall()}
+
+
+# Each URL carries a full encoded searchState (~1.3 KB), and /heatmap bodies are already
+# cached whole (api/cache.py), so this only needs to cover one default-limit (1000)
+# response for a few queries: ~5 MB per process, not the ~85 MB 65536 entries would hold.
+HIRING_CAFE_URL_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=HIRING_CAFE_URL_CACHE_SIZE)
+def hiring_cafe_url(
+    city: str,
+    state: str,
+    lat: float,
+    lon: float,
+    radius_miles: float,
+    search_query: str | None,
+    job_title_query: str | None,
+    seniority_level: str | None,
+) -> str:
+    """
+    hiring.cafe deep link for one heatmap point. Memoised: the same city/query/seniority
+    points come back on every /heatmap request until the next sweep, and the dict build
+    plus json.dumps and quote dominated serialising a 1000-point response.
+    """
+    search_state = {
+        "locations": [
+            {
+                "formatted_address": f"{city}, {state}, United States",
+                "types": ["locality", "political"],
+                "geometry": {"location": {"lat": lat, "lon": lon}},
+                "id": f"city_{city.lower().replace(' ','_')}_{state.lower()}",
+                "address_components": [
+                    {"long_name": city, "short_name": city, "types": ["locality", "political"]},
+                    {
+                        "long_name": state,
+                        "short_name": state,
+                        "types": ["administrative_area_level_1", "political"],
+                    },
+                    {"long_name": "United States", "short_name": "US", "types": ["country", "political"]},
+                ],
+                "options": {"radius_miles": radius_miles, "ignore_radius": False, "radius": radius_miles},
+            }
+        ],
+        "workplaceTypes": ["Remote", "Hybrid", "Onsite"],
+        "defaultToUserLocation": False,
+        "searchQuery": search_query or "",
+        "dateFetchedPastNDays": 61,
+        "sortBy": "default",
+    }
+    # Prefer jobTitleQuery when present (role-based queries)
+    if job_title_query:
+        search_state["jobTitleQuery"] = job_title_query
+    if seniority_level and seniority_level != "all":
+        search_state["seniorityLevel"] = SENIORITY_MAP.get(seniority_level, [seniority_level])
+    encoded = urllib.parse.quote(json.dumps(search_state))
+    return f"https://hiring.cafe/?searchState={encoded}"
+
+
+def _derived_source(cur, sql, table: str, name: str, rows_sql):
+    """
+    The derived table `name` for a read, or, before the first write has created it,
+    the same rows computed from history. Callers alias it. Reads never create or
+    backfill anything.
+    """
+    if _derived_exists(cur, name):
+        return sql.Identifier(name)
+    return sql.SQL("({rows})").format(rows=rows_sql(sql, table))
+
+
 def fetch_heatmap_points(
     pg_url: str,
     table: str,
@@ -208,89 +1457,80 @@ def fetch_heatmap_points(
     seniority_levels: list[str] | None = None,
     min_total: int = 0,
     limit: int = 1000,
+    pool=None,
+    include_urls: bool = True,
 ):
+    """
+    Latest good count per (city, query, seniority), read from {table}_latest (kept
+    current at ingest, so cost does not grow with history; until the first write after
+    an upgrade creates it, computed from history instead), or in normalized mode from
+    {table}_facts_latest joined to the city and query dimensions. With `pool` (see
+    create_pg_pool) the query runs on a pooled connection as a prepared statement.
+    include_urls=False leaves out hiring_cafe_url for clients that build links themselves.
+    """
     psycopg = ensure_psycopg()
-    connect = psycopg.connect
     sql = psycopg.sql
-    with connect(pg_url) as conn:
+    with _connection(pg_url, pool) as conn:
         with conn.cursor() as cur:
-            base = sql.SQL(
-                """
-                SELECT DISTINCT ON (city, state_code, query, seniority_level)
-                    city, state_code, state_name, lat, lon, radius_miles,
-                    total, query, job_title_query, role, seniority_level, run_at
-                FROM {table_name}
-                {where}
-                ORDER BY city, state_code, query, seniority_level, run_at DESC
-                LIMIT %s
-                """
-            )
+            normalized = is_normalized(cur, table)
+            # Both latest tables only hold successful counts, so no total IS NOT NULL filter is needed.
+            q, t = ("q.", "l.") if normalized else ("", "")
             clauses = []
             params = []
             if query:
-                clauses.append("query = %s")
+                clauses.append(q + "query = %s")
                 params.append(query)
             if roles:
-                clauses.append("role = ANY(%s)")
+                clauses.append(q + "role = ANY(%s)")
                 params.append(roles)
             levels = seniority_levels or ([seniority_level] if seniority_level else None)
             if levels:
-                clauses.append("seniority_level = ANY(%s)")
+                clauses.append(q + "seniority_level = ANY(%s)")
                 params.append(levels)
             if min_total > 0:
-                clauses.append("total >= %s")
+                clauses.append(t + "total >= %s")
                 params.append(min_total)
             where_sql = sql.SQL("")
             if clauses:
                 where_sql = sql.SQL("WHERE " + " AND ".join(clauses))
-            cur.execute(
-                base.format(table_name=sql.Identifier(table), where=where_sql),
-                (*params, limit),
-            )
-            rows = cur.fetchall()
-    def hiring_cafe_url(
-        city: str,
-        state: str,
-        lat: float,
-        lon: float,
-        radius_miles: float,
-        search_query: str | None,
-        job_title_query: str | None,
-        seniority_level: str | None,
-    ):
-        search_state = {
-            "locations": [
-                {
-                    "formatted_address": f"{city}, {state}, United States",
-                    "types": ["locality", "political"],
-                    "geometry": {"location": {"lat": lat, "lon": lon}},
-                    "id": f"city_{city.lower().replace(' ','_')}_{state.lower()}",
-                    "address_components": [
-                        {"long_name": city, "short_name": city, "types": ["locality", "political"]},
-                        {
-                            "long_name": state,
-                            "short_name": state,
-                            "types": ["administrative_area_level_1", "political"],
-                        },
-                        {"long_name": "United States", "short_name": "US", "types": ["country", "political"]},
-                    ],
-                    "options": {"radius_miles": radius_miles, "ignore_radius": False, "radius": radius_miles},
-                }
-            ],
-            "workplaceTypes": ["Remote", "Hybrid", "Onsite"],
-            "defaultToUserLocation": False,
-            "searchQuery": search_query or "",
-            "dateFetchedPastNDays": 61,
-            "sortBy": "default",
-        }
-        # Prefer jobTitleQuery when present (role-based queries)
-        if job_title_query:
-            search_state["jobTitleQuery"] = job_title_query
-        if seniority_level and seniority_level != "all":
-            search_state["seniorityLevel"] = SENIORITY_MAP.get(seniority_level, [seniority_level])
-        encoded = urllib.parse.quote(json.dumps(search_state))
-        return f"https://hiring.cafe/?searchState={encoded}"
-
+            if normalized:
+                stmt = sql.SQL(
+                    """
+                    SELECT c.name, c.state_code, c.state_name, c.lat, c.lon, l.radius_miles,
+                        l.total, NULLIF(q.query, ''), q.job_title_query, q.role, NULLIF(q.seniority_level, ''), l.run_at
+                    FROM {queries} q
+                    JOIN {latest} l ON l.query_id = q.id
+                    JOIN {cities} c ON c.id = l.city_id
+                    {where}
+                    ORDER BY c.name, c.state_code, q.query, q.seniority_level
+                    LIMIT %s
+                    """
+                ).format(
+                    queries=sql.Identifier(queries_table_name(table)),
+                    latest=sql.Identifier(facts_latest_table_name(table)),
+                    cities=sql.Identifier(cities_table_name(table)),
+                    where=where_sql,
+                )
+            else:
+                stmt = sql.SQL(
+                    """
+                    SELECT city, state_code, state_name, lat, lon, radius_miles,
+                        total, NULLIF(query, ''), job_title_query, role, NULLIF(seniority_level, ''), run_at
+                    FROM {source} l
+                    {where}
+                    ORDER BY city, state_code, query, seniority_level
+                    LIMIT %s
+                    """
+                ).format(source=_derived_source(cur, sql, table, latest_table_name(table), _latest_rows_sql), where=where_sql)
+            with DB_QUERY_LATENCY.time(query="fetch_heatmap_points"):
+                cur.execute(
+                    stmt,
+                    (*params, limit),
+                    # Prepared once per connection and filter combination; a one-off
+                    # connection would only pay the extra PREPARE round trip.
+                    prepare=True if pool is not None else None,
+                )
+                rows = cur.fetchall()
     result = []
     for r in rows:
         lat = float(r[3])
@@ -310,15 +1550,120 @@ def fetch_heatmap_points(
             "seniority_level": r[10],
             "run_at": r[11].isoformat() if r[11] else None,
         }
-        entry["hiring_cafe_url"] = hiring_cafe_url(
-            entry["city"],
-            entry["state"],
-            lat,
-            lon,
-            radius_val,
-            entry["query"],
-            entry["job_title_query"],
-            entry["seniority_level"],
-        )
+        if include_urls:
+            entry["hiring_cafe_url"] = hiring_cafe_url(
+                entry["city"],
+                entry["state"],
+                lat,
+                lon,
+                radius_val,
+                entry["query"],
+                entry["job_title_query"],
+                entry["seniority_level"],
+            )
         result.append(entry)
     return result
+
+
+def fetch_city_history(
+    pg_url: str,
+    table: str,
+    cities: list[tuple[str, str]],
+    date_from: date,
+    date_to: date,
+    query: str | None = None,
+    roles: list[str] | None = None,
+    seniority_levels: list[str] | None = None,
+    pool=None,
+):
+    """
+    Daily totals for each (city, state) in `cities` between date_from and date_to
+    (inclusive), one series per (city, query, seniority). Read from {table}_daily
+    (computed from history until the first write creates it), or in normalized mode
+    from {table}_facts, whose (city_id, query_id, run_date) key
+    orders rows the same way. Each series is assembled into arrays in the database
+    straight off the index, so the response costs one row per series, not per day.
+    """
+    psycopg = ensure_psycopg()
+    sql = psycopg.sql
+    names = [c for c, _ in cities]
+    states = [s.upper() for _, s in cities]
+    with _connection(pg_url, pool) as conn:
+        with conn.cursor() as cur:
+            normalized = is_normalized(cur, table)
+            clauses = []
+            params: list = []
+            if query:
+                clauses.append("query = %s")
+                params.append(query)
+            if roles:
+                clauses.append("role = ANY(%s)")
+                params.append(roles)
+            if seniority_levels:
+                clauses.append("seniority_level = ANY(%s)")
+                params.append(seniority_levels)
+            if normalized:
+                # Matching query ids are resolved once (the dimension is tiny), then each
+                # city's facts are one range scan per query id.
+                stmt = sql.SQL(
+                    """
+                    SELECT c.name, c.state_code, NULLIF(q.query, ''), q.role, NULLIF(q.seniority_level, ''),
+                        s.dates, s.totals
+                    FROM unnest(%s::text[], %s::text[]) AS k(city, state_code)
+                    JOIN {cities} c ON c.name = k.city AND c.state_code = k.state_code
+                    CROSS JOIN LATERAL (
+                        SELECT f.query_id,
+                            array_agg(to_char(f.run_date, 'YYYY-MM-DD') ORDER BY f.run_date) AS dates,
+                            array_agg(f.total ORDER BY f.run_date) AS totals
+                        FROM {facts} f
+                        WHERE f.city_id = c.id
+                          AND f.query_id = ANY(ARRAY(SELECT id FROM {queries} {where}))
+                          AND f.run_date BETWEEN %s AND %s
+                          AND f.total IS NOT NULL
+                        GROUP BY f.query_id
+                    ) s
+                    JOIN {queries} q ON q.id = s.query_id
+                    """
+                ).format(
+                    cities=sql.Identifier(cities_table_name(table)),
+                    facts=sql.Identifier(facts_table_name(table)),
+                    queries=sql.Identifier(queries_table_name(table)),
+                    where=sql.SQL("WHERE " + " AND ".join(clauses)) if clauses else sql.SQL(""),
+                )
+                params = [names, states, *params, date_from, date_to]
+            else:
+                stmt = sql.SQL(
+                    """
+                    SELECT k.city, k.state_code, NULLIF(s.query, ''), s.role, NULLIF(s.seniority_level, ''),
+                        s.dates, s.totals
+                    FROM unnest(%s::text[], %s::text[]) AS k(city, state_code)
+                    CROSS JOIN LATERAL (
+                        SELECT d.query, d.seniority_level, MAX(d.role) AS role,
+                            array_agg(to_char(d.run_date, 'YYYY-MM-DD') ORDER BY d.run_date) AS dates,
+                            array_agg(d.total ORDER BY d.run_date) AS totals
+                        FROM {daily} d
+                        WHERE d.city = k.city AND d.state_code = k.state_code
+                          AND d.run_date BETWEEN %s AND %s {filters}
+                        GROUP BY d.query, d.seniority_level
+                    ) s
+                    """
+                ).format(
+                    daily=_derived_source(cur, sql, table, daily_table_name(table), _daily_rows_sql),
+                    filters=sql.SQL("".join(" AND d." + c for c in clauses)),
+                )
+                params = [names, states, date_from, date_to, *params]
+            with DB_QUERY_LATENCY.time(query="fetch_city_history"):
+                cur.execute(stmt, params, prepare=True if pool is not None else None)
+                rows = cur.fetchall()
+    return [
+        {
+            "city": city,
+            "state": state,
+            "query": q_text,
+            "role": role,
+            "seniority_level": level,
+            "dates": dates,
+            "totals": totals,
+        }
+        for city, state, q_text, role, level, dates, totals in rows
+    ]
@@ -1,69 +1,184 @@
 from __future__ import annotations
 
 import csv
+import hashlib
+import io
+import marshal
+import os
+import sys
+import zipfile
+from array import array
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Callable, Dict, Iterator, List, Optional, TextIO, Tuple
 
 from .util import normalize_place_name
-from .cities import load_us_states
 
+# Bump when the parse rules change so stale cache files are ignored.
+CACHE_FORMAT = 1
 
-def load_gazetteer_area_sqmi(path: Path) -> Dict[Tuple[str, str], float]:
+
+def load_gazetteer_area_sqmi(path: Path, use_cache: bool = True) -> Dict[Tuple[str, str], float]:
     """
-    Load land area (sq mi) from a Census Gazetteer places CSV/TSV file.
+    Load land area (sq mi) from a Census Gazetteer places file: the .txt/.csv itself or
+    the Census .zip it ships in (read in place, no unzip step).
     Expected columns: NAME, ALAND_SQMI (preferred) or ALAND (meters^2).
-    Returns mapping of (city_lower, state_code) -> land area in square miles.
+    Returns mapping of (city_name, state_code) -> land area in square miles, keyed by
+    normalize_place_name; the lowercased raw name is kept only where two places share a
+    normalised name. The parsed result is cached next to the source, keyed by its sha256.
     """
     if not path.exists():
         raise FileNotFoundError(f"Gazetteer file not found: {path}")
 
-    state_lookup = load_us_states()  # code -> metadata
-    states_by_name = {v["name"].lower(): k for k, v in state_lookup.items()}
+    cache_path = None
+    if use_cache:
+        cache_path = _cache_path(path, _sha256_file(path))
+        cached = _read_cache(cache_path)
+        if cached is not None:
+            return cached
+
+    with _open_text(path) as fh:
+        area_by_city = _parse_gazetteer(fh)
+    if cache_path is not None:
+        _write_cache(cache_path, area_by_city)
+    return area_by_city
+
+
+@contextmanager
+def _open_text(path: Path) -> Iterator[TextIO]:
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            members = [n for n in zf.namelist() if n.lower().endswith((".txt", ".csv", ".tsv"))]
+            if not members:
+                raise ValueError(f"No .txt/.csv Gazetteer member in {path}")
+            with zf.open(members[0]) as raw:
+                yield io.TextIOWrapper(raw, encoding="utf-8", newline="")
+    else:
+        with path.open(encoding="utf-8", newline="") as fh:
+            yield fh
+
+
+def _parse_gazetteer(fh: TextIO) -> Dict[Tuple[str, str], float]:
+    sample = fh.readline()
+    delimiter = "\t" if "\t" in sample else ","
+    header = [h.strip() for h in next(csv.reader([sample], delimiter=delimiter))]
+    col = {name: i for i, name in enumerate(header)}
+    if "NAME" not in col:
+        raise ValueError(f"Gazetteer header has no NAME column: {header[:8]}")
+    i_name = col["NAME"]
+    i_usps = col.get("USPS")
+    i_sqmi = col.get("ALAND_SQMI")
+    i_aland = col.get("ALAND")
+    state_to_code = _state_resolver()
+
+    # (normalised name, state) -> [(raw name, area)] in file order
+    rows: Dict[Tuple[str, str], List[Tuple[str, float]]] = {}
+    for row in csv.reader(fh, delimiter=delimiter):
+        if len(row) <= i_name:
+            continue
+        name_raw = row[i_name]
+        if not name_raw:
+            continue
+        parts = [p.strip() for p in name_raw.split(",")]
+        city_name = parts[0]
+        state_raw = parts[1] if len(parts) > 1 else ""
+        state_code = state_to_code(state_raw, row[i_usps] if i_usps is not None and i_usps < len(row) else "")
+        if not state_code:
+            continue
+
+        area_sqmi = 0.0
+        if i_sqmi is not None and i_sqmi < len(row) and row[i_sqmi]:
+            area_sqmi = float(row[i_sqmi])
+        if not area_sqmi and i_aland is not None and i_aland < len(row) and row[i_aland]:
+            try:
+                area_sqmi = float(row[i_aland]) / 1609.344 / 1609.344
+            except ValueError:
+                pass
+        if area_sqmi <= 0:
+            continue
+
+        state_code = sys.intern(state_code.upper())
+        rows.setdefault((normalize_place_name(city_name), state_code), []).append((city_name.lower(), area_sqmi))
+
+    area_by_city: Dict[Tuple[str, str], float] = {}
+    for (norm, state), places in rows.items():
+        # Last row wins for the normalised key, as it always has.
+        area_by_city[(norm, state)] = places[-1][1]
+        if len({raw for raw, _ in places}) > 1:
+            # Distinct places collapse to one normalised name (e.g. "x city" / "x town");
+            # keep their exact names so an exact match still finds the right one.
+            for raw, area in places:
+                area_by_city[(raw, state)] = area
+    return area_by_city
+
+
+def _state_resolver() -> Callable[[str, str], str]:
+    states_by_name: Optional[Dict[str, str]] = None
 
     def state_to_code(state_str: str, usps: str) -> str:
+        nonlocal states_by_name
         if usps and len(usps.strip()) == 2:
             return usps.strip().upper()
         state_str = state_str.strip().lower()
         if len(state_str) == 2:
             return state_str.upper()
+        if states_by_name is None:
+            # Only files without a USPS column need the geonamescache state table.
+            from .cities import load_us_states
+
+            states_by_name = {v["name"].lower(): k for k, v in load_us_states().items()}
         return states_by_name.get(state_str, state_str.upper())
 
-    area_by_city: Dict[Tuple[str, str], float] = {}
-    with path.open(newline="") as fh:
-        sample = fh.read(1024)
-        fh.seek(0)
-        delimiter = "\t" if "\t" in sample else ","
-        reader = csv.DictReader(fh, delimiter=delimiter)
-
-        for row in reader:
-            name_raw = row.get("NAME", "") or ""
-            if not name_raw:
-                continue
-            parts = [p.strip() for p in name_raw.split(",")]
-            city_name = parts[0]
-            state_raw = parts[1] if len(parts) > 1 else ""
-            state_code = state_to_code(state_raw, row.get("USPS", ""))
-            if not state_code:
-                continue
-
-            area_sqmi_str = row.get("ALAND_SQMI") or ""
-            area_sqmi = float(area_sqmi_str) if area_sqmi_str else 0.0
-
-            if not area_sqmi:
-                area_m2_str = row.get("ALAND") or ""
-                if area_m2_str:
-                    try:
-                        area_m2 = float(area_m2_str)
-                        area_sqmi = area_m2 / 1609.344 / 1609.344
-                    except ValueError:
-                        pass
-
-            if area_sqmi <= 0:
-                continue
-
-            key_raw = (city_name.lower(), state_code.upper())
-            key_norm = (normalize_place_name(city_name), state_code.upper())
-            area_by_city[key_raw] = area_sqmi
-            area_by_city[key_norm] = area_sqmi
+    return state_to_code
 
-    return area_by_city
+
+def _sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_path(path: Path, sha: str) -> Path:
+    return path.with_name(f".{path.name}.{sha[:16]}.areas")
+
+
+def _read_cache(cache_path: Path) -> Optional[Dict[Tuple[str, str], float]]:
+    # Columns are stored flat (one joined name string, a byte per row indexing the
+    # state table, packed doubles) so the file stays small and loads in a few reads.
+    try:
+        with cache_path.open("rb") as fh:
+            fmt, names, state_table, state_idx, areas_raw = marshal.load(fh)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if fmt != CACHE_FORMAT:
+        return None
+    areas = array("d")
+    areas.frombytes(areas_raw)
+    codes = map(tuple(sys.intern(s) for s in state_table).__getitem__, state_idx)
+    return dict(zip(zip(names.split("\n"), codes), areas.tolist()))
+
+
+def _write_cache(cache_path: Path, area_by_city: Dict[Tuple[str, str], float]) -> None:
+    names = [k[0] for k in area_by_city]
+    if any("\n" in n for n in names):
+        return
+    state_table: Dict[str, int] = {}
+    tmp = cache_path.with_suffix(".tmp")
+    try:
+        state_idx = bytes(state_table.setdefault(k[1], len(state_table)) for k in area_by_city)
+        payload = (
+            CACHE_FORMAT,
+            "\n".join(names),
+            tuple(state_table),
+            state_idx,
+            array("d", area_by_city.values()).tobytes(),
+        )
+        with tmp.open("wb") as fh:
+            marshal.dump(payload, fh)
+        os.replace(tmp, cache_path)
+    except (OSError, ValueError):
+        # Read-only data dir (or >256 state codes): the parse still succeeded, it
+        # just won't be cached.
+        pass
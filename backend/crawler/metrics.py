@@ -0,0 +1,317 @@
+from __future__ import annotations
+
+import bisect
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import requests
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers a cache hit (~ms) through a slow upstream call (tens of seconds).
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric(ABC):
+    """
+    Minimal Prometheus metric (text exposition format 0.0.4); label values are passed
+    as keyword arguments on every call, e.g. REQUESTS.inc(status="200").
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        ...
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        # Unlabelled counters start at 0 so they are exported before the first event.
+        self._values: Dict[LabelKey, float] = {} if self.labelnames else {(): 0.0}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+        self._functions: Dict[LabelKey, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def set_function(self, fn: Callable[[], float], **labels: str) -> None:
+        """Sample `fn` at render time instead of storing a value."""
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = fn
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, fn in functions.items():
+            try:
+                values[key] = float(fn())
+            except Exception:
+                continue
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in sorted(values.items())]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> (per-bucket counts (+Inf last), sum, count)
+        self._values: Dict[LabelKey, List] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][idx] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return entry[2] if entry else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(
+        self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# hiring.cafe client
+UPSTREAM_REQUESTS = REGISTRY.counter(
+    "hiringcafe_requests_total", "Upstream requests by HTTP status ('error' = no response).", ["status"]
+)
+UPSTREAM_LATENCY = REGISTRY.histogram(
+    "hiringcafe_request_duration_seconds", "Upstream request latency, excluding rate-limiter wait."
+)
+RATELIMIT_WAIT = REGISTRY.histogram(
+    "hiringcafe_ratelimit_wait_seconds",
+    "Time spent waiting for a rate-limiter token before each request.",
+    buckets=(0.0, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+RATELIMIT_RATE = REGISTRY.gauge("hiringcafe_ratelimit_rate", "Current adaptive limiter rate (req/s).", ["upstream"])
+RETRIES = REGISTRY.counter("hiringcafe_retries_total", "Count requests retried after a transient failure.")
+CACHE_LOOKUPS = REGISTRY.counter("hiringcafe_cache_lookups_total", "Response cache lookups by result.", ["result"])
+SINGLEFLIGHT_DEDUPED = REGISTRY.counter(
+    "hiringcafe_singleflight_deduped_total", "Calls served by an identical in-flight request."
+)
+CITY_RESULTS = REGISTRY.counter("crawler_city_results_total", "City count results by outcome.", ["outcome"])
+
+# Flask API
+HTTP_LATENCY = REGISTRY.histogram(
+    "api_request_duration_seconds", "API request latency by route.", ["route", "method", "status"]
+)
+HEATMAP_CACHE = REGISTRY.counter(
+    "api_heatmap_cache_total", "/heatmap response cache lookups (hit/miss) and invalidations.", ["event"]
+)
+
+# Postgres
+DB_QUERY_LATENCY = REGISTRY.histogram("db_query_duration_seconds", "Postgres query time by query.", ["query"])
+DB_POOL_CONNECTIONS = REGISTRY.gauge(
+    "db_pool_connections", "API connection pool: open (size), idle (available) and waiting requests.", ["state"]
+)
+
+
+def write_textfile(path: Path, registry: Registry = REGISTRY) -> None:
+    """Atomically write the registry for node_exporter's textfile collector."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(registry.render())
+    os.replace(tmp, path)
+
+
+def push_to_gateway(url: str, job: str, registry: Registry = REGISTRY, timeout_s: float = 10.0) -> None:
+    """PUT the registry to a Prometheus Pushgateway under /metrics/job/<job>."""
+    resp = requests.put(
+        f"{url.rstrip('/')}/metrics/job/{job}",
+        data=registry.render().encode("utf-8"),
+        headers={"Content-Type": CONTENT_TYPE},
+        timeout=timeout_s,
+    )
+    resp.raise_for_status()
+
+
+class MetricsExporter:
+    """
+    Periodically writes a textfile and/or pushes to a Pushgateway from a daemon thread,
+    with a final export on close, for crawler processes that have no HTTP endpoint.
+    """
+
+    def __init__(
+        self,
+        textfile: Optional[str] = None,
+        push_url: Optional[str] = None,
+        job: str = "jobs_crawler",
+        interval_s: float = 15.0,
+        registry: Registry = REGISTRY,
+    ) -> None:
+        self.textfile = Path(textfile) if textfile else None
+        self.push_url = push_url
+        self.job = job
+        self.interval_s = max(1.0, interval_s)
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "MetricsExporter":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+            self._thread.start()
+
+    def export(self) -> None:
+        if self.textfile:
+            write_textfile(self.textfile, self.registry)
+        if self.push_url:
+            push_to_gateway(self.push_url, self.job, self.registry)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.export()
+            except Exception as exc:
+                print(f"Metrics export failed: {exc}")
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        try:
+            self.export()
+        except Exception as exc:
+            print(f"Metrics export failed: {exc}")
@@ -0,0 +1,252 @@
+"""
+Normalized storage for city_counts.
+
+In normalized mode (`--pg-storage normalized`) the history lives in small-integer
+keyed dimensions ({table}_cities, {table}_queries) and a narrow {table}_facts table;
+`table` itself is a view with the old wide columns. Move an existing wide table over
+with:
+
+    cd backend
+    python -m crawler.normalize migrate --pg-url ... [--partitioned]
+    python -m crawler.normalize sync-areas --pg-url ...   # fill city land areas from city_areas
+
+`migrate` runs in one transaction and keeps the wide rows as {table}_wide (and its
+_latest/_daily tables as {table}_wide_latest/_wide_daily) until you drop them. Restart
+API processes afterwards; they detect the storage mode once per process.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from typing import Dict
+
+from .config import env_bool, load_env_file
+from .db import (
+    _create_normalized_tables,
+    _ensure_partitions,
+    _schema_transaction,
+    cities_table_name,
+    daily_table_name,
+    ensure_psycopg,
+    facts_latest_table_name,
+    facts_table_name,
+    is_normalized,
+    latest_table_name,
+    load_area_lookup_from_pg,
+    month_start,
+    next_month,
+    queries_table_name,
+)
+from .tracing import span
+
+
+def _relation_bytes(cur, names) -> int:
+    cur.execute(
+        "SELECT COALESCE(SUM(pg_total_relation_size(to_regclass(n))), 0) FROM unnest(%s::text[]) AS n",
+        (list(names),),
+    )
+    return int(cur.fetchone()[0])
+
+
+def _partition_bytes(cur, table: str) -> int:
+    """Total size of `table`, including the partitions of a partitioned table."""
+    cur.execute(
+        """
+        SELECT COALESCE(SUM(pg_total_relation_size(relid)), 0)
+        FROM pg_partition_tree(to_regclass(%s))
+        """,
+        (table,),
+    )
+    return int(cur.fetchone()[0])
+
+
+def migrate(pg_url: str, table: str, partitioned: bool = False) -> Dict[str, int]:
+    """
+    Convert the wide history table `table` to normalized storage. Returns row counts
+    and the before/after sizes in bytes.
+    """
+    psycopg = ensure_psycopg()
+    sql = psycopg.sql
+    wide = f"{table}_wide"
+    with psycopg.connect(pg_url) as conn, _schema_transaction(conn):
+        with conn.cursor() as cur:
+            if is_normalized(cur, table):
+                raise RuntimeError(f"{table} already uses normalized storage.")
+            cur.execute("SELECT to_regclass(%s), to_regclass(%s)", (table, wide))
+            current, leftover = cur.fetchone()
+            if current is None:
+                raise RuntimeError(f"Table {table} does not exist.")
+            if leftover is not None:
+                raise RuntimeError(f"{wide} already exists; drop it before migrating again.")
+
+            before = _partition_bytes(cur, table) + _relation_bytes(cur, [latest_table_name(table), daily_table_name(table)])
+            cur.execute(sql.SQL("LOCK TABLE {} IN ACCESS EXCLUSIVE MODE").format(sql.Identifier(table)))
+            cur.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(sql.Identifier(table), sql.Identifier(wide)))
+            # Tables derived from the wide rows go with them; facts serve the same reads.
+            for derived in (latest_table_name, daily_table_name):
+                cur.execute(
+                    sql.SQL("ALTER TABLE IF EXISTS {} RENAME TO {}").format(
+                        sql.Identifier(derived(table)), sql.Identifier(derived(wide))
+                    )
+                )
+            _create_normalized_tables(cur, sql, table, partitioned=partitioned)
+
+            names = {
+                "wide": sql.Identifier(wide),
+                "cities": sql.Identifier(cities_table_name(table)),
+                "queries": sql.Identifier(queries_table_name(table)),
+                "facts": sql.Identifier(facts_table_name(table)),
+                "latest": sql.Identifier(facts_latest_table_name(table)),
+            }
+            with span("db_migrate_normalized", cat="db", table=table):
+                # Dimension attributes come from each key's most recent row.
+                cur.execute(
+                    sql.SQL(
+                        """
+                        INSERT INTO {cities} (name, state_code, state_name, lat, lon, population)
+                        SELECT DISTINCT ON (city, state_code) city, state_code, state_name, lat, lon, population
+                        FROM {wide}
+                        ORDER BY city, state_code, run_at DESC
+                        """
+                    ).format(**names)
+                )
+                cities = cur.rowcount
+                cur.execute(
+                    sql.SQL(
+                        """
+                        INSERT INTO {queries} (query, seniority_level, role, job_title_query)
+                        SELECT DISTINCT ON (COALESCE(query, ''), COALESCE(seniority_level, ''))
+                            COALESCE(query, ''), COALESCE(seniority_level, ''), role, job_title_query
+                        FROM {wide}
+                        ORDER BY COALESCE(query, ''), COALESCE(seniority_level, ''), run_at DESC
+                        """
+                    ).format(**names)
+                )
+                queries = cur.rowcount
+                if partitioned:
+                    cur.execute(sql.SQL("SELECT MIN(run_date), MAX(run_date) FROM {wide}").format(**names))
+                    lo, hi = cur.fetchone()
+                    if lo is not None:
+                        months = [month_start(lo)]
+                        while months[-1] < month_start(hi):
+                            months.append(next_month(months[-1]))
+                        _ensure_partitions(cur, sql, facts_table_name(table), months)
+                # NULL query/seniority rows were not unique in the wide table; keep the newest.
+                resolved = sql.SQL(
+                    """
+                    FROM {wide} w
+                    JOIN {cities} c ON c.name = w.city AND c.state_code = w.state_code
+                    JOIN {queries} q ON q.query = COALESCE(w.query, '') AND q.seniority_level = COALESCE(w.seniority_level, '')
+                    """
+                ).format(**names)
+                cur.execute(
+                    sql.SQL(
+                        """
+                        INSERT INTO {facts} (city_id, query_id, run_date, total, radius_miles, error)
+                        SELECT DISTINCT ON (c.id, q.id, w.run_date) c.id, q.id, w.run_date, w.total, w.radius_miles, w.error
+                        {resolved}
+                        ORDER BY c.id, q.id, w.run_date, w.run_at DESC
+                        """
+                    ).format(resolved=resolved, **names)
+                )
+                facts = cur.rowcount
+                cur.execute(
+                    sql.SQL(
+                        """
+                        INSERT INTO {latest} (query_id, city_id, total, radius_miles, run_date, run_at)
+                        SELECT DISTINCT ON (q.id, c.id) q.id, c.id, w.total, w.radius_miles, w.run_date, w.run_at
+                        {resolved}
+                        WHERE w.total IS NOT NULL
+                        ORDER BY q.id, c.id, w.run_at DESC
+                        """
+                    ).format(resolved=resolved, **names)
+                )
+            for name in (cities_table_name(table), queries_table_name(table), facts_table_name(table)):
+                cur.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(name)))
+            after = _partition_bytes(cur, facts_table_name(table)) + _relation_bytes(
+                cur, [cities_table_name(table), queries_table_name(table), facts_latest_table_name(table)]
+            )
+    return {"cities": cities, "queries": queries, "facts": facts, "bytes_before": before, "bytes_after": after}
+
+
+def sync_areas(pg_url: str, table: str, areas_table: str, map_boroughs: bool) -> int:
+    """Copy land areas from `areas_table` (see --pg-areas-table) onto {table}_cities."""
+    from .areas import area_for_city
+
+    psycopg = ensure_psycopg()
+    sql = psycopg.sql
+    area_lookup = load_area_lookup_from_pg(pg_url, areas_table, create_table=False)
+    with psycopg.connect(pg_url) as conn:
+        with conn.cursor() as cur:
+            if not is_normalized(cur, table):
+                raise RuntimeError(f"{table} does not use normalized storage.")
+            cities = sql.Identifier(cities_table_name(table))
+            cur.execute(sql.SQL("SELECT id, name, state_code FROM {}").format(cities))
+            ids, areas = [], []
+            for city_id, name, state_code in cur.fetchall():
+                area = area_for_city(area_lookup, name, state_code, map_boroughs)
+                if area:
+                    ids.append(city_id)
+                    areas.append(area)
+            cur.execute(
+                sql.SQL(
+                    """
+                    UPDATE {cities} c SET area_sqmi = v.area
+                    FROM unnest(%s::int[], %s::float8[]) AS v(id, area)
+                    WHERE c.id = v.id AND c.area_sqmi IS DISTINCT FROM v.area
+                    """
+                ).format(cities=cities),
+                (ids, areas),
+            )
+            updated = cur.rowcount
+        conn.commit()
+    return updated
+
+
+def main() -> None:
+    load_env_file()
+    ap = argparse.ArgumentParser(description="Normalized storage for city_counts.")
+    ap.add_argument("command", choices=["migrate", "sync-areas"])
+    ap.add_argument("--pg-url", default=None, help="Postgres connection URL (required).")
+    ap.add_argument("--pg-table", default="city_counts")
+    ap.add_argument("--pg-areas-table", default="city_areas")
+    ap.add_argument(
+        "--partitioned",
+        action="store_true",
+        default=env_bool("JOBS_PG_PARTITIONED", False),
+        help="migrate: partition the facts table by month of run_date.",
+    )
+    ap.add_argument(
+        "--map-nyc-boroughs",
+        action="store_true",
+        default=env_bool("JOBS_MAP_NYC_BORO_TO_CITY", True),
+        help="sync-areas: map NYC borough names to New York City.",
+    )
+    args = ap.parse_args()
+    if not args.pg_url:
+        print("--pg-url is required.")
+        sys.exit(1)
+
+    try:
+        if args.command == "migrate":
+            stats = migrate(args.pg_url, args.pg_table, partitioned=args.partitioned)
+            print(
+                f"Migrated {stats['facts']} rows ({stats['cities']} cities, {stats['queries']} queries): "
+                f"{stats['bytes_before'] / 1e6:.1f} MB -> {stats['bytes_after'] / 1e6:.1f} MB. "
+                f"The wide rows are kept in {args.pg_table}_wide."
+            )
+            try:
+                updated = sync_areas(args.pg_url, args.pg_table, args.pg_areas_table, args.map_nyc_boroughs)
+                print(f"Filled land area for {updated} cities from {args.pg_areas_table}.")
+            except ensure_psycopg().errors.UndefinedTable:
+                print(f"No {args.pg_areas_table} table; run sync-areas once it is loaded.")
+        else:
+            updated = sync_areas(args.pg_url, args.pg_table, args.pg_areas_table, args.map_nyc_boroughs)
+            print(f"Filled land area for {updated} cities from {args.pg_areas_table}.")
+    except RuntimeError as exc:
+        print(f"Normalized storage failed: {exc}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+"""
+Partition maintenance and retention for the city_counts history table.
+
+A table created with --pg-partitioned is range-partitioned by run_date, one partition
+per month ({table}_pYYYY_MM). Writers add the partitions they need on the fly; this
+module covers the rest:
+
+    cd backend
+    python -m crawler.partitions convert --pg-url ...          # move an existing table over
+    python -m crawler.partitions ensure --pg-url ... --ahead 2  # pre-create upcoming months
+    python -m crawler.partitions compact --pg-url ... --keep-days 90 --grain week
+
+`compact` folds daily rows older than --keep-days into {table}_rollup (one row per
+city/query/seniority per week or month: samples, min/max/avg and last total) and then
+drops them: whole partitions are detached and dropped, so storage stays bounded and
+no VACUUM is needed; an unpartitioned table falls back to DELETE. {table}_daily is
+trimmed to the same window, so the history endpoints cover the same days whether they
+read it (wide storage) or {table}_facts (normalized). {table}_latest is not touched,
+so /heatmap keeps the last good count for every city.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+from .config import env_int, load_env_file
+from .db import (
+    _create_city_counts_table,
+    _ensure_partitions,
+    _normalized_rows_sql,
+    _schema_transaction,
+    daily_table_name,
+    ensure_psycopg,
+    history_table,
+    is_normalized,
+    is_partitioned,
+    month_start,
+    next_month,
+    partition_name,
+)
+from .tracing import span
+
+GRAINS = ("week", "month")
+
+
+def rollup_table_name(table: str) -> str:
+    return f"{table}_rollup"
+
+
+def _create_rollup_table(cur, sql, table: str) -> None:
+    cur.execute(
+        sql.SQL(
+            """
+            CREATE TABLE IF NOT EXISTS {rollup} (
+                city TEXT NOT NULL,
+                state_code TEXT NOT NULL,
+                query TEXT NOT NULL DEFAULT '',
+                role TEXT,
+                seniority_level TEXT NOT NULL DEFAULT '',
+                grain TEXT NOT NULL,
+                period_start DATE NOT NULL,
+                samples INTEGER NOT NULL,
+                errors INTEGER NOT NULL,
+                total_avg DOUBLE PRECISION,
+                total_min INTEGER,
+                total_max INTEGER,
+                total_last INTEGER,
+                last_run_date DATE NOT NULL,
+                PRIMARY KEY (city, state_code, query, seniority_level, grain, period_start)
+            )
+            """
+        ).format(rollup=sql.Identifier(rollup_table_name(table)))
+    )
+
+
+def _rollup_rows(cur, sql, source, table: str, grain: str, before: Optional[date]) -> int:
+    """
+    Aggregate `source` (SQL for the history table, or for one of its partitions) into
+    {table}_rollup. A week that spans two compaction runs is merged, not overwritten.
+    """
+    where = sql.SQL("WHERE run_date < {}").format(sql.Literal(before)) if before else sql.SQL("")
+    cur.execute(
+        sql.SQL(
+            """
+            INSERT INTO {rollup} AS r (
+                city, state_code, query, role, seniority_level, grain, period_start,
+                samples, errors, total_avg, total_min, total_max, total_last, last_run_date
+            )
+            SELECT city, state_code, COALESCE(query, ''), MAX(role), COALESCE(seniority_level, ''),
+                   {grain}, date_trunc({grain}, run_date)::date,
+                   COUNT(total), COUNT(*) - COUNT(total),
+                   AVG(total)::float8, MIN(total), MAX(total),
+                   (ARRAY_AGG(total ORDER BY run_date DESC) FILTER (WHERE total IS NOT NULL))[1],
+                   MAX(run_date)
+            FROM {source} {where}
+            GROUP BY city, state_code, COALESCE(query, ''), COALESCE(seniority_level, ''),
+                     date_trunc({grain}, run_date)
+            ON CONFLICT (city, state_code, query, seniority_level, grain, period_start) DO UPDATE SET
+                total_avg = (COALESCE(r.total_avg, 0) * r.samples + COALESCE(EXCLUDED.total_avg, 0) * EXCLUDED.samples)
+                    / NULLIF(r.samples + EXCLUDED.samples, 0),
+                samples = r.samples + EXCLUDED.samples,
+                errors = r.errors + EXCLUDED.errors,
+                total_min = LEAST(r.total_min, EXCLUDED.total_min),
+                total_max = GREATEST(r.total_max, EXCLUDED.total_max),
+                total_last = CASE
+                    WHEN EXCLUDED.last_run_date >= r.last_run_date THEN COALESCE(EXCLUDED.total_last, r.total_last)
+                    ELSE COALESCE(r.total_last, EXCLUDED.total_last)
+                END,
+                last_run_date = GREATEST(r.last_run_date, EXCLUDED.last_run_date),
+                role = COALESCE(EXCLUDED.role, r.role)
+            """
+        ).format(
+            rollup=sql.Identifier(rollup_table_name(table)),
+            source=source,
+            grain=sql.Literal(grain),
+            where=where,
+        )
+    )
+    return cur.rowcount
+
+
+def _trim_daily(cur, sql, table: str, lo: Optional[date], hi: date) -> int:
+    """Delete {table}_daily rows in [lo, hi), matching the history rows compact dropped."""
+    daily = daily_table_name(table)
+    cur.execute("SELECT to_regclass(%s)", (daily,))
+    if cur.fetchone()[0] is None:
+        return 0
+    where = sql.SQL("run_date < %s")
+    params: list = [hi]
+    if lo is not None:
+        where = sql.SQL("run_date >= %s AND ") + where
+        params.insert(0, lo)
+    cur.execute(sql.SQL("DELETE FROM {daily} WHERE {where}").format(daily=sql.Identifier(daily), where=where), params)
+    return cur.rowcount
+
+
+def list_partitions(cur, table: str) -> List[Tuple[str, date, date]]:
+    """(name, lower bound, upper bound) of each range partition of `table`, oldest first."""
+    cur.execute(
+        """
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        """,
+        (table,),
+    )
+    parts = []
+    for name, bound in cur.fetchall():
+        # FOR VALUES FROM ('2024-01-01') TO ('2024-02-01')
+        try:
+            lo, hi = (date.fromisoformat(v.strip("()' ")) for v in bound.split("FROM", 1)[1].split("TO"))
+        except (IndexError, ValueError):
+            continue  # DEFAULT or hand-made partitions are left alone
+        parts.append((name, lo, hi))
+    return sorted(parts, key=lambda p: p[1])
+
+
+def compact(pg_url: str, table: str, keep_days: int, grain: str, dry_run: bool = False) -> dict:
+    """
+    Roll up and drop history older than `keep_days`. On a partitioned table only
+    months that lie entirely before the cut-off go, one transaction per partition.
+    """
+    if grain not in GRAINS:
+        raise ValueError(f"grain must be one of {GRAINS}")
+    psycopg = ensure_psycopg()
+    sql = psycopg.sql
+    cutoff = date.today() - timedelta(days=keep_days)
+    summary = {
+        "cutoff": cutoff.isoformat(),
+        "grain": grain,
+        "partitions_dropped": [],
+        "rows_deleted": 0,
+        "daily_rows_deleted": 0,
+        "rollup_rows": 0,
+    }
+    with psycopg.connect(pg_url) as conn:
+        with conn.cursor() as cur:
+            # In normalized mode rows live in {table}_facts and `table` is a view over it.
+            store = history_table(cur, table)
+            normalized = store != table
+            if not is_partitioned(cur, store):
+                cur.execute("SELECT to_regclass(%s)", (table,))
+                if cur.fetchone()[0] is None:
+                    raise RuntimeError(f"Table {table} does not exist.")
+                _create_rollup_table(cur, sql, table)
+                with span("db_compact_rows", cat="db", table=store):
+                    summary["rollup_rows"] = _rollup_rows(cur, sql, sql.Identifier(table), table, grain, cutoff)
+                    cur.execute(
+                        sql.SQL("DELETE FROM {table_name} WHERE run_date < %s").format(table_name=sql.Identifier(store)),
+                        (cutoff,),
+                    )
+                    summary["rows_deleted"] = cur.rowcount
+                    if not normalized:
+                        summary["daily_rows_deleted"] = _trim_daily(cur, sql, table, None, cutoff)
+                if dry_run:
+                    conn.rollback()
+                else:
+                    conn.commit()
+                return summary
+
+            expired = [p for p in list_partitions(cur, store) if p[2] <= cutoff]
+            conn.commit()
+            for name, lo, hi in expired:
+                _create_rollup_table(cur, sql, table)
+                source = sql.Identifier(name)
+                if normalized:
+                    source = sql.SQL("({rows}) AS h").format(rows=_normalized_rows_sql(sql, table, name))
+                with span("db_compact_partition", cat="db", table=name):
+                    summary["rollup_rows"] += _rollup_rows(cur, sql, source, table, grain, None)
+                    cur.execute(
+                        sql.SQL("ALTER TABLE {table_name} DETACH PARTITION {part}").format(
+                            table_name=sql.Identifier(store), part=sql.Identifier(name)
+                        )
+                    )
+                    cur.execute(sql.SQL("DROP TABLE {part}").format(part=sql.Identifier(name)))
+                    if not normalized:
+                        summary["daily_rows_deleted"] += _trim_daily(cur, sql, table, lo, hi)
+                if dry_run:
+                    conn.rollback()
+                else:
+                    conn.commit()
+                summary["partitions_dropped"].append(name)
+    return summary
+
+
+def ensure_upcoming(pg_url: str, table: str, ahead: int) -> List[str]:
+    """Create the current month's partition and `ahead` more. Returns their names."""
+    psycopg = ensure_psycopg()
+    month = month_start(date.today())
+    months = [month]
+    for _ in range(ahead):
+        months.append(next_month(months[-1]))
+    with psycopg.connect(pg_url) as conn, _schema_transaction(conn):
+        with conn.cursor() as cur:
+            store = history_table(cur, table)
+            if not is_partitioned(cur, store):
+                raise RuntimeError(f"Table {store} is not partitioned; run `convert` first.")
+            _ensure_partitions(cur, psycopg.sql, store, months)
+    return [partition_name(store, m) for m in months]
+
+
+def convert(pg_url: str, table: str) -> str:
+    """
+    Replace an unpartitioned history table with a partitioned one holding the same
+    rows. The old table is kept as {table}_unpartitioned for the operator to drop.
+    Runs in one transaction; writers block on the table lock until it commits.
+    """
+    psycopg = ensure_psycopg()
+    sql = psycopg.sql
+    old = f"{table}_unpartitioned"
+    with psycopg.connect(pg_url) as conn, _schema_transaction(conn):
+        with conn.cursor() as cur:
+            if is_normalized(cur, table):
+                raise RuntimeError(
+                    f"{table} uses normalized storage; partition it with `python -m crawler.normalize migrate --partitioned`."
+                )
+            if is_partitioned(cur, table):
+                raise RuntimeError(f"Table {table} is already partitioned.")
+            cur.execute("SELECT to_regclass(%s), to_regclass(%s)", (table, old))
+            current, leftover = cur.fetchone()
+            if current is None:
+                raise RuntimeError(f"Table {table} does not exist.")
+            if leftover is not None:
+                raise RuntimeError(f"{old} already exists; drop it before converting again.")
+            cur.execute(sql.SQL("LOCK TABLE {} IN ACCESS EXCLUSIVE MODE").format(sql.Identifier(table)))
+            cur.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(sql.Identifier(table), sql.Identifier(old)))
+            # Free the index name so the new table gets its own.
+            cur.execute(
+                sql.SQL("ALTER INDEX IF EXISTS {} RENAME TO {}").format(
+                    sql.Identifier(f"{table}_query_level_date_idx"), sql.Identifier(f"{old}_query_level_date_idx")
+                )
+            )
+            _create_city_counts_table(cur, sql, table, partitioned=True)
+            cur.execute(sql.SQL("SELECT MIN(run_date), MAX(run_date) FROM {}").format(sql.Identifier(old)))
+            lo, hi = cur.fetchone()
+            if lo is not None:
+                months = [month_start(lo)]
+                while months[-1] < month_start(hi):
+                    months.append(next_month(months[-1]))
+                _ensure_partitions(cur, sql, table, months)
+            with span("db_convert_partitioned", cat="db", table=table):
+                cur.execute(
+                    sql.SQL(
+                        """
+                        INSERT INTO {new} (
+                            id, city, state_code, state_name, lat, lon, population, radius_miles,
+                            query, job_title_query, role, seniority_level, total, error, run_at, run_date
+                        )
+                        SELECT id, city, state_code, state_name, lat, lon, population, radius_miles,
+                            query, job_title_query, role, seniority_level, total, error, run_at, run_date
+                        FROM {old}
+                        """
+                    ).format(new=sql.Identifier(table), old=sql.Identifier(old))
+                )
+                moved = cur.rowcount
+                cur.execute(
+                    sql.SQL("SELECT setval(pg_get_serial_sequence(%s, 'id'), GREATEST(MAX(id), 1)) FROM {}").format(
+                        sql.Identifier(table)
+                    ),
+                    (table,),
+                )
+    return f"Moved {moved} rows into partitioned {table}; the old table is kept as {old}."
+
+
+def main() -> None:
+    load_env_file()
+    ap = argparse.ArgumentParser(description="Partition maintenance and retention for city_counts.")
+    ap.add_argument("command", choices=["convert", "ensure", "compact"])
+    ap.add_argument("--pg-url", default=None, help="Postgres connection URL (required).")
+    ap.add_argument("--pg-table", default="city_counts")
+    ap.add_argument("--ahead", type=int, default=2, help="ensure: months to create past the current one.")
+    ap.add_argument(
+        "--keep-days",
+        type=int,
+        default=env_int("JOBS_RETENTION_KEEP_DAYS", 90),
+        help="compact: keep daily rows this many days (planner lookback is 60).",
+    )
+    ap.add_argument("--grain", choices=GRAINS, default="week", help="compact: rollup period.")
+    ap.add_argument("--dry-run", action="store_true", help="compact: report without committing.")
+    args = ap.parse_args()
+    if not args.pg_url:
+        print("--pg-url is required.")
+        sys.exit(1)
+
+    try:
+        if args.command == "convert":
+            print(convert(args.pg_url, args.pg_table))
+        elif args.command == "ensure":
+            print("Partitions ready: " + ", ".join(ensure_upcoming(args.pg_url, args.pg_table, args.ahead)))
+        else:
+            summary = compact(args.pg_url, args.pg_table, args.keep_days, args.grain, dry_run=args.dry_run)
+            prefix = "[dry run] " if args.dry_run else ""
+            print(
+                f"{prefix}Compacted history before {summary['cutoff']} into {summary['rollup_rows']} "
+                f"{summary['grain']}ly rollup rows; dropped {len(summary['partitions_dropped'])} partitions"
+                f" and deleted {summary['rows_deleted']} rows ({summary['daily_rows_deleted']} from {args.pg_table}_daily)."
+            )
+    except RuntimeError as exc:
+        print(f"Partition maintenance failed: {exc}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
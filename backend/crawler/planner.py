@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .cities import City
+from .sweep import SweepCell
+
+# (city, state_code, query, seniority_level) -> (last_run_at, samples, mean_total, stddev_total),
+# as returned by db.load_refresh_history.
+History = Dict[Tuple[str, str, Optional[str], Optional[str]], Tuple[datetime, int, float, Optional[float]]]
+
+
+@dataclass(frozen=True)
+class RefreshTier:
+    """Cities with population >= min_population are refreshed every ttl_hours."""
+
+    name: str
+    min_population: int
+    ttl_hours: float
+
+
+# Big metros daily, mid-size every few days, everything else weekly.
+DEFAULT_TIERS: Tuple[RefreshTier, ...] = (
+    RefreshTier("metro", 1_000_000, 24),
+    RefreshTier("large", 250_000, 72),
+    RefreshTier("small", 0, 168),
+)
+
+
+def parse_tiers(spec: str) -> Tuple[RefreshTier, ...]:
+    """
+    "1000000:24,250000:72,0:168" -> tiers (min_population:ttl_hours), largest first.
+    """
+    tiers = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            pop, ttl = part.split(":")
+            tiers.append(RefreshTier(f">={int(pop)}", int(pop), float(ttl)))
+        except ValueError:
+            raise ValueError(f"Invalid refresh tier '{part}' (expected min_population:ttl_hours)") from None
+    if not tiers:
+        raise ValueError("No refresh tiers given")
+    tiers.sort(key=lambda t: t.min_population, reverse=True)
+    if tiers[-1].min_population > 0:
+        tiers.append(RefreshTier("rest", 0, tiers[-1].ttl_hours))
+    return tuple(tiers)
+
+
+def tier_for(city: City, tiers: Sequence[RefreshTier]) -> RefreshTier:
+    population = city.population or 0
+    for tier in tiers:
+        if population >= tier.min_population:
+            return tier
+    return tiers[-1]
+
+
+@dataclass
+class RefreshPlan:
+    tasks: List[Tuple[SweepCell, City]] = field(default_factory=list)
+    considered: int = 0
+    never_fetched: int = 0
+    fresh: int = 0
+    over_budget: int = 0
+    due_by_tier: Dict[str, int] = field(default_factory=dict)
+
+    def summary(self) -> str:
+        tiers = ", ".join(f"{name}={n}" for name, n in self.due_by_tier.items()) or "none"
+        return (
+            f"{len(self.tasks)}/{self.considered} due ({self.never_fetched} never fetched, "
+            f"{self.fresh} fresh, {self.over_budget} over budget); by tier: {tiers}"
+        )
+
+
+def plan_refresh(
+    tasks: Sequence[Tuple[SweepCell, City]],
+    history: History,
+    tiers: Sequence[RefreshTier] = DEFAULT_TIERS,
+    now: Optional[datetime] = None,
+    volatile_cv: float = 0.15,
+    stable_cv: float = 0.03,
+    min_samples: int = 3,
+    budget: Optional[int] = None,
+) -> RefreshPlan:
+    """
+    Keep only the tasks whose last successful fetch is older than their tier's TTL.
+    Counts that swing (coefficient of variation >= volatile_cv) get half the TTL; counts
+    that have barely moved over min_samples runs get double. Due tasks come back
+    never-fetched first, then most overdue (age / ttl), then largest city, capped at
+    `budget` requests when given.
+    """
+    now = now or datetime.now(timezone.utc)
+    plan = RefreshPlan(considered=len(tasks))
+    due: List[Tuple[Tuple[int, float, int], SweepCell, City, str]] = []
+
+    for cell, city in tasks:
+        tier = tier_for(city, tiers)
+        entry = history.get((city.name, city.state_code, cell.query, cell.seniority))
+        if entry is None:
+            plan.never_fetched += 1
+            due.append(((0, 0.0, -(city.population or 0)), cell, city, tier.name))
+            continue
+
+        last_run_at, samples, mean, stddev = entry
+        ttl_h = tier.ttl_hours
+        if samples >= 2 and mean and stddev is not None:
+            cv = stddev / mean
+            if cv >= volatile_cv:
+                ttl_h /= 2
+            elif samples >= min_samples and cv <= stable_cv:
+                ttl_h *= 2
+        age_h = (now - last_run_at).total_seconds() / 3600
+        overdue = age_h / ttl_h if ttl_h > 0 else float("inf")
+        if overdue < 1:
+            plan.fresh += 1
+            continue
+        due.append(((1, -overdue, -(city.population or 0)), cell, city, tier.name))
+
+    due.sort(key=lambda item: item[0])
+    if budget is not None and len(due) > budget:
+        plan.over_budget = len(due) - budget
+        due = due[:budget]
+    for _, cell, city, tier_name in due:
+        plan.tasks.append((cell, city))
+        plan.due_by_tier[tier_name] = plan.due_by_tier.get(tier_name, 0) + 1
+    return plan
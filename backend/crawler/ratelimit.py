@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional, Tuple
+
+
+class AdaptiveRateLimiter:
+    """
+    Thread-safe token bucket (requests/sec + burst) shared by every worker in a process.
+
+    The fill rate adapts AIMD style: it is cut by `decrease_factor` on 429/5xx or
+    transport errors (at most once per `decrease_cooldown_s`), and grows back by
+    roughly `increase_step` req/s per second of healthy responses, capped at `max_rate`.
+    A `Retry-After` pauses every caller until it has elapsed.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        max_rate: Optional[float] = None,
+        min_rate: Optional[float] = None,
+        decrease_factor: float = 0.5,
+        increase_step: float = 0.05,
+        decrease_cooldown_s: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.max_rate = max(rate, max_rate or rate)
+        self.min_rate = min(rate, min_rate or rate / 16.0)
+        self.burst = max(1, int(burst))
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        self.decrease_cooldown_s = decrease_cooldown_s
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._rate = float(rate)
+        self._tokens = float(self.burst)
+        self._last_refill = clock()
+        self._blocked_until = 0.0
+        self._last_decrease = float("-inf")
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self._tokens = min(float(self.burst), self._tokens + elapsed * self._rate)
+            self._last_refill = now
+
+    def reserve(self) -> float:
+        """
+        Take one token and return how long the caller must wait before sending.
+        Tokens may go negative so concurrent callers queue up behind each other.
+        """
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self._tokens -= 1.0
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0.0
+            return max(wait, self._blocked_until - now)
+
+    def acquire(self) -> float:
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self) -> float:
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def on_response(self, status: Optional[int], retry_after_s: Optional[float] = None) -> None:
+        """
+        Feed back an upstream outcome. status=None means the request never got a response.
+        """
+        throttled = status is None or status == 429 or status >= 500
+        with self._lock:
+            now = self._clock()
+            if retry_after_s and retry_after_s > 0:
+                self._blocked_until = max(self._blocked_until, now + retry_after_s)
+            if throttled or retry_after_s:
+                if now - self._last_decrease >= self.decrease_cooldown_s:
+                    self._refill(now)
+                    self._rate = max(self.min_rate, self._rate * self.decrease_factor)
+                    self._last_decrease = now
+            elif status < 400 and self._rate < self.max_rate:
+                self._refill(now)
+                self._rate = min(self.max_rate, self._rate + self.increase_step / self._rate)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header (delta-seconds or HTTP-date) into seconds.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+_SHARED: Dict[str, AdaptiveRateLimiter] = {}
+# Settings each shared limiter was created with, to spot callers asking for different ones.
+_SHARED_SETTINGS: Dict[str, Tuple[float, int, Optional[float]]] = {}
+_SHARED_LOCK = threading.Lock()
+
+
+def shared_rate_limiter(key: str, rate: float, burst: int = 1, max_rate: Optional[float] = None) -> AdaptiveRateLimiter:
+    """
+    Return the process-wide limiter for `key` (usually the upstream base URL),
+    creating it on first use. Later callers share the first caller's settings; asking
+    for different ones prints a warning rather than silently ignoring them.
+    """
+    with _SHARED_LOCK:
+        limiter = _SHARED.get(key)
+        if limiter is None:
+            limiter = AdaptiveRateLimiter(rate=rate, burst=burst, max_rate=max_rate)
+            _SHARED[key] = limiter
+            _SHARED_SETTINGS[key] = (rate, burst, max_rate)
+        elif _SHARED_SETTINGS[key] != (rate, burst, max_rate):
+            first_rate, first_burst, first_max = _SHARED_SETTINGS[key]
+            print(
+                f"Warning: rate limiter for {key} already exists with rate={first_rate} burst={first_burst} "
+                f"max_rate={first_max}; ignoring rate={rate} burst={burst} max_rate={max_rate}"
+            )
+        return limiter
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Tuple
+
+import requests
+
+from .client import HiringCafeHTTPError
+
+# 408/425/429 are "try again later"; 5xx are upstream faults. Other 4xx mean the
+# request itself is wrong and will fail the same way every time.
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of sending a request while the sweep's circuit breaker is open."""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, HiringCafeHTTPError):
+        return exc.status in RETRYABLE_STATUSES
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout, TimeoutError, ConnectionError)):
+        return True
+    try:
+        import aiohttp
+    except ImportError:
+        return False
+    return isinstance(exc, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError))
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter: attempt n sleeps uniform(0, min(max, base * 2**(n-1))),
+    but never less than an upstream Retry-After.
+    """
+
+    max_attempts: int = 4
+    base_delay_s: float = 1.0
+    max_delay_s: float = 30.0
+
+    def delay_for(self, attempt: int, exc: BaseException) -> float:
+        cap = min(self.max_delay_s, self.base_delay_s * (2 ** max(0, attempt - 1)))
+        delay = random.uniform(0, cap)
+        retry_after_s = getattr(exc, "retry_after_s", None)
+        if retry_after_s:
+            delay = max(delay, min(retry_after_s, self.max_delay_s))
+        return delay
+
+
+NO_RETRY = RetryPolicy(max_attempts=1)
+
+
+class CircuitBreaker:
+    """
+    Sweep-level breaker over a sliding window of request outcomes.
+
+    Once at least `min_requests` outcomes are recorded and the failure ratio reaches
+    `error_threshold`, the breaker opens. In "pause" mode callers block for
+    `cooldown_s` and then a single probe request decides whether to close it again;
+    in "abort" mode callers get CircuitOpenError immediately for the rest of the sweep.
+    """
+
+    def __init__(
+        self,
+        error_threshold: float = 0.5,
+        min_requests: int = 20,
+        window: int = 50,
+        cooldown_s: float = 60.0,
+        mode: str = "pause",
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if mode not in {"pause", "abort"}:
+            raise ValueError("mode must be 'pause' or 'abort'")
+        self.error_threshold = error_threshold
+        self.min_requests = max(1, min_requests)
+        self.cooldown_s = cooldown_s
+        self.mode = mode
+        self.trips = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._outcomes: Deque[bool] = deque(maxlen=max(window, self.min_requests))
+        self._state = "closed"
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def _check(self) -> Tuple[float, bool]:
+        """
+        Return (0, is_probe) when a request may proceed, otherwise (seconds to wait
+        before asking again, False).
+        """
+        with self._lock:
+            if self._state == "closed":
+                return 0.0, False
+            if self.mode == "abort":
+                raise CircuitOpenError(f"circuit breaker open after {self.trips} trip(s); sweep aborted")
+            now = self._clock()
+            if self._state == "open":
+                remaining = self._opened_at + self.cooldown_s - now
+                if remaining > 0:
+                    return remaining, False
+                self._state = "half_open"
+            if not self._probe_in_flight:
+                self._probe_in_flight = True
+                return 0.0, True
+            return min(1.0, self.cooldown_s), False
+
+    def before_request(self) -> bool:
+        """Block until a request may proceed; True means it is the half-open probe."""
+        while True:
+            wait, probe = self._check()
+            if wait <= 0:
+                return probe
+            time.sleep(wait)
+
+    async def before_request_async(self) -> bool:
+        while True:
+            wait, probe = self._check()
+            if wait <= 0:
+                return probe
+            await asyncio.sleep(wait)
+
+    def record(self, success: bool, probe: bool = False) -> None:
+        """
+        Record one upstream outcome. While half-open only the probe's outcome counts;
+        requests that started before the trip and finish late are ignored.
+        """
+        with self._lock:
+            if self._state == "half_open":
+                if not probe:
+                    return
+                self._probe_in_flight = False
+                if success:
+                    self._state = "closed"
+                    self._outcomes.clear()
+                else:
+                    self._trip()
+                return
+            if self._state != "closed":
+                return
+            self._outcomes.append(success)
+            if len(self._outcomes) >= self.min_requests:
+                failures = self._outcomes.count(False)
+                if failures / len(self._outcomes) >= self.error_threshold:
+                    self._trip()
+
+    def record_error(self, exc: BaseException, probe: bool = False) -> None:
+        """
+        Record a failed call. Only upstream errors count (a non-retryable status still
+        means upstream answered); anything else, such as a malformed body, says nothing
+        about upstream health and just hands the probe slot to the next request. So does
+        an error shared by a single-flight follower, which the leader already recorded.
+        """
+        upstream = isinstance(exc, HiringCafeHTTPError) or is_retryable(exc)
+        if upstream and not getattr(exc, "coalesced", False):
+            self.record(not is_retryable(exc), probe)
+        elif probe:
+            with self._lock:
+                self._probe_in_flight = False
+
+    def _trip(self) -> None:
+        self._state = "open"
+        self._opened_at = self._clock()
+        self.trips += 1
+        self._outcomes.clear()
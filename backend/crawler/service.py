@@ -1,21 +1,90 @@
 from __future__ import annotations
 
-from typing import Callable, Dict, List, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 
-from .client import HiringCafeClient
+from .client import HiringCafeClient, extract_total
 from .cities import City
+from .metrics import CITY_RESULTS, RETRIES
+from .retry import CircuitBreaker, CircuitOpenError, RetryPolicy, is_retryable
 from .types import CityCountResult, CountResult, JSON
+from .state_template import SearchStateTemplate
+from .tracing import span
 from .search_state import default_search_state, search_state_for_city, with_query
 
+DEFAULT_RETRY_POLICY = RetryPolicy()
 
-def extract_total(count_response: JSON) -> int:
-    if isinstance(count_response, dict):
-        if "total" in count_response and isinstance(count_response["total"], int):
-            return count_response["total"]
-        if "count" in count_response and isinstance(count_response["count"], int):
-            return count_response["count"]
-    raise ValueError(f"Unexpected count response shape: {count_response}")
+
+def fetch_total_with_retry(
+    client: HiringCafeClient,
+    search_state: JSON,
+    retry_policy: Optional[RetryPolicy] = None,
+    breaker: Optional[CircuitBreaker] = None,
+) -> Tuple[JSON, int, int]:
+    """
+    POST a count request, retrying transient failures per `retry_policy`.
+    Returns (raw, total, attempts). The last error is re-raised with `.attempts` set.
+    """
+    policy = retry_policy or DEFAULT_RETRY_POLICY
+    attempt = 0
+    while True:
+        attempt += 1
+        probe = False
+        try:
+            if breaker:
+                probe = breaker.before_request()
+            raw = client.get_total_count(search_state)
+            total = extract_total(raw)
+        except CircuitOpenError as exc:
+            exc.attempts = attempt - 1
+            raise
+        except Exception as exc:
+            retryable = is_retryable(exc)
+            if breaker:
+                breaker.record_error(exc, probe)
+            if not retryable or attempt >= policy.max_attempts:
+                exc.attempts = attempt
+                raise
+            RETRIES.inc()
+            with span("retry_backoff", cat="retry", attempt=attempt):
+                time.sleep(policy.delay_for(attempt, exc))
+            continue
+        if breaker:
+            breaker.record(True, probe)
+        return raw, total, attempt
+
+
+class ResultTally:
+    """Running ok/failed/retry counts, so streamed results need not be kept around."""
+
+    def __init__(self) -> None:
+        self.cities = 0
+        self.failed = 0
+        self.retries = 0
+
+    def add(self, result: CityCountResult) -> None:
+        self.cities += 1
+        if result.error:
+            self.failed += 1
+        self.retries += max(0, result.attempts - 1)
+
+    def as_dict(self, breaker: Optional[CircuitBreaker] = None) -> Dict[str, int]:
+        return {
+            "cities": self.cities,
+            "ok": self.cities - self.failed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "breaker_trips": breaker.trips if breaker else 0,
+        }
+
+
+def summarize_results(results: Iterable[CityCountResult], breaker: Optional[CircuitBreaker] = None) -> Dict[str, int]:
+    tally = ResultTally()
+    for r in results:
+        tally.add(r)
+    return tally.as_dict(breaker)
 
 
 def get_count_for_query(
@@ -25,8 +94,7 @@ def get_count_for_query(
 ) -> CountResult:
     st = with_query(base_search_state or default_search_state(), query)
     try:
-        raw = client.get_total_count(st)
-        total = extract_total(raw)
+        raw, total, _ = fetch_total_with_retry(client, st)
         return CountResult(query=query, total=total, raw=raw)
     except Exception as e:
         return CountResult(query=query, total=0, raw=None, error=str(e))
@@ -51,48 +119,65 @@ def get_count_for_city(
     base_search_state: Optional[JSON] = None,
     query: Optional[str] = None,
     seniority_levels: Optional[List[str]] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    breaker: Optional[CircuitBreaker] = None,
+    template: Optional[SearchStateTemplate] = None,
 ) -> CityCountResult:
-    st = search_state_for_city(
-        city,
-        base_search_state or default_search_state(),
-        radius_miles,
-        query=query,
-        seniority_levels=seniority_levels,
-    )
+    """
+    Count one city. Pass a SearchStateTemplate compiled for the same base/query/seniority
+    to skip the per-call deepcopy and re-encode; otherwise the state is built here.
+    Failures come back as a result with `error` set, except CircuitOpenError from a
+    breaker in abort mode, which is raised.
+    """
+    if template is not None:
+        with span("prepare_search_state", cat="cpu"):
+            st = template.prepare(city, radius_miles)
+    else:
+        with span("search_state_for_city", cat="cpu"):
+            st = search_state_for_city(
+                city,
+                base_search_state or default_search_state(),
+                radius_miles,
+                query=query,
+                seniority_levels=seniority_levels,
+            )
     try:
-        raw = client.get_total_count(st)
-        total = extract_total(raw)
-        return CityCountResult(city=city, total=total, raw=raw, radius_miles=radius_miles)
+        raw, total, attempts = fetch_total_with_retry(client, st, retry_policy, breaker)
+        CITY_RESULTS.inc(outcome="ok")
+        return CityCountResult(city=city, total=total, raw=raw, radius_miles=radius_miles, attempts=attempts)
+    except CircuitOpenError:
+        # An aborting breaker stops the run; it is not one more failed city.
+        raise
     except Exception as e:
-        return CityCountResult(city=city, total=0, raw=None, error=str(e), radius_miles=radius_miles)
+        CITY_RESULTS.inc(outcome="failed")
+        return CityCountResult(
+            city=city,
+            total=None,
+            raw=None,
+            error=str(e),
+            radius_miles=radius_miles,
+            attempts=getattr(e, "attempts", 1),
+        )
 
 
-def get_counts_for_cities(
+def iter_counts_for_cities(
     client: HiringCafeClient,
-    cities: List[City],
+    cities: Iterable[City],
     radius_miles: float = 25,
     radius_selector: Optional[Callable[[City], float]] = None,
     concurrency: int = 1,
     base_search_state: Optional[JSON] = None,
     query: Optional[str] = None,
     seniority_levels: Optional[List[str]] = None,
-) -> List[CityCountResult]:
+    retry_policy: Optional[RetryPolicy] = None,
+    breaker: Optional[CircuitBreaker] = None,
+) -> Iterator[CityCountResult]:
+    """
+    Yield one CityCountResult per city in completion order. Only a small window of
+    cities is submitted ahead of the workers, so memory stays flat for any city count.
+    """
     base = base_search_state or default_search_state()
-    results: List[CityCountResult] = []
-    if concurrency <= 1:
-        for city in cities:
-            radius = radius_selector(city) if radius_selector else radius_miles
-            results.append(
-                get_count_for_city(
-                    client,
-                    city,
-                    radius,
-                    base,
-                    query=query,
-                    seniority_levels=seniority_levels,
-                )
-            )
-        return results
+    template = SearchStateTemplate(base, query=query, seniority_levels=seniority_levels)
 
     def task(city: City) -> CityCountResult:
         radius = radius_selector(city) if radius_selector else radius_miles
@@ -103,15 +188,68 @@ def get_counts_for_cities(
             base,
             query=query,
             seniority_levels=seniority_levels,
+            retry_policy=retry_policy,
+            breaker=breaker,
+            template=template,
         )
 
+    if concurrency <= 1:
+        for city in cities:
+            yield task(city)
+        return
+
+    city_iter = iter(cities)
+    window = concurrency * 4
     with ThreadPoolExecutor(max_workers=concurrency) as executor:
-        future_map = {executor.submit(task, city): city for city in cities}
-        for fut in as_completed(future_map):
-            try:
-                results.append(fut.result())
-            except Exception as exc:
-                city = future_map[fut]
-                results.append(CityCountResult(city=city, total=0, raw=None, error=str(exc), radius_miles=radius_miles))
+        future_map: Dict[Future, City] = {}
 
-    return results
+        def top_up() -> None:
+            for city in islice(city_iter, window - len(future_map)):
+                future_map[executor.submit(task, city)] = city
+
+        top_up()
+        while future_map:
+            done, _ = wait(future_map, return_when=FIRST_COMPLETED)
+            aborted = None
+            for fut in done:
+                city = future_map.pop(fut)
+                try:
+                    yield fut.result()
+                except CircuitOpenError as exc:
+                    aborted = exc
+                except Exception as exc:
+                    yield CityCountResult(city=city, total=None, raw=None, error=str(exc), radius_miles=radius_miles)
+            if aborted:
+                # Results already finished were yielded above; queued cities never start.
+                for fut in future_map:
+                    fut.cancel()
+                raise aborted
+            top_up()
+
+
+def get_counts_for_cities(
+    client: HiringCafeClient,
+    cities: List[City],
+    radius_miles: float = 25,
+    radius_selector: Optional[Callable[[City], float]] = None,
+    concurrency: int = 1,
+    base_search_state: Optional[JSON] = None,
+    query: Optional[str] = None,
+    seniority_levels: Optional[List[str]] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    breaker: Optional[CircuitBreaker] = None,
+) -> List[CityCountResult]:
+    return list(
+        iter_counts_for_cities(
+            client,
+            cities,
+            radius_miles=radius_miles,
+            radius_selector=radius_selector,
+            concurrency=concurrency,
+            base_search_state=base_search_state,
+            query=query,
+            seniority_levels=seniority_levels,
+            retry_policy=retry_policy,
+            breaker=breaker,
+        )
+    )
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import asyncio
+import copy
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from .metrics import SINGLEFLIGHT_DEDUPED
+
+
+def _follower_error(exc: BaseException) -> BaseException:
+    """
+    A per-follower copy of the leader's exception, marked `coalesced`, so callers can
+    annotate it (e.g. `.attempts`) without touching the leader's object and can tell
+    that it reports the same upstream failure rather than a new one.
+    """
+    try:
+        err = copy.copy(exc)
+    except Exception:
+        err = RuntimeError(f"coalesced call failed: {exc!r}")
+    err.coalesced = True
+    err.__cause__ = exc
+    return err
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls that share a key into one execution (thread-based).
+    The first caller runs `fn`; callers arriving while it is in flight wait and get
+    the same result, or a copy of its exception (see _follower_error). `dedupe_hits`
+    counts the calls that were saved.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.dedupe_hits = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.dedupe_hits += 1
+                SINGLEFLIGHT_DEDUPED.inc()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise _follower_error(call.error)
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        return call.result
+
+
+class AsyncSingleFlight:
+    """
+    asyncio counterpart of SingleFlight; must be used from a single event loop. If the
+    leader is cancelled, its followers are not: one of them takes over and runs `fn`.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.dedupe_hits = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        counted = False
+        while (fut := self._calls.get(key)) is not None:
+            if not counted:
+                counted = True
+                self.dedupe_hits += 1
+                SINGLEFLIGHT_DEDUPED.inc()
+            try:
+                return await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                # Only the leader was cancelled: look again, and lead if nobody else does.
+                if not fut.cancelled() or asyncio.current_task().cancelling():
+                    raise
+            except Exception as exc:
+                raise _follower_error(exc) from exc
+
+        fut = asyncio.get_running_loop().create_future()
+        self._calls[key] = fut
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except BaseException as exc:
+            fut.set_exception(exc)
+            # Mark retrieved so an unobserved failure does not log "exception was never retrieved".
+            fut.exception()
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            self._calls.pop(key, None)
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import csv
+import json
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .types import CityCountResult
+
+RECORD_FIELDS = [
+    "city",
+    "state",
+    "state_name",
+    "lat",
+    "lon",
+    "population",
+    "radius_miles",
+    "query",
+    "role",
+    "seniority_level",
+    "total",
+    "error",
+]
+
+
+def result_record(
+    r: CityCountResult,
+    query: Optional[str],
+    radius_miles: float,
+    role: Optional[str],
+    seniority_level: Optional[str],
+) -> Dict[str, Any]:
+    return {
+        "city": r.city.name,
+        "state": r.city.state_code,
+        "state_name": r.city.state_name,
+        "lat": r.city.latitude,
+        "lon": r.city.longitude,
+        "population": r.city.population,
+        "radius_miles": r.radius_miles or radius_miles,
+        "query": query or "",
+        "role": role,
+        "seniority_level": seniority_level,
+        "total": r.total,
+        "error": r.error,
+    }
+
+
+class ResultSink(ABC):
+    """
+    Consumes CityCountResults one at a time (same `add` signature as db.CityResultsWriter),
+    so a sweep can stream to disk or Postgres without holding results in memory.
+    """
+
+    def __init__(self, radius_miles: float = 25) -> None:
+        self.radius_miles = radius_miles
+        self.written = 0
+
+    def __enter__(self) -> "ResultSink":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def add(
+        self,
+        result: CityCountResult,
+        query: Optional[str],
+        role: Optional[str] = None,
+        seniority_level: Optional[str] = None,
+    ) -> None:
+        self._write(result_record(result, query, self.radius_miles, role, seniority_level))
+        self.written += 1
+
+    @abstractmethod
+    def _write(self, record: Dict[str, Any]) -> None:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class NdjsonSink(ResultSink):
+    """One JSON object per line, flushed per line so `tail -f` sees results as they land."""
+
+    def __init__(self, path: Path, radius_miles: float = 25) -> None:
+        super().__init__(radius_miles)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = path.open("w", buffering=1)
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        self._fh.write(json.dumps(record) + "\n")
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+class JsonArraySink(ResultSink):
+    """Streams a JSON array element by element; the file is valid JSON once closed."""
+
+    def __init__(self, path: Path, radius_miles: float = 25) -> None:
+        super().__init__(radius_miles)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = path.open("w")
+        self._fh.write("[")
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        prefix = ",\n  " if self.written else "\n  "
+        self._fh.write(prefix + json.dumps(record))
+
+    def close(self) -> None:
+        if self._fh.closed:
+            return
+        self._fh.write("\n]\n" if self.written else "]\n")
+        self._fh.close()
+
+
+class CsvSink(ResultSink):
+    def __init__(self, path: Path, radius_miles: float = 25) -> None:
+        super().__init__(radius_miles)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = path.open("w", newline="", buffering=1)
+        self._writer = csv.DictWriter(self._fh, fieldnames=RECORD_FIELDS)
+        self._writer.writeheader()
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        record["error"] = record["error"] or ""
+        self._writer.writerow(record)
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+FILE_SINKS = {
+    "json": JsonArraySink,
+    "ndjson": NdjsonSink,
+    "csv": CsvSink,
+}
+
+
+def open_file_sink(path: Path, fmt: str, radius_miles: float = 25) -> ResultSink:
+    try:
+        sink_cls = FILE_SINKS[fmt]
+    except KeyError:
+        raise ValueError(f"Unknown output format '{fmt}'") from None
+    return sink_cls(path, radius_miles)
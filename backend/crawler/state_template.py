@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import hashlib
+from copy import deepcopy
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from .cache import VOLATILE_LOCATION_FIELDS
+from .cities import City
+from .fastjson import dumps_canonical
+from .search_state import default_search_state, location_from_city
+from .types import JSON
+
+_PLACEHOLDER = "__search_state_locations__"
+
+
+@dataclass(frozen=True)
+class PreparedCount:
+    """
+    A count request ready to send: `body` is the encoded {"searchState": ...} payload
+    and `key` its canonical_search_state_key, both built without a dict round-trip.
+    """
+
+    key: str
+    body: bytes
+
+
+@lru_cache(maxsize=65536)
+def location_fragments(city: City, radius_miles: float) -> Tuple[bytes, bytes]:
+    """
+    Encoded [location] list for a city/radius: (wire form, canonical form without
+    the volatile label fields). Shared by every query/seniority template.
+    """
+    loc = location_from_city(city, radius_miles)
+    canonical = {k: v for k, v in loc.items() if k not in VOLATILE_LOCATION_FIELDS}
+    return dumps_canonical([loc]), dumps_canonical([canonical])
+
+
+class SearchStateTemplate:
+    """
+    One query/seniority column compiled once: the base state is encoded with a
+    placeholder for `locations`, and each request splices in the cached per-city
+    fragment. Produces byte-for-byte the payload and cache key that
+    search_state_for_city + canonical_search_state_key would.
+    """
+
+    def __init__(
+        self,
+        base: Optional[JSON] = None,
+        query: Optional[str] = None,
+        seniority_levels: Optional[List[str]] = None,
+    ) -> None:
+        st = deepcopy(base or default_search_state())
+        if query is not None:
+            st["searchQuery"] = query
+        if seniority_levels:
+            st["seniorityLevel"] = list(seniority_levels)
+        st["locations"] = _PLACEHOLDER
+        self.base = st
+        encoded = dumps_canonical(st)
+        marker = dumps_canonical(_PLACEHOLDER)
+        if encoded.count(marker) != 1:
+            raise ValueError("search state template placeholder collided with base state content")
+        prefix, suffix = encoded.split(marker)
+        self._state_prefix = prefix
+        self._state_suffix = suffix
+        self._body_prefix = b'{"searchState":' + prefix
+        self._body_suffix = suffix + b"}"
+
+    def prepare(self, city: City, radius_miles: float) -> PreparedCount:
+        wire, canonical = location_fragments(city, radius_miles)
+        key = hashlib.sha256(self._state_prefix + canonical + self._state_suffix).hexdigest()
+        return PreparedCount(key=key, body=self._body_prefix + wire + self._body_suffix)
+
+    def search_state(self, city: City, radius_miles: float) -> JSON:
+        """Equivalent dict form (for debugging and non-template callers)."""
+        st = dict(self.base)
+        st["locations"] = [location_from_city(city, radius_miles)]
+        return st
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import json
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from .cities import City
+from .client import HiringCafeClient
+from .config import ROLE_QUERIES, SENIORITY_LEVELS
+from .retry import CircuitBreaker, CircuitOpenError, RetryPolicy
+from .search_state import default_search_state
+from .service import ResultTally, get_count_for_city
+from .state_template import SearchStateTemplate
+from .types import CityCountResult, JSON
+
+
+@dataclass(frozen=True)
+class SweepCell:
+    """
+    One (query, seniority) column of the sweep matrix. `role` and `seniority` are the
+    labels written to city_counts; `seniority_levels` is what goes into the searchState.
+    """
+
+    query: Optional[str]
+    role: Optional[str]
+    seniority: Optional[str]
+    seniority_levels: Tuple[str, ...] = ()
+
+    @property
+    def label(self) -> str:
+        return f"{self.query or 'all jobs'} (seniority={self.seniority or 'any'})"
+
+
+@dataclass
+class SweepSpec:
+    """
+    Matrix of role queries x seniority sets plus the city filters they run over.
+    Roles may be keys of ROLE_QUERIES ("software") or literal queries ("Rust Engineer").
+    """
+
+    roles: List[str] = field(default_factory=lambda: list(ROLE_QUERIES))
+    seniorities: List[str] = field(default_factory=lambda: ["entry", "mid", "senior", "all"])
+    min_population: int = 50000
+    city_limit: Optional[int] = None
+    states: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_json(cls, path: Path) -> "SweepSpec":
+        data = json.loads(path.read_text())
+        if not isinstance(data, dict):
+            raise ValueError("sweep spec must be a JSON object")
+        return cls.from_dict(data)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SweepSpec":
+        return cls(
+            roles=list(data.get("roles") or ROLE_QUERIES),
+            seniorities=list(data.get("seniorities") or ["entry", "mid", "senior", "all"]),
+            min_population=int(data.get("min_population", 50000)),
+            city_limit=data.get("city_limit") or None,
+            states=[s.upper() for s in data.get("states") or []],
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "roles": list(self.roles),
+            "seniorities": list(self.seniorities),
+            "min_population": self.min_population,
+            "city_limit": self.city_limit,
+            "states": list(self.states),
+        }
+
+    def cells(self) -> List[SweepCell]:
+        cells: List[SweepCell] = []
+        for role in self.roles:
+            query = ROLE_QUERIES.get(role, role)
+            for level in self.seniorities:
+                if level not in SENIORITY_LEVELS:
+                    raise ValueError(f"Unknown seniority level '{level}'")
+                cells.append(
+                    SweepCell(
+                        query=query,
+                        role=query,
+                        seniority=level,
+                        seniority_levels=tuple(SENIORITY_LEVELS[level]),
+                    )
+                )
+        return cells
+
+    def filter_cities(self, cities: Sequence[City]) -> List[City]:
+        """Keep cities in `states`, then the first `city_limit` of those (input is largest first)."""
+        if self.states:
+            wanted = set(self.states)
+            cities = [c for c in cities if c.state_code in wanted]
+        return list(cities[: self.city_limit] if self.city_limit else cities)
+
+
+def sweep_tasks(cells: Iterable[SweepCell], cities: Sequence[City]) -> List[Tuple[SweepCell, City]]:
+    """Cell-major task order, so one cell finishes (and can be saved) before the next is far along."""
+    return [(cell, city) for cell in cells for city in cities]
+
+
+def iter_sweep(
+    client: HiringCafeClient,
+    tasks: Iterable[Tuple[SweepCell, City]],
+    radius_for: Callable[[City], float],
+    concurrency: int = 4,
+    base_search_state: Optional[JSON] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    breaker: Optional[CircuitBreaker] = None,
+) -> Iterator[Tuple[SweepCell, CityCountResult]]:
+    """
+    Run every (cell, city) task through one thread pool and yield results in completion order.
+    Only a small window of tasks is queued ahead of the workers, so the tail of one cell
+    overlaps the start of the next instead of draining the pool between cells. A breaker
+    in abort mode ends the sweep with CircuitOpenError once the finished results are out.
+    """
+    base = base_search_state or default_search_state()
+    task_iter = iter(tasks)
+    window = max(1, concurrency) * 4
+    templates: Dict[SweepCell, SearchStateTemplate] = {}
+
+    def run(cell: SweepCell, city: City) -> CityCountResult:
+        template = templates.get(cell)
+        if template is None:
+            template = templates.setdefault(
+                cell, SearchStateTemplate(base, query=cell.query, seniority_levels=list(cell.seniority_levels))
+            )
+        return get_count_for_city(
+            client,
+            city,
+            radius_for(city),
+            base,
+            query=cell.query,
+            seniority_levels=list(cell.seniority_levels),
+            retry_policy=retry_policy,
+            breaker=breaker,
+            template=template,
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        pending: Dict[Future, Tuple[SweepCell, City]] = {}
+
+        def top_up() -> None:
+            while len(pending) < window:
+                try:
+                    cell, city = next(task_iter)
+                except StopIteration:
+                    return
+                pending[executor.submit(run, cell, city)] = (cell, city)
+
+        top_up()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            aborted = None
+            for fut in done:
+                cell, city = pending.pop(fut)
+                try:
+                    result = fut.result()
+                except CircuitOpenError as exc:
+                    aborted = exc
+                    continue
+                except Exception as exc:
+                    result = CityCountResult(city=city, total=None, raw=None, error=str(exc), radius_miles=radius_for(city))
+                yield cell, result
+            if aborted:
+                for fut in pending:
+                    fut.cancel()
+                raise aborted
+            top_up()
+
+
+def run_sweep(
+    client: HiringCafeClient,
+    tasks: Sequence[Tuple[SweepCell, City]],
+    radius_for: Callable[[City], float],
+    on_cell_complete: Callable[[SweepCell, int, int], None],
+    concurrency: int = 4,
+    base_search_state: Optional[JSON] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    breaker: Optional[CircuitBreaker] = None,
+    on_result: Optional[Callable[[SweepCell, CityCountResult], None]] = None,
+) -> ResultTally:
+    """
+    Drive iter_sweep, handing every result to `on_result` as it completes and calling
+    `on_cell_complete(cell, ok, failed)` as soon as a cell's last city lands. Both are
+    called from the calling thread. Results are not kept: a cell costs three counters
+    while it is open, however the tasks interleave cells. Returns the run's tally.
+    """
+    remaining: Dict[SweepCell, int] = {}
+    for cell, _ in tasks:
+        remaining[cell] = remaining.get(cell, 0) + 1
+    ok: Dict[SweepCell, int] = dict.fromkeys(remaining, 0)
+    failed: Dict[SweepCell, int] = dict.fromkeys(remaining, 0)
+    tally = ResultTally()
+
+    for cell, result in iter_sweep(
+        client,
+        tasks,
+        radius_for,
+        concurrency=concurrency,
+        base_search_state=base_search_state,
+        retry_policy=retry_policy,
+        breaker=breaker,
+    ):
+        tally.add(result)
+        if on_result:
+            on_result(cell, result)
+        if result.error:
+            failed[cell] += 1
+        else:
+            ok[cell] += 1
+        remaining[cell] -= 1
+        if remaining[cell] == 0:
+            del remaining[cell]
+            on_cell_complete(cell, ok.pop(cell), failed.pop(cell))
+    return tally
+
+
+def skip_completed(
+    tasks: Sequence[Tuple[SweepCell, City]],
+    completed_cells: Set[Tuple[str, str]],
+    completed_city_keys: Set[Tuple[str, str, Optional[str], Optional[str]]],
+) -> List[Tuple[SweepCell, City]]:
+    """
+    Drop tasks whose whole cell is checkpointed as done, or whose city already has a
+    successful row for the run's date (keys as returned by db.load_completed_city_keys).
+    """
+    remaining: List[Tuple[SweepCell, City]] = []
+    for cell, city in tasks:
+        if (cell.query or "", cell.seniority or "") in completed_cells:
+            continue
+        if (city.name, city.state_code, cell.query, cell.seniority) in completed_city_keys:
+            continue
+        remaining.append((cell, city))
+    return remaining
+
+
+def memoize_radius(radius_selector: Optional[Callable[[City], float]], default_radius: float) -> Callable[[City], float]:
+    """
+    Resolve each city's radius once per process; the lookup is the same for every cell.
+    """
+    cache: Dict[City, float] = {}
+
+    def radius_for(city: City) -> float:
+        radius = cache.get(city)
+        if radius is None:
+            radius = radius_selector(city) if radius_selector else default_radius
+            cache[city] = radius
+        return radius
+
+    return radius_for
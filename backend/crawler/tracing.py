@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class Tracer:
+    """
+    Collects Chrome trace-event records (open the output in Perfetto or chrome://tracing).
+    Spans on threads are complete ("X") events on that thread's track; spans inside an
+    asyncio task become async ("b"/"e") events keyed by the task, so overlapping
+    requests on one event loop show up as separate lanes.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self._events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._named_threads: set = set()
+        self._t0 = time.perf_counter_ns()
+        self._pid = os.getpid()
+
+    def enable(self) -> None:
+        with self._lock:
+            self._events = []
+            self._named_threads = set()
+            self._t0 = time.perf_counter_ns()
+            self.enabled = True
+
+    def _now_us(self) -> float:
+        return (time.perf_counter_ns() - self._t0) / 1000
+
+    def _emit(self, event: Dict[str, Any]) -> None:
+        tid = threading.get_ident()
+        event["pid"] = self._pid
+        event["tid"] = tid
+        with self._lock:
+            if tid not in self._named_threads:
+                self._named_threads.add(tid)
+                self._events.append(
+                    {
+                        "ph": "M",
+                        "name": "thread_name",
+                        "pid": self._pid,
+                        "tid": tid,
+                        "args": {"name": threading.current_thread().name},
+                    }
+                )
+            self._events.append(event)
+
+    @contextmanager
+    def span(self, name: str, cat: str = "crawler", **args: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Record `name` around the block. Yields the args dict so callers can attach
+        results (status, rows) before the span closes. No-op while disabled.
+        """
+        if not self.enabled:
+            yield args
+            return
+        task = _current_task()
+        start = self._now_us()
+        if task is not None:
+            self._emit({"ph": "b", "name": name, "cat": cat, "id": hex(id(task)), "ts": start, "args": args})
+        try:
+            yield args
+        finally:
+            end = self._now_us()
+            if task is not None:
+                self._emit({"ph": "e", "name": name, "cat": cat, "id": hex(id(task)), "ts": end, "args": args})
+            else:
+                self._emit({"ph": "X", "name": name, "cat": cat, "ts": start, "dur": end - start, "args": args})
+
+    def instant(self, name: str, cat: str = "crawler", **args: Any) -> None:
+        if self.enabled:
+            self._emit({"ph": "i", "s": "t", "name": name, "cat": cat, "ts": self._now_us(), "args": args})
+
+    def write(self, path: Path) -> int:
+        with self._lock:
+            events = list(self._events)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w") as fh:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fh)
+        return len(events)
+
+
+def _current_task() -> Optional[asyncio.Task]:
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        return None
+
+
+TRACER = Tracer()
+span = TRACER.span
+instant = TRACER.instant
+
+
+def enable_tracing() -> None:
+    TRACER.enable()
+
+
+def write_trace(path: str) -> int:
+    """Write collected events to `path`; returns the event count."""
+    return TRACER.write(Path(path))
@@ -20,10 +20,11 @@ class CountResult:
 @dataclass(frozen=True)
 class CityCountResult:
     city: City
-    total: int
+    total: int | None  # None when every attempt failed; never stored as a fake 0
     raw: JSON | None = None
     error: str | None = None
     radius_miles: float = 0.0
+    attempts: int = 1
 
 
 class Location(TypedDict, total=False):
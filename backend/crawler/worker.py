@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+from .client import HiringCafeClient
+from .db import CityResultsWriter
+from .retry import CircuitBreaker, CircuitOpenError, RetryPolicy
+from .search_state import default_search_state
+from .service import ResultTally, get_count_for_city
+from .state_template import SearchStateTemplate
+from .types import CityCountResult, JSON
+from .workqueue import QueueTask, WorkQueue
+
+
+def run_worker(
+    client: HiringCafeClient,
+    queue: WorkQueue,
+    writer: CityResultsWriter,
+    concurrency: int = 4,
+    batch_size: int = 0,
+    base_search_state: Optional[JSON] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    breaker: Optional[CircuitBreaker] = None,
+    run_id: Optional[str] = None,
+    poll_s: float = 5.0,
+    exit_when_idle: bool = True,
+    on_result: Optional[Callable[[QueueTask, CityCountResult], None]] = None,
+) -> ResultTally:
+    """
+    Claim batches from the queue, count them through `client`, save the rows, then mark
+    the tasks done. Rows are committed before tasks are completed, so a crash between
+    the two only causes a (harmless) re-fetch. Leases are renewed while a batch runs.
+    With exit_when_idle the worker stops once nothing is pending or leased anywhere.
+    A breaker in abort mode saves the batch's finished tasks, releases the rest back
+    to the queue and re-raises CircuitOpenError.
+    """
+    base = base_search_state or default_search_state()
+    batch_size = batch_size or max(1, concurrency) * 4
+    tally = ResultTally()
+
+    templates: Dict[Tuple, SearchStateTemplate] = {}
+
+    def run(task: QueueTask) -> CityCountResult:
+        cell_key = (task.query, task.seniority_levels)
+        template = templates.get(cell_key)
+        if template is None:
+            template = templates.setdefault(
+                cell_key, SearchStateTemplate(base, query=task.query, seniority_levels=list(task.seniority_levels))
+            )
+        return get_count_for_city(
+            client,
+            task.city,
+            task.radius_miles,
+            base,
+            query=task.query,
+            seniority_levels=list(task.seniority_levels),
+            retry_policy=retry_policy,
+            breaker=breaker,
+            template=template,
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        while True:
+            tasks = queue.claim(batch_size, run_id)
+            if not tasks:
+                stats = queue.stats(run_id)
+                if exit_when_idle and not stats.get("pending") and not stats.get("leased"):
+                    return tally
+                time.sleep(poll_s)
+                continue
+
+            stop = threading.Event()
+            heartbeat = threading.Thread(
+                target=_renew_leases,
+                args=(queue, [t.id for t in tasks], stop),
+                name="queue-heartbeat",
+                daemon=True,
+            )
+            heartbeat.start()
+            finished = []
+            aborted = None
+            try:
+                for task, fut in zip(tasks, [executor.submit(run, t) for t in tasks]):
+                    try:
+                        finished.append((task, fut.result()))
+                    except CircuitOpenError as exc:
+                        aborted = exc
+            finally:
+                stop.set()
+                heartbeat.join()
+
+            for task, result in finished:
+                writer.add(result, task.query, role=task.role, seniority_level=task.seniority, run_date=task.run_date)
+                tally.add(result)
+                if on_result:
+                    on_result(task, result)
+            writer.flush()
+            queue.complete([(task, result.total, result.error) for task, result in finished])
+            if aborted:
+                done_ids = {task.id for task, _ in finished}
+                queue.release([t.id for t in tasks if t.id not in done_ids])
+                raise aborted
+
+
+def _renew_leases(queue: WorkQueue, task_ids, stop: threading.Event) -> None:
+    interval = max(1.0, queue.lease_s / 3)
+    while not stop.wait(interval):
+        queue.extend(task_ids)
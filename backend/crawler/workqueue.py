@@ -0,0 +1,334 @@
+from __future__ import annotations
+
+import os
+import socket
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .cities import City
+from .db import _copy_to_stage, ensure_psycopg
+from .sweep import SweepCell
+
+
+@dataclass(frozen=True)
+class QueueTask:
+    id: int
+    run_id: str
+    run_date: date
+    city: City
+    query: Optional[str]
+    role: Optional[str]
+    seniority: Optional[str]
+    seniority_levels: Tuple[str, ...]
+    radius_miles: float
+    attempts: int
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+QUEUE_STAGE_COLUMNS = (
+    ("run_id", "TEXT"),
+    ("run_date", "DATE"),
+    ("priority", "INTEGER"),
+    ("city", "TEXT"),
+    ("state_code", "TEXT"),
+    ("state_name", "TEXT"),
+    ("lat", "DOUBLE PRECISION"),
+    ("lon", "DOUBLE PRECISION"),
+    ("population", "INTEGER"),
+    ("radius_miles", "DOUBLE PRECISION"),
+    ("query", "TEXT"),
+    ("role", "TEXT"),
+    ("seniority_level", "TEXT"),
+    ("seniority_levels", "TEXT[]"),
+)
+
+# One task per (run_date, city, cell); NULL query/seniority mean "any", so key on COALESCE.
+TASK_KEY = "run_date, city, state_code, (COALESCE(query, '')), (COALESCE(seniority_level, ''))"
+
+
+def _create_queue_table(cur, sql, table: str) -> None:
+    cur.execute(
+        sql.SQL(
+            """
+            CREATE TABLE IF NOT EXISTS {table_name} (
+                id BIGSERIAL PRIMARY KEY,
+                run_id TEXT NOT NULL,
+                run_date DATE NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                city TEXT NOT NULL,
+                state_code TEXT NOT NULL,
+                state_name TEXT NOT NULL,
+                lat DOUBLE PRECISION NOT NULL,
+                lon DOUBLE PRECISION NOT NULL,
+                population INTEGER,
+                radius_miles DOUBLE PRECISION NOT NULL,
+                query TEXT,
+                role TEXT,
+                seniority_level TEXT,
+                seniority_levels TEXT[] NOT NULL DEFAULT '{{}}',
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                leased_by TEXT,
+                lease_expires_at TIMESTAMPTZ,
+                total INTEGER,
+                last_error TEXT,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+            """
+        ).format(table_name=sql.Identifier(table))
+    )
+    cur.execute(
+        sql.SQL(
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS {idx} ON {table_name} ({key})
+            """
+        ).format(idx=sql.Identifier(f"{table}_task_key"), table_name=sql.Identifier(table), key=sql.SQL(TASK_KEY))
+    )
+    cur.execute(
+        sql.SQL(
+            "CREATE INDEX IF NOT EXISTS {idx} ON {table_name} (status, priority, id) WHERE status <> 'done'"
+        ).format(idx=sql.Identifier(f"{table}_claim_idx"), table_name=sql.Identifier(table))
+    )
+
+
+def enqueue_sweep_tasks(
+    pg_url: str,
+    table: str,
+    run_id: str,
+    run_date: date,
+    tasks: Sequence[Tuple[SweepCell, City]],
+    radius_for: Callable[[City], float],
+) -> Tuple[int, int]:
+    """
+    Queue (cell, city) tasks for run_date; list order becomes claim priority. A task
+    already queued for the same date is taken over by this run (run_id, priority and
+    radius), and a failed one goes back to pending with its attempts reset; tasks a
+    worker currently holds are left alone. Returns (inserted, taken over), counted from
+    the statement's own RETURNING rows, so concurrent enqueuers and workers don't skew it.
+    """
+    psycopg = ensure_psycopg()
+    sql = psycopg.sql
+    rows = [
+        (
+            run_id,
+            run_date,
+            priority,
+            city.name,
+            city.state_code,
+            city.state_name,
+            city.latitude,
+            city.longitude,
+            city.population,
+            radius_for(city),
+            cell.query,
+            cell.role,
+            cell.seniority,
+            list(cell.seniority_levels),
+        )
+        for priority, (cell, city) in enumerate(tasks)
+    ]
+    if not rows:
+        return 0, 0
+    cols = sql.SQL(", ").join(sql.Identifier(n) for n, _ in QUEUE_STAGE_COLUMNS)
+    with psycopg.connect(pg_url) as conn:
+        with conn.cursor() as cur:
+            _create_queue_table(cur, sql, table)
+            stage = _copy_to_stage(cur, sql, table, QUEUE_STAGE_COLUMNS, rows)
+            cur.execute(
+                sql.SQL(
+                    """
+                    INSERT INTO {table_name} AS q ({cols})
+                    SELECT DISTINCT ON ({key}) {cols} FROM {stage}
+                    ORDER BY {key}, _seq
+                    ON CONFLICT ({key}) DO UPDATE SET
+                        run_id = EXCLUDED.run_id,
+                        priority = EXCLUDED.priority,
+                        radius_miles = EXCLUDED.radius_miles,
+                        role = EXCLUDED.role,
+                        seniority_levels = EXCLUDED.seniority_levels,
+                        status = CASE WHEN q.status = 'failed' THEN 'pending' ELSE q.status END,
+                        attempts = CASE WHEN q.status = 'failed' THEN 0 ELSE q.attempts END,
+                        last_error = CASE WHEN q.status = 'failed' THEN NULL ELSE q.last_error END,
+                        updated_at = NOW()
+                    WHERE q.status <> 'leased'
+                    RETURNING xmax = 0
+                    """
+                ).format(table_name=sql.Identifier(table), cols=cols, key=sql.SQL(TASK_KEY), stage=stage)
+            )
+            outcomes = [row[0] for row in cur.fetchall()]
+        conn.commit()
+    inserted = sum(outcomes)
+    return inserted, len(outcomes) - inserted
+
+
+class WorkQueue:
+    """
+    Worker-side handle on the queue table. Tasks are claimed with FOR UPDATE SKIP LOCKED
+    under a lease; a task whose lease runs out (worker died) becomes claimable again,
+    up to max_attempts claims. Results are idempotent upserts, so a late duplicate is harmless.
+    """
+
+    def __init__(self, pg_url: str, table: str, worker_id: str, lease_s: float = 300, max_attempts: int = 3) -> None:
+        psycopg = ensure_psycopg()
+        self._sql = psycopg.sql
+        self._table = self._sql.Identifier(table)
+        self._conn = psycopg.connect(pg_url, autocommit=True)
+        self.worker_id = worker_id
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        with self._conn.cursor() as cur:
+            _create_queue_table(cur, self._sql, table)
+
+    def __enter__(self) -> "WorkQueue":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def claim(self, limit: int, run_id: Optional[str] = None) -> List[QueueTask]:
+        with self._conn.cursor() as cur:
+            # Leases that ran out on their last allowed attempt will never be claimed again.
+            cur.execute(
+                self._sql.SQL(
+                    """
+                    UPDATE {table_name}
+                    SET status = 'failed', last_error = COALESCE(last_error, 'lease expired'), updated_at = NOW()
+                    WHERE status = 'leased' AND lease_expires_at < NOW() AND attempts >= %s
+                    """
+                ).format(table_name=self._table),
+                (self.max_attempts,),
+            )
+            cur.execute(
+                self._sql.SQL(
+                    """
+                    UPDATE {table_name} AS q
+                    SET status = 'leased', leased_by = %(worker)s, attempts = q.attempts + 1,
+                        lease_expires_at = NOW() + make_interval(secs => %(lease_s)s), updated_at = NOW()
+                    WHERE q.id IN (
+                        SELECT id FROM {table_name}
+                        WHERE (status = 'pending' OR (status = 'leased' AND lease_expires_at < NOW()))
+                          AND attempts < %(max_attempts)s
+                          AND (%(run_id)s::text IS NULL OR run_id = %(run_id)s::text)
+                        ORDER BY priority, id
+                        LIMIT %(limit)s
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING q.id, q.run_id, q.run_date, q.city, q.state_code, q.state_name, q.lat, q.lon,
+                              q.population, q.query, q.role, q.seniority_level, q.seniority_levels,
+                              q.radius_miles, q.attempts
+                    """
+                ).format(table_name=self._table),
+                {
+                    "worker": self.worker_id,
+                    "lease_s": self.lease_s,
+                    "max_attempts": self.max_attempts,
+                    "run_id": run_id,
+                    "limit": limit,
+                },
+            )
+            rows = cur.fetchall()
+        tasks = [
+            QueueTask(
+                id=row[0],
+                run_id=row[1],
+                run_date=row[2],
+                city=City(row[3], row[4], row[5], row[6], row[7], row[8] or 0),
+                query=row[9],
+                role=row[10],
+                seniority=row[11],
+                seniority_levels=tuple(row[12] or ()),
+                radius_miles=row[13],
+                attempts=row[14],
+            )
+            for row in rows
+        ]
+        tasks.sort(key=lambda t: t.id)
+        return tasks
+
+    def extend(self, task_ids: Sequence[int]) -> None:
+        """Heartbeat: push the lease out again for tasks this worker still holds."""
+        if not task_ids:
+            return
+        with self._conn.cursor() as cur:
+            cur.execute(
+                self._sql.SQL(
+                    """
+                    UPDATE {table_name} SET lease_expires_at = NOW() + make_interval(secs => %s), updated_at = NOW()
+                    WHERE id = ANY(%s) AND leased_by = %s AND status = 'leased'
+                    """
+                ).format(table_name=self._table),
+                (self.lease_s, list(task_ids), self.worker_id),
+            )
+
+    def release(self, task_ids: Sequence[int]) -> None:
+        """Hand tasks this worker never ran back to pending, without using up an attempt."""
+        if not task_ids:
+            return
+        with self._conn.cursor() as cur:
+            cur.execute(
+                self._sql.SQL(
+                    """
+                    UPDATE {table_name}
+                    SET status = 'pending', attempts = GREATEST(attempts - 1, 0),
+                        leased_by = NULL, lease_expires_at = NULL, updated_at = NOW()
+                    WHERE id = ANY(%s) AND leased_by = %s AND status = 'leased'
+                    """
+                ).format(table_name=self._table),
+                (list(task_ids), self.worker_id),
+            )
+
+    def complete(self, outcomes: Sequence[Tuple[QueueTask, Optional[int], Optional[str]]]) -> None:
+        """
+        Record (task, total, error) outcomes. Failed tasks go back to pending until
+        they have used max_attempts claims, then stay 'failed'.
+        """
+        if not outcomes:
+            return
+        with self._conn.transaction(), self._conn.cursor() as cur:
+            cur.executemany(
+                self._sql.SQL(
+                    """
+                    UPDATE {table_name}
+                    SET status = CASE
+                            WHEN %(error)s::text IS NULL THEN 'done'
+                            WHEN attempts >= %(max_attempts)s THEN 'failed'
+                            ELSE 'pending'
+                        END,
+                        total = %(total)s, last_error = %(error)s::text,
+                        leased_by = NULL, lease_expires_at = NULL, updated_at = NOW()
+                    WHERE id = %(id)s AND leased_by = %(worker)s
+                    """
+                ).format(table_name=self._table),
+                [
+                    {
+                        "id": task.id,
+                        "total": total,
+                        "error": error,
+                        "worker": self.worker_id,
+                        "max_attempts": self.max_attempts,
+                    }
+                    for task, total, error in outcomes
+                ],
+            )
+
+    def stats(self, run_id: Optional[str] = None) -> Dict[str, int]:
+        with self._conn.cursor() as cur:
+            cur.execute(
+                self._sql.SQL(
+                    """
+                    SELECT status, COUNT(*) FROM {table_name}
+                    WHERE %(run_id)s::text IS NULL OR run_id = %(run_id)s::text
+                    GROUP BY status
+                    """
+                ).format(table_name=self._table),
+                {"run_id": run_id},
+            )
+            return {status: n for status, n in cur.fetchall()}
+
+    def close(self) -> None:
+        self._conn.close()
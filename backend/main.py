@@ -1,18 +1,39 @@
 from __future__ import annotations
 
-import csv
-import json
+import math
 import sys
+import uuid
+from datetime import date
 from pathlib import Path
 
 from crawler.config import parse_args, resolve_queries, resolve_role
+from crawler.cache import build_response_cache
 from crawler.areas import build_area_lookup, radius_from_lookup
-from crawler.db import save_city_results_to_pg
+from crawler.db import (
+    CityResultsWriter,
+    finish_sweep_run,
+    load_completed_city_keys,
+    load_refresh_history,
+    load_sweep_run,
+    mark_sweep_cell_done,
+    start_sweep_run,
+)
 from crawler.cities import load_us_cities
+from crawler.city_table import CityTable
 from crawler.client import HiringCafeClient
-from crawler.service import get_counts_for_cities, get_counts_for_queries
+from crawler.metrics import MetricsExporter
+from crawler.planner import DEFAULT_TIERS, parse_tiers, plan_refresh
+from crawler.ratelimit import shared_rate_limiter
+from crawler.retry import CircuitBreaker, CircuitOpenError, RetryPolicy
+from crawler.service import ResultTally, get_counts_for_queries, iter_counts_for_cities
+from crawler.async_service import iter_counts_for_cities_async
+from crawler.sinks import open_file_sink
+from crawler.sweep import SweepCell, SweepSpec, memoize_radius, run_sweep, skip_completed, sweep_tasks
 from crawler.search_state import default_search_state, merge_overrides
+from crawler.tracing import enable_tracing, span, write_trace
 from crawler.util import parse_search_state_from_url
+from crawler.worker import run_worker
+from crawler.workqueue import WorkQueue, default_worker_id, enqueue_sweep_tasks
 
 
 def build_base_state(args):
@@ -26,6 +47,29 @@ def build_base_state(args):
     return base_state
 
 
+def build_rate_limiter(args, base_url: str = "https://hiring.cafe"):
+    # None means no throttling at all: the client is built with min_delay_s=0 so it
+    # does not fall back to its own default limiter.
+    if args.rate <= 0:
+        return None
+    return shared_rate_limiter(base_url, rate=args.rate, burst=args.burst, max_rate=args.max_rate or None)
+
+
+def build_retry_policy(args) -> RetryPolicy:
+    return RetryPolicy(max_attempts=max(0, args.max_retries) + 1, base_delay_s=args.retry_base_delay)
+
+
+def build_breaker(args) -> CircuitBreaker | None:
+    if args.breaker_threshold <= 0:
+        return None
+    return CircuitBreaker(
+        error_threshold=args.breaker_threshold,
+        min_requests=args.breaker_min_requests,
+        cooldown_s=args.breaker_cooldown_s,
+        mode=args.breaker_mode,
+    )
+
+
 def estimate_radius_from_population(population: int, density_per_sq_mile: float, min_radius: float, max_radius: float) -> float:
     if population <= 0 or density_per_sq_mile <= 0:
         return min_radius
@@ -34,37 +78,23 @@ def estimate_radius_from_population(population: int, density_per_sq_mile: float,
     return max(min_radius, min(max_radius, radius))
 
 
-def run_query_mode(client: HiringCafeClient, args, base_state, queries) -> None:
-    if args.pg_url:
-        print("--pg-url is only supported in cities mode.")
-        sys.exit(1)
-    results = get_counts_for_queries(client, queries, base_state)
-    for r in results:
-        if r.error:
-            print(f"{r.query:20} -> ERROR: {r.error}")
-        else:
-            print(f"{r.query:20} -> {r.total}")
-
-
-def run_city_mode(client: HiringCafeClient, args, base_state) -> None:
-    if args.query_list or args.query_set:
-        print("--query-list/--query-set provided but cities mode uses a single --query; ignoring those values.")
-
-    search_query, seniority_levels = resolve_role(args)
-    effective_query: str | None = search_query or args.query or None
-    role_label = args.query or "all"
-    seniority_label = args.seniority_level or "all"
-
-    limit = args.city_limit or None
+def load_cities_or_exit(min_population: int, city_limit: int):
+    limit = city_limit or None
     try:
-        cities = load_us_cities(min_population=args.min_population, limit=limit)
+        with span("load_cities", cat="io"):
+            cities = load_us_cities(min_population=min_population, limit=limit)
     except RuntimeError as exc:
         print(f"City lookup failed: {exc}")
         sys.exit(1)
-    print(f"Loaded {len(cities)} cities (min_pop={args.min_population}, limit={limit or 'all'})")
+    print(f"Loaded {len(cities)} cities (min_pop={min_population}, limit={limit or 'all'})")
+    return cities
 
-    area_lookup = build_area_lookup(args, cities=cities)
-    radius_selector = None
+
+def build_radius_selector(args, area_lookup, cities=None):
+    """
+    Per-city radius function, or None for a fixed --radius-miles. When `cities` is given,
+    every radius is computed up front in one vectorised pass over a CityTable.
+    """
     if area_lookup:
         def radius_selector(city):
             return radius_from_lookup(
@@ -75,7 +105,14 @@ def run_city_mode(client: HiringCafeClient, args, base_state) -> None:
                 max_radius=args.max_radius,
                 map_boroughs=args.map_nyc_boroughs,
             )
-    elif args.auto_radius_from_population:
+        if cities:
+            with span("city_radii", cat="cpu", cities=len(cities)):
+                table = CityTable(cities)
+                table.attach_areas(area_lookup, args.map_nyc_boroughs)
+                table.radii_from_area(args.radius_miles, args.min_radius, args.max_radius)
+                return table.radius_lookup(radius_selector)
+        return radius_selector
+    if args.auto_radius_from_population:
         def radius_selector(city):
             return estimate_radius_from_population(
                 city.population,
@@ -83,137 +120,444 @@ def run_city_mode(client: HiringCafeClient, args, base_state) -> None:
                 args.min_radius,
                 args.max_radius,
             )
+        if cities:
+            with span("city_radii", cat="cpu", cities=len(cities)):
+                table = CityTable(cities)
+                table.radii_from_population(args.density_per_sq_mile, args.min_radius, args.max_radius, args.min_radius)
+                return table.radius_lookup(radius_selector)
+        return radius_selector
+    return None
+
+
+def print_city_result(r, prefix: str = "") -> None:
+    label = f"{r.city.name}, {r.city.state_code}"
+    if r.error:
+        print(f"{prefix}{label:30} -> ERROR: {r.error}")
+    else:
+        print(f"{prefix}{label:30} -> {r.total} (radius={r.radius_miles:.1f} mi)")
 
-    results = get_counts_for_cities(
-        client=client,
-        cities=cities,
-        radius_miles=args.radius_miles,
-        radius_selector=radius_selector,
-        concurrency=max(1, args.concurrency),
-        base_search_state=base_state,
-        query=effective_query,
-        seniority_levels=seniority_levels,
+
+def print_run_summary(client: HiringCafeClient, tally: ResultTally, breaker) -> None:
+    summary = tally.as_dict(breaker)
+    print(
+        f"Summary: {summary['ok']}/{summary['cities']} ok, {summary['failed']} failed, "
+        f"{summary['retries']} retries, {summary['breaker_trips']} breaker trip(s)"
     )
+    if client.cache:
+        print(f"Cache: {client.cache.hits} hits, {client.cache.misses} misses")
+    if client.singleflight.dedupe_hits:
+        print(f"Single-flight: {client.singleflight.dedupe_hits} duplicate in-flight request(s) coalesced")
+
 
+def run_query_mode(client: HiringCafeClient, args, base_state, queries) -> None:
+    if args.pg_url:
+        print("--pg-url is only supported in cities mode.")
+        sys.exit(1)
+    results = get_counts_for_queries(client, queries, base_state)
     for r in results:
-        label = f"{r.city.name}, {r.city.state_code}"
         if r.error:
-            print(f"{label:30} -> ERROR: {r.error}")
+            print(f"{r.query:20} -> ERROR: {r.error}")
         else:
-            print(f"{label:30} -> {r.total} (radius={r.radius_miles:.1f} mi)")
+            print(f"{r.query:20} -> {r.total}")
 
-    if args.output:
-        save_city_results(
-            results=results,
-            path=Path(args.output),
-            fmt=args.output_format,
+
+def run_city_mode(client: HiringCafeClient, args, base_state) -> None:
+    if args.query_list or args.query_set:
+        print("--query-list/--query-set provided but cities mode uses a single --query; ignoring those values.")
+
+    search_query, seniority_levels = resolve_role(args)
+    effective_query: str | None = search_query or args.query or None
+    role_label = args.query or "all"
+    seniority_label = args.seniority_level or "all"
+
+    cities = load_cities_or_exit(args.min_population, args.city_limit)
+    radius_selector = build_radius_selector(args, build_area_lookup(args, cities=cities), cities)
+
+    retry_policy = build_retry_policy(args)
+    breaker = build_breaker(args)
+    if args.engine == "async":
+        stream = iter_counts_for_cities_async(
+            cities=cities,
+            radius_miles=args.radius_miles,
+            radius_selector=radius_selector,
+            concurrency=max(1, args.concurrency),
+            base_search_state=base_state,
             query=effective_query,
+            seniority_levels=seniority_levels,
+            base_url=client.base_url,
+            min_delay_s=client.min_delay_s,
+            pool_size=args.pool_size,
+            keepalive_s=args.keepalive_s,
+            rate_limiter=client.rate_limiter,
+            cache=client.cache,
+            retry_policy=retry_policy,
+            breaker=breaker,
+        )
+    else:
+        stream = iter_counts_for_cities(
+            client=client,
+            cities=cities,
             radius_miles=args.radius_miles,
-            role=role_label,
-            seniority_level=seniority_label,
+            radius_selector=radius_selector,
+            concurrency=max(1, args.concurrency),
+            base_search_state=base_state,
+            query=effective_query,
+            seniority_levels=seniority_levels,
+            retry_policy=retry_policy,
+            breaker=breaker,
         )
+
+    # Results stream straight into the sinks as they complete; nothing is buffered per run.
+    sinks = open_sinks(args)
+    tally = ResultTally()
+    try:
+        for r in stream:
+            print_city_result(r)
+            tally.add(r)
+            for sink in sinks:
+                sink.add(r, effective_query, role=role_label, seniority_level=seniority_label)
+    except CircuitOpenError as exc:
+        # Results that landed before the trip are still flushed by close_sinks below.
+        print(f"Aborted: {exc}")
+        print_run_summary(client, tally, breaker)
+        sys.exit(1)
+    except RuntimeError as exc:
+        print(f"City sweep failed: {exc}")
+        sys.exit(1)
+    finally:
+        close_sinks(args, sinks)
+    print_run_summary(client, tally, breaker)
+
+
+def open_sinks(args) -> list:
+    sinks = []
+    if args.output:
+        sinks.append(open_file_sink(Path(args.output), args.output_format, args.radius_miles))
     if args.pg_url:
         try:
-            save_city_results_to_pg(
-                results=results,
-                pg_url=args.pg_url,
-                table=args.pg_table,
-                create_table=args.pg_create_table,
-                query=effective_query,
-                radius_miles=args.radius_miles,
-                role=role_label,
-                seniority_level=seniority_label,
+            sinks.append(
+                CityResultsWriter(
+                    args.pg_url,
+                    args.pg_table,
+                    args.pg_create_table,
+                    radius_miles=args.radius_miles,
+                    partitioned=args.pg_partitioned,
+                    storage=args.pg_storage,
+                    batch_size=args.flush_every,
+                )
             )
         except RuntimeError as exc:
             print(f"Postgres save failed: {exc}")
             sys.exit(1)
+    return sinks
+
+
+def close_sinks(args, sinks) -> None:
+    for sink in sinks:
+        sink.close()
+        if isinstance(sink, CityResultsWriter):
+            print(f"Saved {sink.written} records to Postgres table {args.pg_table}")
+        else:
+            print(f"Wrote {sink.written} records to {args.output} ({args.output_format})")
+
+
+def cell_key(cell: SweepCell) -> tuple:
+    """A cell's key in the sweep checkpoint table ('' for NULL, as load_sweep_run returns them)."""
+    return (cell.query or "", cell.seniority or "")
+
+
+def run_sweep_mode(client: HiringCafeClient, args, base_state) -> None:
+    """
+    Run the whole role x seniority x city matrix in this process: cities and areas are
+    loaded once and every cell shares the client's rate limiter, pool and cache.
+    With --pg-url the run is checkpointed: results are flushed every --flush-every
+    cities and finished cells are recorded, so --resume <run-id> only redoes the gap.
+    """
+    if args.engine == "async":
+        print("Sweep mode runs on the shared thread pool; ignoring --engine async.")
+    if args.resume and not args.pg_url:
+        print("--resume requires --pg-url.")
+        sys.exit(1)
 
+    run_id = args.resume
+    run_date = date.today()
+    completed_cells: set = set()
+    completed_city_keys: set = set()
+    try:
+        if run_id:
+            run = load_sweep_run(args.pg_url, args.pg_runs_table, run_id)
+            if run is None:
+                print(f"Unknown sweep run '{run_id}'.")
+                sys.exit(1)
+            run_date, spec_dict, completed_cells = run
+            spec = SweepSpec.from_dict(spec_dict)
+            completed_city_keys = load_completed_city_keys(args.pg_url, args.pg_table, run_date)
+            print(f"Resuming run {run_id} for {run_date}: {len(completed_cells)} cell(s) already done")
+        else:
+            spec = build_sweep_spec(args)
+        cells = spec.cells()
+    except (OSError, ValueError) as exc:
+        print(f"Invalid sweep spec: {exc}")
+        sys.exit(1)
 
-def save_city_results(
-    results,
-    path: Path,
-    fmt: str,
-    query: str | None,
-    radius_miles: float,
-    role: str,
-    seniority_level: str,
-) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    if fmt == "json":
-        payload = [
-            {
-                "city": r.city.name,
-                "state": r.city.state_code,
-                "state_name": r.city.state_name,
-                "lat": r.city.latitude,
-                "lon": r.city.longitude,
-                "population": r.city.population,
-                "radius_miles": r.radius_miles or radius_miles,
-                "query": query or "",
-                "role": role,
-                "seniority_level": seniority_level,
-                "total": r.total,
-                "error": r.error,
-            }
-            for r in results
-        ]
-        path.write_text(json.dumps(payload, indent=2))
-        print(f"Wrote {len(results)} records to {path} (json)")
+    # With --states the limit applies within those states, so load them all and let
+    # filter_cities cut after filtering.
+    cities = spec.filter_cities(load_cities_or_exit(spec.min_population, 0 if spec.states else spec.city_limit or 0))
+    if spec.states:
+        print(f"Kept {len(cities)} cities in {','.join(spec.states)} (limit={spec.city_limit or 'all'})")
+    radius_for = memoize_radius(build_radius_selector(args, build_area_lookup(args, cities=cities), cities), args.radius_miles)
+    tasks = skip_completed(sweep_tasks(cells, cities), completed_cells, completed_city_keys)
+    if args.plan_stale:
+        tasks = plan_stale_tasks(args, tasks)
+    if args.enqueue:
+        enqueue_sweep(args, tasks, radius_for, run_id or f"{run_date.isoformat()}-{uuid.uuid4().hex[:8]}", run_date)
         return
+    print(f"Sweeping {len(cells)} cells x {len(cities)} cities: {len(tasks)} requests to go")
+
+    writer = None
+    if args.pg_url:
+        if not run_id:
+            run_id = f"{run_date.isoformat()}-{uuid.uuid4().hex[:8]}"
+            start_sweep_run(args.pg_url, args.pg_runs_table, run_id, run_date, spec.to_dict())
+        print(f"Sweep run id: {run_id} (continue an interrupted run with --resume {run_id})")
+        writer = CityResultsWriter(
+            args.pg_url,
+            args.pg_table,
+            args.pg_create_table,
+            radius_miles=args.radius_miles,
+            partitioned=args.pg_partitioned,
+            storage=args.pg_storage,
+            run_date=run_date,
+            batch_size=args.flush_every,
+        )
+        # Cells whose cities were all saved before the interruption have nothing left to run.
+        pending_cells = {cell for cell, _ in tasks}
+        for cell in cells:
+            if cell not in pending_cells and cell_key(cell) not in completed_cells:
+                mark_sweep_cell_done(args.pg_url, args.pg_runs_table, run_id, cell.query, cell.seniority)
+                completed_cells.add(cell_key(cell))
 
-    with path.open("w", newline="") as fh:
-        writer = csv.DictWriter(
-            fh,
-            fieldnames=[
-                "city",
-                "state",
-                "state_name",
-                "lat",
-                "lon",
-                "population",
-                "radius_miles",
-                "query",
-                "role",
-                "seniority_level",
-                "total",
-                "error",
-            ],
+    file_sink = open_file_sink(Path(args.output), args.output_format, args.radius_miles) if args.output else None
+
+    def on_result(cell: SweepCell, result) -> None:
+        for sink in (writer, file_sink):
+            if sink:
+                sink.add(result, cell.query, role=cell.role, seniority_level=cell.seniority)
+
+    def on_cell_complete(cell: SweepCell, ok: int, failed: int) -> None:
+        print(f"[{cell.label}] done: {ok} ok, {failed} failed")
+        if writer:
+            writer.flush()
+            # A cell with failed cities stays open, so --resume retries just those cities
+            # (load_completed_city_keys only returns successful rows).
+            if not failed:
+                mark_sweep_cell_done(args.pg_url, args.pg_runs_table, run_id, cell.query, cell.seniority)
+                completed_cells.add(cell_key(cell))
+
+    def stop_sweep(status: str, message: str) -> None:
+        # Cells still open were never checkpointed, so --resume redoes only their missing cities.
+        if file_sink:
+            file_sink.close()
+        if writer:
+            writer.close()
+            finish_sweep_run(args.pg_url, args.pg_runs_table, run_id, status=status)
+            print(f"{message}; {writer.written} results saved. Resume with --resume {run_id}")
+        else:
+            print(message)
+
+    breaker = build_breaker(args)
+    try:
+        tally = run_sweep(
+            client,
+            tasks,
+            radius_for,
+            on_cell_complete,
+            concurrency=max(1, args.concurrency),
+            base_search_state=base_state,
+            retry_policy=build_retry_policy(args),
+            breaker=breaker,
+            on_result=on_result,
         )
-        writer.writeheader()
-        for r in results:
-            writer.writerow(
-                {
-                    "city": r.city.name,
-                    "state": r.city.state_code,
-                    "state_name": r.city.state_name,
-                    "lat": r.city.latitude,
-                    "lon": r.city.longitude,
-                    "population": r.city.population,
-                    "radius_miles": r.radius_miles or radius_miles,
-                    "query": query or "",
-                    "role": role,
-                    "seniority_level": seniority_level,
-                    "total": r.total,
-                    "error": r.error or "",
-                }
+    except KeyboardInterrupt:
+        stop_sweep("interrupted", "Interrupted")
+        sys.exit(130)
+    except CircuitOpenError as exc:
+        stop_sweep("aborted", f"Aborted: {exc}")
+        sys.exit(1)
+    except RuntimeError as exc:
+        print(f"Postgres save failed: {exc}")
+        sys.exit(1)
+
+    if file_sink:
+        file_sink.close()
+        print(f"Wrote {file_sink.written} records to {args.output} ({args.output_format})")
+    if writer:
+        writer.close()
+        # Done only once every cell is checkpointed, including failures left over from earlier attempts.
+        finished = all(cell_key(cell) in completed_cells for cell in cells)
+        finish_sweep_run(args.pg_url, args.pg_runs_table, run_id, status="done" if finished else "partial")
+    print_run_summary(client, tally, breaker)
+
+
+def enqueue_sweep(args, tasks, radius_for, run_id: str, run_date: date) -> None:
+    if not args.pg_url:
+        print("--enqueue requires --pg-url.")
+        sys.exit(1)
+    try:
+        inserted, taken_over = enqueue_sweep_tasks(args.pg_url, args.queue_table, run_id, run_date, tasks, radius_for)
+    except RuntimeError as exc:
+        print(f"Enqueue failed: {exc}")
+        sys.exit(1)
+    print(
+        f"Queued {inserted} new task(s) as run {run_id} in {args.queue_table}; "
+        f"{taken_over} already queued for {run_date} now belong to this run "
+        f"({len(tasks) - inserted - taken_over} skipped: held by a worker or duplicates). "
+        f"Start workers with: python main.py --mode worker --pg-url ... --queue-run {run_id}"
+    )
+
+
+def run_worker_mode(client: HiringCafeClient, args, base_state) -> None:
+    """
+    Pull tasks from the shared Postgres queue until it drains (or forever with
+    --worker-forever). Any number of these can run against one sweep.
+    """
+    if not args.pg_url:
+        print("--mode worker requires --pg-url.")
+        sys.exit(1)
+    worker_id = args.worker_id or default_worker_id()
+    breaker = build_breaker(args)
+    try:
+        queue = WorkQueue(args.pg_url, args.queue_table, worker_id, args.lease_s, args.queue_max_attempts)
+        writer = CityResultsWriter(
+            args.pg_url,
+            args.pg_table,
+            args.pg_create_table,
+            radius_miles=args.radius_miles,
+            partitioned=args.pg_partitioned,
+            storage=args.pg_storage,
+            batch_size=max(args.flush_every, args.queue_batch or args.concurrency * 4),
+        )
+    except RuntimeError as exc:
+        print(f"Worker failed to start: {exc}")
+        sys.exit(1)
+
+    print(f"Worker {worker_id} claiming from {args.queue_table}" + (f" (run {args.queue_run})" if args.queue_run else ""))
+    with queue, writer:
+        try:
+            tally = run_worker(
+                client,
+                queue,
+                writer,
+                concurrency=max(1, args.concurrency),
+                batch_size=args.queue_batch,
+                base_search_state=base_state,
+                retry_policy=build_retry_policy(args),
+                breaker=breaker,
+                run_id=args.queue_run,
+                poll_s=args.worker_poll_s,
+                exit_when_idle=not args.worker_forever,
+                on_result=lambda task, r: print_city_result(r, prefix=f"[{task.query or 'all jobs'}/{task.seniority or 'any'}] "),
             )
-    print(f"Wrote {len(results)} records to {path} (csv)")
+        except KeyboardInterrupt:
+            print("Interrupted; unfinished leases will expire and be picked up by other workers.")
+            sys.exit(130)
+        except CircuitOpenError as exc:
+            # run_worker saved the finished tasks and released the rest of the batch.
+            print(f"Aborted: {exc}; unfinished tasks are back in {args.queue_table} for other workers.")
+            sys.exit(1)
+        stats = queue.stats(args.queue_run)
+    print("Queue: " + ", ".join(f"{k}={v}" for k, v in sorted(stats.items())))
+    print_run_summary(client, tally, breaker)
+
+
+def plan_stale_tasks(args, tasks):
+    """
+    Narrow sweep tasks to the stale ones using city_counts history (see crawler.planner).
+    Exits after printing the plan with --plan-only.
+    """
+    if not args.pg_url:
+        print("--plan-stale requires --pg-url.")
+        sys.exit(1)
+    try:
+        tiers = parse_tiers(args.refresh_tiers) if args.refresh_tiers else DEFAULT_TIERS
+        history = load_refresh_history(args.pg_url, args.pg_table, args.refresh_lookback_days)
+    except (RuntimeError, ValueError) as exc:
+        print(f"Refresh planning failed: {exc}")
+        sys.exit(1)
+    plan = plan_refresh(tasks, history, tiers, budget=args.refresh_budget or None)
+    print(f"Refresh plan: {plan.summary()}")
+    if args.plan_only:
+        for cell, city in plan.tasks:
+            print(f"{city.name}, {city.state_code}\t{city.population or 0}\t{cell.label}")
+        sys.exit(0)
+    return plan.tasks
+
+
+def build_sweep_spec(args) -> SweepSpec:
+    if args.sweep_spec:
+        return SweepSpec.from_json(Path(args.sweep_spec))
+    return SweepSpec(
+        roles=[r.strip() for r in args.roles.split(",") if r.strip()],
+        seniorities=[s.strip() for s in args.seniority_levels.split(",") if s.strip()],
+        min_population=args.min_population,
+        city_limit=args.city_limit or None,
+        states=[s.strip().upper() for s in (args.states or "").split(",") if s.strip()],
+    )
 
 
 def main() -> None:
     args = parse_args()
-    client = HiringCafeClient(min_delay_s=0.5)
+    try:
+        cache = build_response_cache(
+            args.cache,
+            ttl_s=args.cache_ttl_hours * 3600,
+            max_entries=args.cache_max_entries,
+            path=args.cache_path,
+            pg_url=args.pg_url,
+            pg_table=args.cache_table,
+        )
+    except RuntimeError as exc:
+        print(f"Response cache unavailable: {exc}")
+        sys.exit(1)
+    client = HiringCafeClient(
+        base_url=args.base_url,
+        min_delay_s=0,  # pacing comes from --rate alone
+        pool_size=max(10, args.pool_size or args.concurrency),
+        rate_limiter=build_rate_limiter(args, args.base_url),
+        cache=cache,
+    )
     base_state = build_base_state(args)
 
-    if args.mode == "cities":
-        run_city_mode(client, args, base_state)
-    else:
-        try:
-            queries = resolve_queries(args)
-        except ValueError as exc:
-            print(exc)
-            sys.exit(1)
-        run_query_mode(client, args, base_state, queries)
+    if args.trace:
+        enable_tracing()
+    exporter = None
+    if args.metrics_textfile or args.metrics_push_url:
+        exporter = MetricsExporter(
+            textfile=args.metrics_textfile,
+            push_url=args.metrics_push_url,
+            job=args.metrics_job,
+            interval_s=args.metrics_interval_s,
+        )
+        exporter.start()
+    try:
+        if args.mode == "cities":
+            run_city_mode(client, args, base_state)
+        elif args.mode == "sweep":
+            run_sweep_mode(client, args, base_state)
+        elif args.mode == "worker":
+            run_worker_mode(client, args, base_state)
+        else:
+            try:
+                queries = resolve_queries(args)
+            except ValueError as exc:
+                print(exc)
+                sys.exit(1)
+            run_query_mode(client, args, base_state, queries)
+    finally:
+        if exporter:
+            exporter.close()
+        if args.trace:
+            print(f"Wrote {write_trace(args.trace)} trace events to {args.trace} (open in https://ui.perfetto.dev)")
 
 
 if __name__ == "__main__":
@@ -1,13 +1,15 @@
 from __future__ import annotations
 
 import argparse
+import os
 import sys
 from datetime import date
 import math
-from typing import Iterable, List
+from typing import List
 
 from crawler.areas import build_area_lookup, radius_from_lookup
 from crawler.cities import load_us_cities
+from crawler.city_table import CityTable
 from crawler.client import HiringCafeClient
 from crawler.config import (
     QUERIES_BY_CATEGORY,
@@ -16,9 +18,9 @@ from crawler.config import (
     env_int,
     load_env_file,
 )
-from crawler.db import save_city_results_to_pg
+from crawler.db import CityResultsWriter
 from crawler.search_state import default_search_state
-from crawler.service import get_counts_for_cities
+from crawler.sweep import SweepCell, memoize_radius, run_sweep, sweep_tasks
 
 
 def parse_args() -> argparse.Namespace:
@@ -33,9 +35,22 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--min-population", type=int, default=env_int("JOBS_MIN_POPULATION", 50000))
     parser.add_argument("--concurrency", type=int, default=env_int("JOBS_CONCURRENCY", 3))
     parser.add_argument("--radius-miles", type=int, default=env_int("JOBS_RADIUS_MILES", 25))
+    parser.add_argument("--base-url", default=os.getenv("JOBS_BASE_URL", "https://hiring.cafe"))
     parser.add_argument("--pg-url", default=None, help="Postgres connection URL (required).")
     parser.add_argument("--pg-table", default="city_counts")
     parser.add_argument("--pg-create-table", action="store_true", default=env_bool("JOBS_PG_CREATE_TABLE", True))
+    parser.add_argument(
+        "--pg-partitioned",
+        action="store_true",
+        default=env_bool("JOBS_PG_PARTITIONED", False),
+        help="Create the counts table partitioned by month of run_date.",
+    )
+    parser.add_argument(
+        "--pg-storage",
+        choices=["wide", "normalized"],
+        default=os.getenv("JOBS_PG_STORAGE", "wide"),
+        help="Counts table layout when it is created (see crawler/normalize.py).",
+    )
     parser.add_argument("--gazetteer-path", default=None, help="Optional Gazetteer path override.")
     parser.add_argument(
         "--auto-radius-from-population",
@@ -46,12 +61,17 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--density-per-sq-mile", type=float, default=env_float("JOBS_DENSITY_PER_SQ_MILE", 3000.0))
     parser.add_argument("--min-radius", type=float, default=env_float("JOBS_MIN_RADIUS", 5.0))
     parser.add_argument("--max-radius", type=float, default=env_float("JOBS_MAX_RADIUS", 50.0))
+    parser.add_argument(
+        "--map-nyc-boroughs",
+        action="store_true",
+        default=env_bool("JOBS_MAP_NYC_BORO_TO_CITY", True),
+        help="Map NYC borough names to New York City for radius lookup.",
+    )
     return parser.parse_args()
 
 
-def run_category(
-    category: str,
-    queries: Iterable[str],
+def run_categories(
+    categories: List[str],
     client: HiringCafeClient,
     city_limit: int,
     min_population: int,
@@ -60,6 +80,8 @@ def run_category(
     pg_url: str,
     pg_table: str,
     pg_create_table: bool,
+    pg_partitioned: bool,
+    pg_storage: str,
     gazetteer_path: str | None,
     auto_radius_from_population: bool,
     density_per_sq_mile: float,
@@ -67,6 +89,10 @@ def run_category(
     max_radius: float,
     map_boroughs: bool,
 ) -> None:
+    """
+    Load cities and areas once, then run every category's queries through one shared
+    work queue; each query is saved as soon as its last city finishes.
+    """
     limit = city_limit or None
     cities = load_us_cities(min_population=min_population, limit=limit)
     area_lookup = build_area_lookup(
@@ -97,27 +123,54 @@ def run_category(
             return max(min_radius, min(max_radius, radius))
         return radius_miles
 
-    for query in queries:
-        print(f"[{category}] Running query '{query}' across {len(cities)} cities...")
-        results = get_counts_for_cities(
-            client=client,
-            cities=cities,
-            radius_miles=radius_miles,
-            radius_selector=radius_selector
-            if area_lookup
-            else (radius_from_population if auto_radius_from_population else None),
+    table = CityTable(cities)
+    if area_lookup:
+        table.attach_areas(area_lookup, map_boroughs)
+        table.radii_from_area(radius_miles, min_radius, max_radius)
+        selector = table.radius_lookup(radius_selector)
+    elif auto_radius_from_population:
+        table.radii_from_population(density_per_sq_mile, min_radius, max_radius, radius_miles)
+        selector = table.radius_lookup(radius_from_population)
+    else:
+        selector = None
+    radius_for = memoize_radius(selector, radius_miles)
+
+    cells: List[SweepCell] = []
+    for category in categories:
+        queries = QUERIES_BY_CATEGORY[category]
+        print(f"[{category}] Queued {len(queries)} queries across {len(cities)} cities...")
+        cells.extend(SweepCell(query=q, role=None, seniority=None) for q in queries)
+    # The same query can appear in more than one category; run it once.
+    cells = list(dict.fromkeys(cells))
+
+    run_date = date.today()
+
+    # Rows stream into Postgres as they land; each cell is committed when it finishes.
+    with CityResultsWriter(
+        pg_url,
+        pg_table,
+        create_table=pg_create_table,
+        radius_miles=radius_miles,
+        run_date=run_date,
+        partitioned=pg_partitioned,
+        storage=pg_storage,
+    ) as writer:
+
+        def on_result(cell: SweepCell, result) -> None:
+            writer.add(result, cell.query)
+
+        def on_cell_complete(cell: SweepCell, ok: int, failed: int) -> None:
+            writer.flush()
+            print(f"Saved query '{cell.query}' ({ok + failed} cities, {failed} failed)")
+
+        run_sweep(
+            client,
+            sweep_tasks(cells, cities),
+            radius_for,
+            on_cell_complete,
             concurrency=max(1, concurrency),
             base_search_state=default_search_state(),
-            query=query,
-        )
-        save_city_results_to_pg(
-            results=results,
-            pg_url=pg_url,
-            table=pg_table,
-            create_table=pg_create_table,
-            query=query,
-            radius_miles=radius_miles,
-            run_date=date.today(),
+            on_result=on_result,
         )
 
 
@@ -127,31 +180,33 @@ def main() -> None:
         print("--pg-url is required.")
         sys.exit(1)
 
-    categories = [c.strip() for c in args.categories.split(",") if c.strip()]
-    client = HiringCafeClient(min_delay_s=0.5)
-
-    for category in categories:
+    categories = []
+    for category in (c.strip() for c in args.categories.split(",") if c.strip()):
         if category not in QUERIES_BY_CATEGORY:
             print(f"Skipping unknown category '{category}'.")
             continue
-        run_category(
-            category=category,
-            queries=QUERIES_BY_CATEGORY[category],
-            client=client,
-            city_limit=args.city_limit,
-            min_population=args.min_population,
-            concurrency=args.concurrency,
-            radius_miles=args.radius_miles,
-            pg_url=args.pg_url,
-            pg_table=args.pg_table,
-            pg_create_table=args.pg_create_table,
-            gazetteer_path=args.gazetteer_path,
-            auto_radius_from_population=args.auto_radius_from_population,
-            density_per_sq_mile=args.density_per_sq_mile,
-            min_radius=args.min_radius,
-            max_radius=args.max_radius,
-            map_boroughs=args.map_nyc_boroughs,
-        )
+        categories.append(category)
+    client = HiringCafeClient(base_url=args.base_url, min_delay_s=0.5, pool_size=max(10, args.concurrency))
+
+    run_categories(
+        categories=categories,
+        client=client,
+        city_limit=args.city_limit,
+        min_population=args.min_population,
+        concurrency=args.concurrency,
+        radius_miles=args.radius_miles,
+        pg_url=args.pg_url,
+        pg_table=args.pg_table,
+        pg_create_table=args.pg_create_table,
+        pg_partitioned=args.pg_partitioned,
+        pg_storage=args.pg_storage,
+        gazetteer_path=args.gazetteer_path,
+        auto_radius_from_population=args.auto_radius_from_population,
+        density_per_sq_mile=args.density_per_sq_mile,
+        min_radius=args.min_radius,
+        max_radius=args.max_radius,
+        map_boroughs=args.map_nyc_boroughs,
+    )
 
 
 if __name__ == "__main__":
@@ -64,6 +64,8 @@ export default function App() {
         }
         qs.set("min_total", String(params.minTotal));
         qs.set("limit", "1000");
+        // Links are rebuilt per cluster in clusterPoints, so skip the server-built ones.
+        qs.set("urls", "0");
         const res = await fetch(`${API_BASE}/heatmap?${qs.toString()}`);
         if (!res.ok) throw new Error(await res.text());
         const json = await res.json();